@@ -12,6 +12,10 @@ if not int(os.getenv('ENVIRONMENT_LOADED', 0)):
 
 from .defaults import *
 from .database import *
+from .cache import *
+from .draw import *
+from .jobs import *
+from .request_stats import *
 from .allauth import *
 from .smtp_email import *
 from .static import *
@@ -0,0 +1,21 @@
+import os
+
+from . import BASE_DIR
+
+# Кэш общий для всех воркеров gunicorn и run_tasks, поэтому по умолчанию в файлах (общий том в docker-compose).
+# В базе кэш не держим: иначе каждая закэшированная страница всё равно делает запросы к PostgreSQL
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+# Сколько хранить тэб, темы и результаты раундов одной версии результатов турнира
+TAB_CACHE_TIMEOUT = int(os.getenv('TAB_CACHE_TIMEOUT', 60 * 60))
+
+# Как часто процесс проверяет, не поменялась ли матрица доступа к страницам в другом процессе, сек
+ACCESS_CHECK_INTERVAL = int(os.getenv('ACCESS_CHECK_INTERVAL', 60))
@@ -55,6 +55,7 @@ TEMPLATES = [
 ]
 
 MIDDLEWARE = [
+    'apps.tournament.middleware.QueryStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -0,0 +1,8 @@
+import os
+
+# Сколько рассадок с разными seed перебирать при генерации раунда и в скольких процессах
+DRAW_SEEDS = int(os.getenv('DRAW_SEEDS', 1))
+DRAW_WORKERS = int(os.getenv('DRAW_WORKERS', 0)) or None
+
+# Сколько соседних румов просматривать, чтобы развести уже встречавшиеся команды, 0 - не разводить
+DRAW_REPEAT_WINDOW = int(os.getenv('DRAW_REPEAT_WINDOW', 2))
@@ -0,0 +1,18 @@
+import os
+
+# Потоков для фоновых задач (генерация раунда, брейк) в каждом воркере, 0 - выполнять сразу в запросе
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))
+
+# Сколько хранить статус задачи в кэше
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', 24 * 60 * 60))
+
+# Через сколько секунд без отметки от воркера задача считается брошенной и не блокирует турнир
+JOB_STALE_TIMEOUT = int(os.getenv('JOB_STALE_TIMEOUT', 60))
+
+# Очередь задач в базе (python manage.py run_tasks): потоков воркера, попыток и задержка перед первым повтором, сек
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 4))
+TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', 5))
+TASK_RETRY_DELAY = int(os.getenv('TASK_RETRY_DELAY', 30))
+
+# Как часто выполняемая задача отмечается в базе, сек. Должно быть меньше --stale у run_tasks
+TASK_HEARTBEAT = int(os.getenv('TASK_HEARTBEAT', 60))
@@ -12,6 +12,9 @@ if os.getenv('DJANGO_LOG', 'OFF') == 'ON':
             'simple': {
                 'format': '%(levelname)s %(message)s'
             },
+            'request_stats': {
+                'format': '%(asctime)s %(process)d %(message)s'
+            },
         },
         'handlers': {
             'bot_log_file': {
@@ -33,12 +36,24 @@ if os.getenv('DJANGO_LOG', 'OFF') == 'ON':
                 'level': 'DEBUG',
                 'formatter': 'verbose',
             },
+            'request_stats_file': {
+                'class': 'logging.handlers.WatchedFileHandler',
+                'encoding': 'utf-8',
+                'filename': os.getenv('REQUEST_STATS_LOG_FILE', os.path.join(BASE_DIR, 'logs', 'request_stats.log')),
+                'level': 'INFO',
+                'formatter': 'request_stats',
+            },
         },
         'loggers': {
             'TelegramBot': {
                 'handlers': ['bot_log_file'],
                 'level': 'INFO',
             },
+            'RequestStats': {
+                'handlers': ['request_stats_file'],
+                'level': 'INFO',
+                'propagate': False,
+            },
             '': {
                 'handlers': ['django_log_file', 'mail_admins'],
                 'level': 'INFO',
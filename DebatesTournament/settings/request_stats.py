@@ -0,0 +1,12 @@
+import os
+
+# Статистика запросов (apps.tournament.middleware.QueryStatsMiddleware): число SQL-запросов, время в базе и view
+REQUEST_STATS = os.getenv('REQUEST_STATS', 'ON') == 'ON'
+
+# Пороги, после которых запрос пишется в лог RequestStats
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', 50))
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))
+
+# По скольким последним запросам каждой view считать перцентили
+REQUEST_STATS_WINDOW = int(os.getenv('REQUEST_STATS_WINDOW', 500))
@@ -6,3 +6,7 @@ EMAIL_PORT = 587
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', 'user.site@gmail.com')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', 'user.site.password')
+
+# Рассылки: писем на одно SMTP-соединение и пауза между пачками, сек
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+EMAIL_BATCH_DELAY = float(os.getenv('EMAIL_BATCH_DELAY', 1))
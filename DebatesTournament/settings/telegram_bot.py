@@ -3,6 +3,10 @@ import os
 
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', None)
 
+# Рассылка уведомлений: сообщений в секунду (лимит телеграма - 30) и адрес Bot API, пусто - api.telegram.org
+TELEGRAM_RATE = int(os.getenv('TELEGRAM_RATE', 25))
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+
 if TELEGRAM_BOT_TOKEN:
     INSTALLED_APPS += [
         'django_telegrambot',
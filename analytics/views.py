@@ -13,7 +13,6 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from analytics.filters import MotionAnalysisFilter
-from analytics.models import MotionAnalysis
 from analytics.serializers import (
     MotionSerializer, UserAnalyticsSerializer, DefaultUserSerializer
 )
@@ -21,6 +20,7 @@ from apps.tournament.consts import STATUS_FINISHED
 from apps.tournament.models import (
     Motion, QualificationResult, Game, User
 )
+from apps.tournament.tasks import enqueue
 
 
 @login_required(login_url=reverse_lazy('account_login'))
@@ -54,15 +54,15 @@ class ProfileAPI(APIView):
         answer = defaultdict(list)
         for res in results:
             position = ''
-            if user in (res.game.og.speaker_2, res.game.og.speaker_1):
+            if user.id in (res.game.og.speaker_2_id, res.game.og.speaker_1_id):
                 position = 'og'
-            if user in (res.game.oo.speaker_2, res.game.oo.speaker_1):
+            if user.id in (res.game.oo.speaker_2_id, res.game.oo.speaker_1_id):
                 position = 'oo'
-            if user in (res.game.cg.speaker_2, res.game.cg.speaker_1):
+            if user.id in (res.game.cg.speaker_2_id, res.game.cg.speaker_1_id):
                 position = 'cg'
-            if user in (res.game.co.speaker_2, res.game.co.speaker_1):
+            if user.id in (res.game.co.speaker_2_id, res.game.co.speaker_1_id):
                 position = 'co'
-            registered_as_first = getattr(res.game, position).speaker_1 == user
+            registered_as_first = getattr(res.game, position).speaker_1_id == user.id
             speaks = 0
             if position == 'og':
                 speaks = res.pm if registered_as_first else res.dpm
@@ -75,8 +75,7 @@ class ProfileAPI(APIView):
             answer[position].append((getattr(res, position), speaks))
             answer['overall'].append((getattr(res, position), speaks))
 
-        judgement = list(Game.objects.filter(chair=user))
-        answer['judgement'] = len(judgement)
+        answer['judgement'] = Game.objects.filter(chair=user).count()
         user.analytics = answer
         serializer = UserAnalyticsSerializer(user)
         return Response(serializer.data)
@@ -86,21 +85,20 @@ class ProfileAPI(APIView):
 # cached_profile = cache_wrapper(ProfileAPI.as_view())
 
 class MotionAPI(APIView):
-    queryset = Motion.objects.select_related('analysis') \
-            .filter(round__tournament__status_id=STATUS_FINISHED)
+    queryset = Motion.objects.select_related('analysis')
 
     def get(self, request, *args, **kwargs):
         pk = kwargs['pk']
         try:
-            motion = self.queryset.get(id=pk)
+            # Фильтр по статусу в запросе: STATUS_FINISHED ленивый и не должен читаться при импорте модуля
+            motion = self.queryset.filter(round__tournament__status_id=STATUS_FINISHED).get(id=pk)
         except Motion.DoesNotExist:
             motion = None
         if not motion:
             return Response(status=200, data={})
         if not hasattr(motion, 'analysis'):
-            analysis = MotionAnalysis()
-            analysis.generate_analysis(motion)
-            motion.analysis = analysis
+            # Анализ считается в фоне, пока его нет - отдаём тему без анализа
+            enqueue('motion_analysis', motion.id, key='motion_analysis/%s' % motion.id)
         data = MotionSerializer(motion).data
         return Response(status=200, data=data)
 
@@ -1,11 +1,12 @@
-import string, random, datetime
+import string, random, datetime, secrets
 
 from allauth.account.models import EmailAddress
 from DebatesTournament.settings.smtp_email import EMAIL_HOST_USER
 from django.contrib.auth.models import AbstractUser
 from django.core.mail import EmailMultiAlternatives
 from django.db import models
-from django.template import Context
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.template.loader import get_template
 from apps.tournament.models.language import Language
 from apps.tournament.models.bot_users  import BotUsers
@@ -61,26 +62,36 @@ class User(AbstractUser):
             primary=True,
         )
 
-    def send_email_about_import(self, tournament, password):
-        email = EmailMultiAlternatives(
-            get_template('account/email/email_import_signup_subject.txt').render().strip(),
-            get_template('account/email/email_import_signup_message.txt').render(Context({
-                'user': self,
-                'tournament': tournament,
-                'password': password,
-            })),
-            EMAIL_HOST_USER,
-            [self.email]
-        )
-        email.attach_alternative(
-            get_template('account/email/email_import_signup_message.html').render(Context({
-                'user': self,
+    @staticmethod
+    def send_emails_about_import(users: list, tournament):
+        """
+        Задаёт импортированным пользователям случайные пароли и отправляет им письма одной рассылкой.
+        Пароль сохраняется только тем, кому письмо ушло
+        :return: ошибку или '' для каждого пользователя
+        """
+        from apps.tournament.mailing import send_emails
+
+        subject = get_template('account/email/email_import_signup_subject.txt').render().strip()
+        text_template = get_template('account/email/email_import_signup_message.txt')
+        html_template = get_template('account/email/email_import_signup_message.html')
+
+        messages = []
+        for user in users:
+            password = User.objects.make_random_password()
+            user.set_password(password)
+            context = {
+                'user': user,
                 'tournament': tournament,
                 'password': password,
-            })),
-            "text/html"
-        )
-        email.send()
+            }
+            email = EmailMultiAlternatives(subject, text_template.render(context), EMAIL_HOST_USER, [user.email])
+            email.attach_alternative(html_template.render(context), "text/html")
+            messages.append(email)
+
+        errors = send_emails(messages)
+        User.objects.bulk_update([user for user, error in zip(users, errors) if not error], ['password'])
+
+        return errors
 
     def set_random_password(self):
         password = User.objects.make_random_password()
@@ -88,33 +99,61 @@ class User(AbstractUser):
         self.save()
         return password
 
+    @staticmethod
+    def build(email: str, full_name: str):
+        """
+        Пользователь для импорта, не сохранённый в базу
+        """
+        name = full_name.strip().split(maxsplit=1)
+        name += ['', '']
+
+        return User(
+            email=email,
+            username=email[:29],
+            last_name=name[0][:29],
+            first_name=name[1][:29],
+            phone='',
+            university_id=1,
+            link='https://vk.com/tabmaker',
+            player_experience='',
+            adjudicator_experience='',
+            is_show_phone=False,
+            is_show_email=False,
+        )
+
+    @staticmethod
+    def get_for_import(emails, usernames) -> (dict, set):
+        """
+        Одним запросом находит пользователей по e-mail без учёта регистра и занятые логины из usernames
+        :return: {email в нижнем регистре: user}, при совпадении - последний созданный, как в get_or_create;
+            логины найденных пользователей
+        """
+        users = list(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(Q(email_lower__in=list(emails)) | Q(username__in=list(usernames)))
+            .order_by('id')
+        )
+        return {user.email_lower: user for user in users}, {user.username for user in users}
+
+    @staticmethod
+    def bulk_create_confirmed(users: list):
+        """
+        Сохраняет новых пользователей и их подтверждённые e-mail двумя запросами
+        """
+        User.objects.bulk_create(users)
+        EmailAddress.objects.bulk_create([
+            EmailAddress(user=user, email=user.email, verified=True, primary=True) for user in users
+        ])
+
     @staticmethod
     def get_or_create(email: str, full_name: str, is_test=False):
         user = User.objects.filter(email__iexact=email).last()
         if user:
             return user, True
         else:
-            name = full_name.strip().split(maxsplit=1)
-            name += ['', '']
-
-            # User() - создаёт объект, но не сохраняет в базу
-            # User.objects.create() - сохраняет в базу
-            user_obj = User if is_test else User.objects.create
-
-            user = user_obj(
-                email=email,
-                username=email[:29],
-                last_name=name[0][:29],
-                first_name=name[1][:29],
-                phone='',
-                university_id=1,
-                link='https://vk.com/tabmaker',
-                player_experience='',
-                adjudicator_experience='',
-                is_show_phone=False,
-                is_show_email=False,
-            )
+            user = User.build(email, full_name)
             if not is_test:
+                user.save()
                 user.confirmation()
 
             return user, False
@@ -127,5 +166,19 @@ class TelegramToken(models.Model):
     value = models.TextField(max_length=64)
     expire = models.DateTimeField()
 
+    LIFETIME = datetime.timedelta(days=30)
+
+    @staticmethod
+    def bulk_generate(users: list) -> dict:
+        """
+        Создаёт токены для привязки телеграма сразу всем users одним запросом
+        :return: {user_id: value}
+        """
+        expire = datetime.datetime.now() + TelegramToken.LIFETIME
+        tokens = [TelegramToken(user=user, value=secrets.token_urlsafe(32), expire=expire) for user in users]
+        TelegramToken.objects.bulk_create(tokens)
+
+        return {token.user_id: token.value for token in tokens}
+
 
 
@@ -12,6 +12,9 @@ class Round(models.Model):
     is_public = models.BooleanField(default=True)
     is_playoff = models.BooleanField(default=False)
 
+    # seed рассадки, с ним plan_next_round повторит ту же рассадку
+    draw_seed = models.BigIntegerField(blank=True, null=True)
+
     def publish(self):
         self.is_public = True
         self.save()
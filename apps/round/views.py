@@ -1,19 +1,32 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy
-from django_telegrambot.apps import DjangoTelegramBot
 
-from apps.tournament.views import access_by_status, check_tournament, _show_message
-from apps.tournament.logic import 
-    generate_next_round, \
+from apps.tournament.views import access_by_status, check_tournament, _get_or_check_round_result_forms, _show_message
+from apps.tournament.context import TournamentContext
+from apps.tournament.jobs import start_job
+from apps.tournament.logic import \
+    check_draw, \
+    plan_next_round, \
     get_rooms_from_last_round, \
     publish_last_round, \
-    get_tab, \
-    check_games_results_exists
-from apps.tournament.messages import MSG_ROUND_NOT_PUBLIC
+    get_tab_arrays, \
+    check_games_results_exists, \
+    remove_last_round
+from apps.tournament.messages import \
+    MSG_NO_ACCESS_IN_RESULT_PAGE, \
+    MSG_NO_ROUND_IN_PLAYOFF_FOR_REMOVE, \
+    MSG_ROUND_NOT_EXIST, \
+    MSG_ROUND_NOT_PUBLIC
 from apps.tournament.forms import MotionForm, RoundForm, GameForm
-from apps.tournament.consts import ROLE_CHAIR, ROLE_CHIEF_ADJUDICATOR, ROLE_WING
-from apps.tournament.telegrambot import TabmakerBot
+from apps.tournament.consts import ROLE_CHAIR, ROLE_CHIEF_ADJUDICATOR, ROLE_WING, STATUS_PLAYOFF
+from apps.tournament.models import Place, Team, User
+
+# Рассадка из предпросмотра и данные формы темы, чтобы сохранить ровно её
+DRAW_PREVIEW_SESSION_KEY = 'draw_preview_%s'
+
 
 @login_required(login_url=reverse_lazy('account_login'))
 @access_by_status(name_page='round_next')
@@ -22,14 +35,11 @@ def next_round(request, tournament):
     if request.method == 'POST':
         motion_form = MotionForm(request.POST)
         round_form = RoundForm(request.POST)
-        if motion_form.is_valid() and round_form.is_valid():
-            round_obj = round_form.save(commit=False)
-            round_obj.motion = motion_form.save()
-            error = generate_next_round(tournament, round_obj)
-            if error:
-                _show_message(request, error)
+        if motion_form.is_valid() and round_form.is_valid() and 'preview' in request.POST:
+            return _preview_draw(request, tournament, request.POST.dict())
 
-            return redirect('tournament:edit_round', tournament_id=tournament.id)
+        if motion_form.is_valid() and round_form.is_valid():
+            return _start_round_job(tournament, motion_form, round_form)
     else:
         motion_form = MotionForm()
         round_form = RoundForm()
@@ -45,6 +55,87 @@ def next_round(request, tournament):
     )
 
 
+def _start_round_job(tournament, motion_form, round_form, draw=None):
+    """
+    Раунд создаётся в фоновой задаче, страница задачи показывает прогресс и переходит к раунду
+    """
+    round_obj = round_form.save(commit=False)
+    job_id = start_job(
+        tournament.id,
+        'next_round',
+        motion_form.save().id,
+        round_obj.start_time.isoformat(),
+        round_obj.is_closed,
+        draw
+    )
+    return redirect('tournament:job', tournament_id=tournament.id, job_id=job_id)
+
+
+def _preview_draw(request, tournament, form_data):
+    draw, error = plan_next_round(tournament)
+    if error:
+        return _show_message(request, error)
+
+    request.session[DRAW_PREVIEW_SESSION_KEY % tournament.id] = {
+        'draw': draw,
+        'form': form_data,
+    }
+    return redirect('tournament:preview_round', tournament_id=tournament.id)
+
+
+def _get_draw_rows(draw: dict):
+    positions = ['og', 'oo', 'cg', 'co']
+    teams = Team.objects.in_bulk([room[position] for room in draw['rooms'] for position in positions])
+    adjudicators = User.objects.in_bulk([
+        room.get(i) for room in draw['rooms'] for i in ['chair', 'wing_left', 'wing_right'] if room.get(i)
+    ])
+    places = Place.objects.in_bulk([room['place'] for room in draw['rooms'] if room['place']])
+
+    return [
+        {
+            'number': room['number'] + 1,
+            'teams': [teams[room[position]] for position in positions],
+            'chair': adjudicators.get(room['chair']),
+            'wings': [adjudicators[room[i]] for i in ['wing_left', 'wing_right'] if room.get(i)],
+            'place': places.get(room['place']),
+        }
+        for room in draw['rooms']
+    ]
+
+
+@login_required(login_url=reverse_lazy('account_login'))
+@access_by_status(name_page='round_next')
+@check_tournament
+def preview_round(request, tournament):
+    preview = request.session.get(DRAW_PREVIEW_SESSION_KEY % tournament.id)
+    if not preview:
+        return redirect('tournament:next_round', tournament_id=tournament.id)
+
+    # Турнир изменился после предпросмотра - рассадка считается заново
+    if request.method == 'POST' and 'again' in request.POST or check_draw(tournament, preview['draw']):
+        return _preview_draw(request, tournament, preview['form'])
+
+    if request.method == 'POST':
+        motion_form = MotionForm(preview['form'])
+        round_form = RoundForm(preview['form'])
+        if not motion_form.is_valid() or not round_form.is_valid():
+            return redirect('tournament:next_round', tournament_id=tournament.id)
+
+        del request.session[DRAW_PREVIEW_SESSION_KEY % tournament.id]
+        return _start_round_job(tournament, motion_form, round_form, preview['draw'])
+
+    return render(
+        request,
+        'tournament/preview_round.html',
+        {
+            'tournament': tournament,
+            'motion': preview['form'].get('motion', ''),
+            'draw': preview['draw'],
+            'rooms': _get_draw_rows(preview['draw']),
+        }
+    )
+
+
 @access_by_status(name_page='round_show')
 def show_round(request, tournament):
     rooms = get_rooms_from_last_round(tournament, True)
@@ -82,14 +173,13 @@ def publish_round(request, tournament):
     except Exception as exception :
         return _show_message(request, exception)
 
+    # Раунд уже опубликован, ошибка рассылки не должна ломать страницу
     try:
-        from . telegrambot import TabmakerBot
-        from django_telegrambot.apps import DjangoTelegramBot
+        from apps.tournament.telegrambot import TabmakerBot
 
-        rooms = get_rooms_from_last_round(tournament)
-        TabmakerBot.send_round_notifications(DjangoTelegramBot.getBot(), cur_round, rooms),
-    except Exception as exception :
-        logging.error(exception)
+        TabmakerBot.send_round_notifications(cur_round)
+    except Exception:
+        logging.getLogger('Notifications').exception('Round %s notifications were not queued' % cur_round.id)
 
     return redirect('tournament:show', tournament_id=tournament.id)
 
@@ -118,9 +208,8 @@ def edit_round(request, tournament):
     if all_is_valid and request.method == 'POST':
         return redirect('tournament:show', tournament_id=tournament.id)
 
-    team_results = {}
-    for team_result in get_tab(tournament):
-        team_results[team_result.team.id] = team_result.sum_points()
+    tab = get_tab_arrays(tournament)
+    team_results = dict(zip(tab.get_teams_id(), tab.sum_points().tolist()))
 
     return render(
         request,
@@ -139,11 +228,11 @@ def edit_round(request, tournament):
 @login_required(login_url=reverse_lazy('account_login'))
 @access_by_status(name_page='round_result')
 def result_round(request, tournament):
-    is_admin = user_can_edit_tournament(tournament, request.user)
-    chair = None if is_admin else request.user
-    rooms = get_rooms_from_last_round(tournament, False, chair)
+    context = TournamentContext.get(request, tournament)
+    is_admin = context.is_owner
+    rooms = context.rooms if is_admin else context.chair_rooms
     is_playoff = tournament.status == STATUS_PLAYOFF
-    is_final = is_playoff and get_rooms_from_last_round(tournament).count() == 1
+    is_final = is_playoff and len(context.rooms) == 1
 
     if not is_admin and not rooms:
         return _show_message(request, MSG_NO_ACCESS_IN_RESULT_PAGE)
@@ -107,11 +107,11 @@ def import_team(request, tournament):
 
     message = ''
     results = []
-    import_form = TeamImportForm(request.POST or None)
+    import_form = TeamImportForm(request.POST or None, request.FILES or None)
     if request.method == 'POST' and import_form.is_valid():
         imports = ImportTeam(import_form)
         try:
-            imports.connect_to_worksheet()
+            imports.open()
             imports.read_titles()
             is_test = int(request.POST.get('is_test', '0')) == 1
             results = imports.import_teams(tournament, is_test)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import AccessToPage
+
+_VERSION_KEY = 'access_to_page/version'
+
+# Матрица доступа процесса: {(status_id, page_name): (is_public, access, message)}
+_matrix = None
+_version = None
+_checked = 0
+_lock = threading.Lock()
+
+
+def _get_version():
+    return cache.get(_VERSION_KEY, 0)
+
+
+def _load():
+    return {
+        (i.status_id, i.page.name): (i.page.is_public, i.access, i.message)
+        for i in AccessToPage.objects.select_related('page')
+    }
+
+
+def get_access_matrix() -> dict:
+    """
+    Матрица доступа к страницам по статусу турнира, загружается один раз на процесс.
+    Изменения из других процессов видны через ACCESS_CHECK_INTERVAL секунд: версия в кэше проверяется не чаще
+    """
+    global _matrix, _version, _checked
+
+    now = time.monotonic()
+    if _matrix is not None and now - _checked < getattr(settings, 'ACCESS_CHECK_INTERVAL', 60):
+        return _matrix
+
+    with _lock:
+        version = _get_version()
+        if _matrix is None or version != _version:
+            _matrix = _load()
+            _version = version
+        _checked = now
+
+    return _matrix
+
+
+def get_page_access(status_id, name_page: str):
+    """
+    :return: (is_public, access, message) или None, если для статуса нет настройки страницы
+    """
+    return get_access_matrix().get((status_id, name_page))
+
+
+def invalidate_access_matrix():
+    """
+    Перезагружает матрицу в этом процессе при следующем обращении, в остальных - после проверки версии
+    """
+    global _matrix
+
+    with _lock:
+        _matrix = None
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
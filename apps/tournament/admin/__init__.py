@@ -1,6 +1,8 @@
 from . motion import MotionAdmin
+from . notification import NotificationAdmin
+from . task import TaskAdmin
 from . tournament import TournamentAdmin
-from apps.tournament.models import Motion, Language, BotUsers, BotChat, Tournament
+from apps.tournament.models import Motion, Language, BotUsers, BotChat, Notification, Task, Tournament
 from django.contrib.admin import site
 
 site.register(Motion, MotionAdmin)
@@ -8,3 +10,5 @@ site.register(Language)
 site.register(BotUsers)
 site.register(BotChat)
 site.register(Tournament, TournamentAdmin)
+site.register(Task, TaskAdmin)
+site.register(Notification, NotificationAdmin)
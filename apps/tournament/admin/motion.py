@@ -21,6 +21,12 @@ class TournamentListFilter(SimpleListFilter):
             return queryset.filter(round__tournament__isnull=(self.value() == '0'))
 
 
+def _get_round(motion: Motion):
+    # Раунды уже загружены prefetch_related в get_queryset, first() сделал бы новый запрос
+    rounds = motion.round_set.all()
+    return min(rounds, key=lambda x: x.id) if rounds else None
+
+
 class MotionAdmin(ModelAdmin):
 
     list_display = [
@@ -43,27 +49,27 @@ class MotionAdmin(ModelAdmin):
     actions = ['published_motion']
 
     def tournament_name(self, motion: Motion) -> str:
-        r = motion.round_set.first()
+        r = _get_round(motion)
         return r.tournament.name if r else ''
 
     tournament_name.admin_order_field = 'round__tournament_id'
 
 
     def is_playoff(self, motion: Motion) -> bool:
-        r = motion.round_set.first()
+        r = _get_round(motion)
         return r.is_playoff if r else False
 
     is_playoff.admin_order_field = 'round__is_palyoff   '
 
 
     def round_number(self, motion: Motion) -> int:
-        r = motion.round_set.first()
+        r = _get_round(motion)
         return r.number if r else -1
 
     round_number.admin_order_field = 'round__number'
 
     def tournament_location(self, motion: Motion) -> str:
-        r = motion.round_set.first()
+        r = _get_round(motion)
         return r.tournament.location.split(',')[0] if r else ''
 
     def get_queryset(self, request):
@@ -0,0 +1,20 @@
+from django.contrib.admin import ModelAdmin
+
+from apps.tournament.models import Notification
+from apps.tournament.tasks import enqueue
+
+
+class NotificationAdmin(ModelAdmin):
+
+    list_display = ['id', 'key', 'channel', 'recipient', 'status', 'attempts', 'created', 'updated']
+    list_filter = ['status', 'channel']
+    search_fields = ['key', 'recipient']
+    readonly_fields = ['created', 'updated']
+    ordering = ['-id']
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        if queryset.exclude(status=Notification.STATUS_SENT).update(status=Notification.STATUS_QUEUED, attempts=0):
+            enqueue('send_notifications')
+
+    retry.short_description = 'Отправить ещё раз'
@@ -0,0 +1,24 @@
+import datetime
+
+from django.contrib.admin import ModelAdmin
+
+from apps.tournament.models import Task
+
+
+class TaskAdmin(ModelAdmin):
+
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_after', 'created', 'updated']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'key', 'args']
+    readonly_fields = ['created', 'updated']
+    ordering = ['-id']
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        queryset.exclude(status=Task.STATUS_RUNNING).update(
+            status=Task.STATUS_QUEUED,
+            attempts=0,
+            run_after=datetime.datetime.now()
+        )
+
+    retry.short_description = 'Выполнить ещё раз'
@@ -1,5 +1,14 @@
 from django.contrib.admin import ModelAdmin
-from apps.tournament.models import Tournament
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from apps.tournament.models import TeamTournamentRel, Tournament, UserTournamentRel
+
+
+def _count_by_tournament(queryset):
+    return Subquery(
+        queryset.filter(tournament=OuterRef('pk')).order_by().values('tournament')
+        .annotate(count=Count('id')).values('count'),
+        output_field=IntegerField()
+    )
 
 
 class TournamentAdmin(ModelAdmin):
@@ -16,19 +25,29 @@ class TournamentAdmin(ModelAdmin):
         'adjudicators_count',
     ]
 
+    list_select_related = ['status']
 
-    def owner(self, tournament: Tournament):
+    def get_queryset(self, request):
         from apps.tournament import consts
-        return tournament.get_users([consts.ROLE_OWNER])[0].user.id
+
+        # Владелец и количества считаются подзапросами, а не отдельным запросом на каждую строку
+        owners = UserTournamentRel.objects.filter(tournament=OuterRef('pk'), role=consts.ROLE_OWNER).order_by('user_id')
+        return super().get_queryset(request).annotate(
+            owner_id=Subquery(owners.values('user_id')[:1]),
+            count_team_rels=_count_by_tournament(TeamTournamentRel.objects.all()),
+            count_adjudicators=_count_by_tournament(UserTournamentRel.objects.filter(role__in=consts.ADJUDICATOR_ROLES)),
+        )
+
+    def owner(self, tournament: Tournament):
+        return tournament.owner_id
 
 
     def teams_count(self, tournament: Tournament):
-        return tournament.get_teams().count()
+        return tournament.count_team_rels or 0
 
 
     def adjudicators_count(self, tournament: Tournament):
-        from apps.tournament import consts
-        return tournament.get_users(consts.ADJUDICATOR_ROLES).count()
+        return tournament.count_adjudicators or 0
 
 
     def location_sub(self, tournament: Tournament) -> str:
@@ -0,0 +1,179 @@
+import bisect
+import math
+
+from .draw import TEAM_IN_GAME
+
+# Сколько судей-крыльев может получить рум
+COUNT_WINGS = 2
+
+
+class Conflicts:
+    """
+    Конфликты судей с румами в хэш-индексах: университет -> румы с его командами, команда -> рум.
+    Судья конфликтует с румом, если он из того же университета, что и одна из команд, или уже судил одну из них
+    """
+
+    def __init__(self, rooms: [[int]], team_universities: dict, universities: dict, judged_teams: dict):
+        """
+        :param rooms: румы из id команд
+        :param team_universities: {team_id: {university_id}} - университеты спикеров команды
+        :param universities: {user_id: university_id} - университеты судей
+        :param judged_teams: {user_id: {team_id}} - команды, которые судья уже судил
+        """
+        self._room_by_team = {}
+        self._rooms_by_university = {}
+        for i, room in enumerate(rooms):
+            for team in room:
+                self._room_by_team[team] = i
+                for university in team_universities.get(team, ()):
+                    self._rooms_by_university.setdefault(university, set()).add(i)
+
+        self._universities = universities
+        self._judged_teams = judged_teams
+        self._rooms_by_user = {}
+
+    def get_rooms(self, user: int) -> set:
+        """
+        Румы, с которыми конфликтует судья
+        """
+        rooms = self._rooms_by_user.get(user)
+        if rooms is None:
+            university = self._universities.get(user)
+            rooms = set(self._rooms_by_university.get(university, ())) if university else set()
+            rooms.update(
+                self._room_by_team[team] for team in self._judged_teams.get(user, ()) if team in self._room_by_team
+            )
+            self._rooms_by_user[user] = rooms
+
+        return rooms
+
+
+class _Pool:
+    """
+    Свободные судьи по убыванию оценки. Занятые судьи убираются из начала списка лениво
+    """
+
+    def __init__(self, users: [int], scores: dict):
+        self._users = sorted(users, key=lambda x: -scores.get(x, 0))
+        self._start = 0
+        self._used = set()
+
+    def __len__(self):
+        return len(self._users) - len(self._used)
+
+    def take(self, room: int, conflicts: Conflicts, allow_conflict=True) -> [int, bool]:
+        """
+        Лучший свободный судья без конфликта с румом, если такого нет и allow_conflict - лучший свободный
+        :return: [user_id или None, есть ли конфликт]
+        """
+        while self._start < len(self._users) and self._users[self._start] in self._used:
+            self._start += 1
+
+        first = None
+        for i in range(self._start, len(self._users)):
+            user = self._users[i]
+            if user in self._used:
+                continue
+            if first is None:
+                first = user
+            if room not in conflicts.get_rooms(user):
+                self._used.add(user)
+                return [user, False]
+
+        if first is None or not allow_conflict:
+            return [None, False]
+        self._used.add(first)
+        return [first, True]
+
+    def get_free(self) -> [int]:
+        return [user for user in self._users[self._start:] if user not in self._used]
+
+
+def allocate_adjudicators(importance: [int], chairs: [int], wings: [int], scores: dict, conflicts: Conflicts,
+                          count_wings=COUNT_WINGS) -> ([dict], int):
+    """
+    Судьи для всех румов за один проход. Румы обходятся по убыванию важности (например, суммы баллов команд),
+    сначала каждый рум получает председателя, затем первое крыло, затем второе.
+    В каждый слот идёт судья с лучшей оценкой по фидбеку, не конфликтующий с румом.
+    Председатель с конфликтом ставится, только если свободных судей без конфликта нет, крыло - никогда.
+    Крылья - судьи wings и председатели, оставшиеся без рума; если судей не хватает, в менее важных румах крыльев нет
+
+    :param importance: важность румов, при равной важности румы идут в исходном порядке
+    :param chairs: id судей, которые могут быть председателями, при равной оценке - в исходном порядке
+    :param wings: id судей-крыльев
+    :param scores: {user_id: оценка}
+    :return: [{'chair', 'wings'}] по румам; число председателей с конфликтом
+    """
+    order = sorted(range(len(importance)), key=lambda x: -importance[x])
+    panels = [{'chair': None, 'wings': []} for _ in importance]
+    count_conflicts = 0
+
+    chair_pool = _Pool(chairs, scores)
+    for room in order:
+        panels[room]['chair'], is_conflict = chair_pool.take(room, conflicts)
+        count_conflicts += is_conflict
+
+    wing_pool = _Pool(chair_pool.get_free() + list(wings), scores)
+    for _ in range(count_wings):
+        for room in order:
+            if not len(wing_pool):
+                break
+            user = wing_pool.take(room, conflicts, False)[0]
+            if user is not None:
+                panels[room]['wings'].append(user)
+
+    return panels, count_conflicts
+
+
+def allocate_places(importance: [int], preferred: [int], count_places: int) -> [int]:
+    """
+    Аудитории для румов. Аудитории - индексы в списке по приоритету: первые - лучшие, соседние по списку - рядом.
+    Сначала румы с предпочтением (аудитория судьи или команд в прошлом раунде) по убыванию важности
+    получают её, если она свободна, иначе ближайшую к ней свободную.
+    Затем остальные румы по убыванию важности получают лучшие из свободных
+
+    :param preferred: индекс аудитории или None для каждого рума
+    :return: индекс аудитории для каждого рума, None если аудиторий не хватило
+    """
+    free = list(range(count_places))
+    places = [None] * len(importance)
+    order = sorted(range(len(importance)), key=lambda x: -importance[x])
+    for room in [i for i in order if preferred[i] is not None] + [i for i in order if preferred[i] is None]:
+        if not free:
+            break
+
+        target = preferred[room]
+        i = 0
+        if target is not None:
+            i = bisect.bisect_left(free, target)
+            # При равном расстоянии - аудитория с большим приоритетом
+            if i == len(free) or i > 0 and target - free[i - 1] <= free[i] - target:
+                i -= 1
+        places[room] = free.pop(i)
+
+    return places
+
+
+def get_feedback_score(answers: dict, skip=()) -> [float, None]:
+    """
+    Среднее числовых ответов фидбека, None если числовых ответов нет
+    """
+    values = []
+    for question, answer in answers.items():
+        if question in skip:
+            continue
+        try:
+            value = float(str(answer).replace(',', '.'))
+        except ValueError:
+            continue
+        if math.isfinite(value):
+            values.append(value)
+
+    return sum(values) / len(values) if values else None
+
+
+def get_room_importance(rooms: [[int]], points: dict) -> [int]:
+    """
+    Важность рума - сумма баллов команд, сильные сетки судят лучшие судьи
+    """
+    return [sum(points.get(team, 0) for team in room[:TEAM_IN_GAME]) for room in rooms]
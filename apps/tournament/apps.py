@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class TournamentConfig(AppConfig):
+    name = "apps.tournament"
+
+    def ready(self):
+        from . import signals
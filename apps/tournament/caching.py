@@ -0,0 +1,61 @@
+import functools
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(tournament_id):
+    return 'tournament/%s/results_version' % tournament_id
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def get_results_version(tournament_id) -> str:
+    key = _version_key(tournament_id)
+    version = cache.get(key)
+    if version is None:
+        # Если версия пропала из кэша, новая не должна совпасть со старыми ключами
+        version = _new_version()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+
+    return version
+
+
+def _bump(tournament_id):
+    # Не incr: в файловом кэше он не атомарный, и два одновременных увеличения дали бы одну версию.
+    # Каждая новая версия уникальна, поэтому при любом порядке записей старые ключи больше не читаются
+    cache.set(_version_key(tournament_id), _new_version(), None)
+
+
+def bump_results_version(tournament_id):
+    """
+    Сбрасывает закэшированные тэб, темы и результаты раундов турнира.
+    Версия меняется сразу и ещё раз после коммита, чтобы не осталось данных, закэшированных до коммита
+    """
+    if tournament_id is None:
+        return
+
+    _bump(tournament_id)
+    transaction.on_commit(lambda: _bump(tournament_id))
+
+
+def cache_by_results(func):
+    """
+    Кэширует результат func(tournament) до следующего изменения результатов турнира
+    """
+    @functools.wraps(func)
+    def wrapper(tournament):
+        key = 'tournament/%s/%s/%s' % (tournament.id, get_results_version(tournament.id), func.__name__)
+        data = cache.get(key)
+        if data is None:
+            data = func(tournament)
+            cache.set(key, data, getattr(settings, 'TAB_CACHE_TIMEOUT', 60 * 60))
+
+        return data
+
+    return wrapper
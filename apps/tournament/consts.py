@@ -1,38 +1,39 @@
 from enum import Enum
+from .draw import TEAM_IN_GAME
 from .messages import *
 from .models import \
     CustomFormType, \
     CustomFieldAlias, \
     TournamentRole, \
     TournamentStatus
+from .registry import registry
 
-TEAM_IN_GAME = 4
 POINTS_OF_FIRST_PLACE = 3
 POINTS_OF_SECOND_PLACE = 2
 
 Position = Enum('Position', 'OG OO CG CO NONE')
 
-ROLE_OWNER = TournamentRole.objects.filter(role_en='Owner').first()
-ROLE_ADMIN = TournamentRole.objects.filter(role_en='Admin').first()
-ROLE_CHIEF_ADJUDICATOR = TournamentRole.objects.filter(role_en='Chief adjudicator').first()
+ROLE_OWNER = registry.lazy(TournamentRole, 'role_en', 'Owner')
+ROLE_ADMIN = registry.lazy(TournamentRole, 'role_en', 'Admin')
+ROLE_CHIEF_ADJUDICATOR = registry.lazy(TournamentRole, 'role_en', 'Chief adjudicator')
 
-ROLE_TEAM_REGISTERED = TournamentRole.objects.filter(role_en='Registered').first()
-ROLE_IN_TAB = TournamentRole.objects.filter(role_en='In tab').first()
-ROLE_WAIT_LIST = TournamentRole.objects.filter(role_en='Wait list').first()
-ROLE_VERIFIED = TournamentRole.objects.filter(role_en='Verified').first()  # Участник подтвердил участие
-ROLE_APPROVED = TournamentRole.objects.filter(role_en='Approved').first()  # Организатор подтвердил
-ROLE_MEMBER = TournamentRole.objects.filter(role_en='Member').first()
+ROLE_TEAM_REGISTERED = registry.lazy(TournamentRole, 'role_en', 'Registered')
+ROLE_IN_TAB = registry.lazy(TournamentRole, 'role_en', 'In tab')
+ROLE_WAIT_LIST = registry.lazy(TournamentRole, 'role_en', 'Wait list')
+ROLE_VERIFIED = registry.lazy(TournamentRole, 'role_en', 'Verified')  # Участник подтвердил участие
+ROLE_APPROVED = registry.lazy(TournamentRole, 'role_en', 'Approved')  # Организатор подтвердил
+ROLE_MEMBER = registry.lazy(TournamentRole, 'role_en', 'Member')
 
-ROLE_ADJUDICATOR_REGISTERED = TournamentRole.objects.filter(role_en='Registered adjudicator').first()
-ROLE_ADJUDICATOR_APPROVED = TournamentRole.objects.filter(role_en='Approved adjudicator').first()
-ROLE_WING = TournamentRole.objects.filter(role_en='Wing').first()
-ROLE_CHAIR = TournamentRole.objects.filter(role_en='Chair').first()
+ROLE_ADJUDICATOR_REGISTERED = registry.lazy(TournamentRole, 'role_en', 'Registered adjudicator')
+ROLE_ADJUDICATOR_APPROVED = registry.lazy(TournamentRole, 'role_en', 'Approved adjudicator')
+ROLE_WING = registry.lazy(TournamentRole, 'role_en', 'Wing')
+ROLE_CHAIR = registry.lazy(TournamentRole, 'role_en', 'Chair')
 
-STATUS_REGISTRATION = TournamentStatus.objects.filter(name_en='Registration open').first()
-STATUS_PREPARATION = TournamentStatus.objects.filter(name_en='Registration closed').first()
-STATUS_STARTED = TournamentStatus.objects.filter(name_en='Qualification').first()
-STATUS_PLAYOFF = TournamentStatus.objects.filter(name_en='Playoff').first()
-STATUS_FINISHED = TournamentStatus.objects.filter(name_en='Finished').first()
+STATUS_REGISTRATION = registry.lazy(TournamentStatus, 'name_en', 'Registration open')
+STATUS_PREPARATION = registry.lazy(TournamentStatus, 'name_en', 'Registration closed')
+STATUS_STARTED = registry.lazy(TournamentStatus, 'name_en', 'Qualification')
+STATUS_PLAYOFF = registry.lazy(TournamentStatus, 'name_en', 'Playoff')
+STATUS_FINISHED = registry.lazy(TournamentStatus, 'name_en', 'Finished')
 
 TEAM_ROLES_NAMES = [
     'Registered',
@@ -50,13 +51,13 @@ ADJUDICATOR_ROLES_NAMES = [
     'Chair',
 ]
 
-TEAM_ROLES = TournamentRole.objects.filter(role_en__in=TEAM_ROLES_NAMES)
-ADJUDICATOR_ROLES = TournamentRole.objects.filter(role_en__in=ADJUDICATOR_ROLES_NAMES)
+TEAM_ROLES = registry.lazy_list(TournamentRole, 'role_en', TEAM_ROLES_NAMES)
+ADJUDICATOR_ROLES = registry.lazy_list(TournamentRole, 'role_en', ADJUDICATOR_ROLES_NAMES)
 
-FORM_REGISTRATION_TYPE = CustomFormType.objects.filter(name='teams').first()
-FORM_FEEDBACK_TYPE = CustomFormType.objects.filter(name='feedback').first()
-FORM_ADJUDICATOR_TYPE = CustomFormType.objects.filter(name='adjudicator').first()
-# FORM_AUDIENCE_TYPE = CustomFormType.objects.filter(name='audience').first()
+FORM_REGISTRATION_TYPE = registry.lazy(CustomFormType, 'name', 'teams')
+FORM_FEEDBACK_TYPE = registry.lazy(CustomFormType, 'name', 'feedback')
+FORM_ADJUDICATOR_TYPE = registry.lazy(CustomFormType, 'name', 'adjudicator')
+# FORM_AUDIENCE_TYPE = registry.lazy(CustomFormType, 'name', 'audience')
 
 CUSTOM_FORM_TYPES = {
     'team': FORM_REGISTRATION_TYPE,
@@ -65,31 +66,32 @@ CUSTOM_FORM_TYPES = {
     # 'audience': FORM_AUDIENCE_TYPE,
 }
 
-CUSTOM_FORM_QUESTIONS_TITLES = {
+# Словари с объектами в ключах собираются при первом обращении, иначе хэш ключа загрузил бы их при импорте
+CUSTOM_FORM_QUESTIONS_TITLES = registry.lazy_value(lambda: {
     FORM_REGISTRATION_TYPE: TITLE_CUSTOM_FORM_QUESTIONS_FOR_TEAM,
     FORM_ADJUDICATOR_TYPE: TITLE_CUSTOM_FORM_QUESTIONS_FOR_ADJUDICATOR,
     FORM_FEEDBACK_TYPE: TITLE_CUSTOM_FORM_QUESTIONS_FOR_FEEDBACK,
-}
+})
 
-CUSTOM_FORM_ANSWERS_TITLES = {
+CUSTOM_FORM_ANSWERS_TITLES = registry.lazy_value(lambda: {
     FORM_REGISTRATION_TYPE: TITLE_CUSTOM_FORM_ANSWERS_FOR_TEAM,
     FORM_ADJUDICATOR_TYPE: TITLE_CUSTOM_FORM_ANSWERS_FOR_ADJUDICATOR,
     FORM_FEEDBACK_TYPE: TITLE_CUSTOM_FORM_ANSWERS_FOR_FEEDBACK,
-}
+})
 
-FIELD_ALIAS_SPEAKER_1 = CustomFieldAlias.objects.filter(name='speaker_1_email').first()
-# FIELD_ALIAS_SPEAKER_1_F_NAME = CustomFieldAlias.objects.filter(name='speaker_1_first_name').first()
-# FIELD_ALIAS_SPEAKER_1_L_NAME = CustomFieldAlias.objects.filter(name='speaker_1_last_name').first()
-# FIELD_ALIAS_SPEAKER_1_UNIVERSITY = CustomFieldAlias.objects.filter(name='speaker_1_university').first()
-FIELD_ALIAS_SPEAKER_2 = CustomFieldAlias.objects.filter(name='speaker_2_email').first()
-# FIELD_ALIAS_SPEAKER_2_F_NAME = CustomFieldAlias.objects.filter(name='speaker_2_first_name').first()
-# FIELD_ALIAS_SPEAKER_2_L_NAME = CustomFieldAlias.objects.filter(name='speaker_2_last_name').first()
-# FIELD_ALIAS_SPEAKER_2_UNIVERSITY = CustomFieldAlias.objects.filter(name='speaker_2_university').first()
-FIELD_ALIAS_TEAM = CustomFieldAlias.objects.filter(name='team_name').first()
+FIELD_ALIAS_SPEAKER_1 = registry.lazy(CustomFieldAlias, 'name', 'speaker_1_email')
+# FIELD_ALIAS_SPEAKER_1_F_NAME = registry.lazy(CustomFieldAlias, 'name', 'speaker_1_first_name')
+# FIELD_ALIAS_SPEAKER_1_L_NAME = registry.lazy(CustomFieldAlias, 'name', 'speaker_1_last_name')
+# FIELD_ALIAS_SPEAKER_1_UNIVERSITY = registry.lazy(CustomFieldAlias, 'name', 'speaker_1_university')
+FIELD_ALIAS_SPEAKER_2 = registry.lazy(CustomFieldAlias, 'name', 'speaker_2_email')
+# FIELD_ALIAS_SPEAKER_2_F_NAME = registry.lazy(CustomFieldAlias, 'name', 'speaker_2_first_name')
+# FIELD_ALIAS_SPEAKER_2_L_NAME = registry.lazy(CustomFieldAlias, 'name', 'speaker_2_last_name')
+# FIELD_ALIAS_SPEAKER_2_UNIVERSITY = registry.lazy(CustomFieldAlias, 'name', 'speaker_2_university')
+FIELD_ALIAS_TEAM = registry.lazy(CustomFieldAlias, 'name', 'team_name')
 
-FIELD_ALIAS_ADJUDICATOR = CustomFieldAlias.objects.filter(name='adjudicator').first()
+FIELD_ALIAS_ADJUDICATOR = registry.lazy(CustomFieldAlias, 'name', 'adjudicator')
 
-CUSTOM_FIELD_SETS = {
+CUSTOM_FIELD_SETS = registry.lazy_value(lambda: {
     FORM_REGISTRATION_TYPE: [
         (FIELD_ALIAS_TEAM, LBL_CUSTOM_FIELD_TEAM, True),
         (FIELD_ALIAS_SPEAKER_1, LBL_CUSTOM_FIELD_SPEAKER_1_EMAIL, True),
@@ -98,7 +100,7 @@ CUSTOM_FIELD_SETS = {
     FORM_ADJUDICATOR_TYPE: [
         (FIELD_ALIAS_ADJUDICATOR, LBL_CUSTOM_FIELD_ADJUDICATOR, True),
     ],
-}
+})
 
 REQUIRED_ALIASES = [
     FIELD_ALIAS_SPEAKER_1,
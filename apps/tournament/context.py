@@ -0,0 +1,103 @@
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+from .consts import ADJUDICATOR_ROLES, FORM_FEEDBACK_TYPE, STATUS_PLAYOFF, STATUS_STARTED
+from .logic import \
+    _get_last_round, \
+    get_rooms_by_user, \
+    get_rooms_from_last_round, \
+    get_user_roles, \
+    user_can_edit_tournament
+from .models import CustomForm, Room, Tournament
+
+
+class TournamentContext:
+    """
+    Данные турнира на один запрос: создаётся в access_by_status и лежит в request.tournament_context.
+    Каждое значение запрашивается из базы один раз, сколько бы раз его ни прочитали view и шаблон
+    """
+
+    def __init__(self, request, tournament: Tournament):
+        self.request = request
+        self.tournament = tournament
+        self.user = request.user
+
+    @staticmethod
+    def load(request, tournament_id) -> 'TournamentContext':
+        tournament = get_object_or_404(Tournament.objects.select_related('status'), pk=tournament_id)
+        request.tournament_context = TournamentContext(request, tournament)
+        return request.tournament_context
+
+    @staticmethod
+    def get(request, tournament: Tournament) -> 'TournamentContext':
+        """
+        Контекст из access_by_status или новый, если view вызвана без декоратора
+        """
+        context = getattr(request, 'tournament_context', None)
+        if context is None or context.tournament.id != tournament.id:
+            context = request.tournament_context = TournamentContext(request, tournament)
+        return context
+
+    @property
+    def roles(self) -> set:
+        return get_user_roles(self.tournament, self.user)
+
+    def can_edit(self, only_owner=False) -> bool:
+        return user_can_edit_tournament(self.tournament, self.user, only_owner)
+
+    @cached_property
+    def is_owner(self) -> bool:
+        return self.can_edit()
+
+    @cached_property
+    def is_started(self) -> bool:
+        return self.tournament.status in [STATUS_PLAYOFF, STATUS_STARTED]
+
+    @cached_property
+    def last_round(self):
+        return _get_last_round(self.tournament)
+
+    @cached_property
+    def rooms(self) -> [Room]:
+        """
+        Комнаты последнего раунда по порядку id
+        """
+        if not self.last_round:
+            return []
+        return list(get_rooms_from_last_round(self.tournament, last_round=self.last_round))
+
+    @cached_property
+    def chair_rooms(self) -> [Room]:
+        """
+        Комнаты последнего раунда, где текущий пользователь - председатель
+        """
+        if not self.user.is_authenticated:
+            return []
+        return [room for room in self.rooms if room.game.chair_id == self.user.id]
+
+    @cached_property
+    def is_chair(self) -> bool:
+        if not self.user.is_authenticated or not self.is_started or not self.last_round:
+            return False
+        return Room.objects.filter(round=self.last_round, game__chair=self.user).exists()
+
+    @cached_property
+    def user_rooms(self) -> [Room]:
+        """
+        Комнаты отборочных раундов команды текущего пользователя
+        """
+        if not self.user.is_authenticated:
+            return []
+        return list(get_rooms_by_user(self.tournament, self.user))
+
+    @cached_property
+    def has_feedback_form(self) -> bool:
+        return CustomForm.objects.filter(tournament=self.tournament, form_type=FORM_FEEDBACK_TYPE).exists()
+
+    @cached_property
+    def teams(self) -> list:
+        return list(self.tournament.get_teams())
+
+    @cached_property
+    def adjudicators(self) -> list:
+        return list(self.tournament.get_users(ADJUDICATOR_ROLES))
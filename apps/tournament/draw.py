@@ -0,0 +1,282 @@
+import heapq
+import itertools
+import multiprocessing
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+
+# Модуль не импортирует модели: он загружается в процессах ProcessPoolExecutor без django.setup().
+# Процессы запускаются через spawn, а не fork: search_draw вызывается из потока обработчика задач
+TEAM_IN_GAME = 4
+
+# Цена одной повторной встречи двух команд, складывается с дисбалансом позиций
+REPEAT_OPPONENT_COST = 10
+# Сколько соседних румов в каждую сторону просматривать при обмене команд и сколько делать проходов
+REPEAT_WINDOW = 2
+REPEAT_PASSES = 3
+
+
+def position_cost(position_counts: [int], position: int) -> int:
+    """
+    Цена позиции для команды - квадрат числа игр, уже сыгранных на этой позиции
+    """
+    return position_counts[position] ** 2
+
+
+def assign_positions(costs: [[int]], capacity: [int]) -> ([int], int):
+    """
+    Назначение с минимальной суммарной ценой: каждой строке (команде) одна позиция,
+    на позицию p не больше capacity[p] строк.
+
+    Последовательные кратчайшие пути: команды добавляются по одной, новая команда встаёт на позицию,
+    а уже расставленные команды при необходимости переходят с позиции на позицию по самой дешёвой цепочке.
+    Позиций всего 4, поэтому цепочку ищет Беллман-Форд по 4 вершинам, а самый дешёвый переход
+    p -> q для каждой пары хранится в куче.
+
+    :return: позиция для каждой строки, суммарная цена
+    """
+    count_positions = len(capacity)
+    assign = [-1] * len(costs)
+    load = [0] * count_positions
+    # moves[p][q] - куча (цена перехода команды с p на q, команда)
+    moves = [[[] for _ in range(count_positions)] for _ in range(count_positions)]
+
+    def _place(team, position):
+        assign[team] = position
+        load[position] += 1
+        for other in range(count_positions):
+            if other != position:
+                heapq.heappush(moves[position][other], (costs[team][other] - costs[team][position], team))
+
+    def _cheapest_move(p, q):
+        heap = moves[p][q]
+        while heap and assign[heap[0][1]] != p:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    for team in range(len(costs)):
+        dist = list(costs[team])
+        prev = [None] * count_positions
+        for _ in range(count_positions - 1):
+            for p in range(count_positions):
+                if not load[p]:
+                    continue
+                for q in range(count_positions):
+                    move = _cheapest_move(p, q) if p != q else None
+                    if move and dist[p] + move[0] < dist[q]:
+                        dist[q] = dist[p] + move[0]
+                        prev[q] = (p, move[1])
+
+        target = min(
+            [p for p in range(count_positions) if load[p] < capacity[p]],
+            key=lambda p: dist[p]
+        )
+
+        # Сдвигаем команды по цепочке, начиная с конца, чтобы освободить место в её начале
+        path = []
+        position = target
+        while prev[position] is not None:
+            path.append(prev[position] + (position, ))
+            position = prev[position][0]
+
+        for source, moved_team, destination in path:
+            load[source] -= 1
+            _place(moved_team, destination)
+
+        _place(team, position)
+
+    return assign, sum(costs[team][assign[team]] for team in range(len(costs)))
+
+
+def _best_permutation(teams: [int], positions: [[int]]) -> ([int], int):
+    best, best_cost = None, None
+    for game in itertools.permutations(teams):
+        cost = sum(position_cost(positions[team], i) for i, team in enumerate(game))
+        if best is None or cost < best_cost:
+            best, best_cost = list(game), cost
+
+    return best, best_cost
+
+
+class OpponentHistory:
+    """
+    Разреженная матрица встреч команд: met[a][b] - сколько раз команды a и b играли в одной комнате.
+    Заполняется по одной игре, хранятся только встречавшиеся пары
+    """
+
+    def __init__(self, games=()):
+        self.met = {}
+        for game in games:
+            self.add_game(game)
+
+    def add_game(self, game: [int]):
+        for a, b in itertools.permutations(game, 2):
+            opponents = self.met.setdefault(a, {})
+            opponents[b] = opponents.get(b, 0) + 1
+
+    def count(self, team: int, other: int) -> int:
+        return self.met.get(team, {}).get(other, 0)
+
+    def count_in_room(self, team: int, room: [int]) -> int:
+        """
+        Сколько раз team встречалась с остальными командами room
+        """
+        opponents = self.met.get(team)
+        if not opponents:
+            return 0
+        return sum(opponents.get(other, 0) for other in room if other != team)
+
+    def count_repeats(self, rooms: [[int]]) -> int:
+        return sum(
+            self.count(a, b)
+            for room in rooms
+            for a, b in itertools.combinations(room, 2)
+        )
+
+
+def count_repeat_opponents(rooms: [[int]], history: [[int]]) -> int:
+    """
+    Сколько раз команды в румах уже встречались друг с другом в играх из history
+    """
+    return OpponentHistory(history).count_repeats(rooms)
+
+
+def _avoid_repeats(rooms: [[int]], points: [int], positions: [[int]], history: OpponentHistory, window: int) -> int:
+    """
+    Локальный поиск: команда меняется местом с командой с теми же баллами из соседних window румов
+    (в том числе из соседней сетки), если это уменьшает дисбаланс позиций + REPEAT_OPPONENT_COST * повторы.
+    Баллы в каждом руме не меняются. Румы меняются на месте.
+    Проходов не больше REPEAT_PASSES, каждый - O(число команд * window)
+
+    :return: изменение дисбаланса позиций
+    """
+    def _swap_gain(r, i, s, j):
+        a, b = rooms[r][i], rooms[s][j]
+        repeats = history.count_in_room(a, rooms[r]) + history.count_in_room(b, rooms[s]) \
+            - history.count_in_room(a, rooms[s]) + history.count(a, b) \
+            - history.count_in_room(b, rooms[r]) + history.count(b, a)
+        imbalance = position_cost(positions[a], i) + position_cost(positions[b], j) \
+            - position_cost(positions[a], j) - position_cost(positions[b], i)
+        return REPEAT_OPPONENT_COST * repeats + imbalance, imbalance
+
+    imbalance_change = 0
+    for _ in range(REPEAT_PASSES):
+        is_changed = False
+        for r, room in enumerate(rooms):
+            for i in range(len(room)):
+                if not history.count_in_room(room[i], room):
+                    continue
+
+                best = None
+                for s in range(max(0, r - window), min(len(rooms), r + window + 1)):
+                    if s == r:
+                        continue
+                    for j, other in enumerate(rooms[s]):
+                        if points[other] != points[room[i]]:
+                            continue
+                        gain, imbalance = _swap_gain(r, i, s, j)
+                        if gain > 0 and (best is None or gain > best[0]):
+                            best = (gain, imbalance, s, j)
+
+                if best:
+                    gain, imbalance, s, j = best
+                    room[i], rooms[s][j] = rooms[s][j], room[i]
+                    imbalance_change -= imbalance
+                    is_changed = True
+
+        if not is_changed:
+            break
+
+    return imbalance_change
+
+
+def make_draw(points: [int], positions: [[int]], rand=random, history=None, window=REPEAT_WINDOW) -> ([[int]], int):
+    """
+    Рассадка отборочного раунда по тэбу.
+
+    Команды упорядочиваются по баллам (внутри одинаковых баллов случайно) и по четыре делятся на румы.
+    Румы, где у всех команд одинаковые баллы, образуют сетку; внутри сетки команды могут меняться румами,
+    поэтому позиции для всей сетки выбираются одним назначением (assign_positions).
+    Румы со смешанными баллами решаются перебором 24 перестановок.
+    Если передана history (OpponentHistory или список игр), повторные встречи убираются обменами (_avoid_repeats).
+
+    :param points: баллы команд
+    :param positions: [og, oo, cg, co] - сколько раз команда была на каждой позиции
+    :return: румы [[og, oo, cg, co]] из индексов команд, по убыванию баллов; суммарный дисбаланс позиций
+    """
+    order = list(range(len(points)))
+    rand.shuffle(order)
+    order.sort(key=lambda x: -points[x])
+
+    rooms = []
+    imbalance = 0
+    brackets = itertools.groupby(
+        [order[i:i + TEAM_IN_GAME] for i in range(0, len(order) - TEAM_IN_GAME + 1, TEAM_IN_GAME)],
+        key=lambda room: points[room[0]] if points[room[0]] == points[room[-1]] else None
+    )
+    for bracket_points, bracket_rooms in brackets:
+        bracket_rooms = list(bracket_rooms)
+        if bracket_points is None:
+            for room in bracket_rooms:
+                game, cost = _best_permutation(room, positions)
+                rooms.append(game)
+                imbalance += cost
+            continue
+
+        teams = [team for room in bracket_rooms for team in room]
+        assign, cost = assign_positions(
+            [[position_cost(positions[team], i) for i in range(TEAM_IN_GAME)] for team in teams],
+            [len(bracket_rooms)] * TEAM_IN_GAME
+        )
+        imbalance += cost
+
+        by_position = [[] for _ in range(TEAM_IN_GAME)]
+        for team, position in zip(teams, assign):
+            by_position[position].append(team)
+        for i in by_position:
+            rand.shuffle(i)
+
+        rooms += [list(game) for game in zip(*by_position)]
+
+    if history is not None and window:
+        if not isinstance(history, OpponentHistory):
+            history = OpponentHistory(history)
+        imbalance += _avoid_repeats(rooms, points, positions, history, window)
+
+    return rooms, imbalance
+
+
+def _make_scored_draw(args) -> dict:
+    points, positions, history, window, seed = args
+    history = OpponentHistory(history)
+    rooms, imbalance = make_draw(points, positions, random.Random(seed), history, window)
+    repeats = history.count_repeats(rooms)
+
+    return {
+        'seed': seed,
+        'rooms': rooms,
+        'imbalance': imbalance,
+        'repeats': repeats,
+        'score': imbalance + REPEAT_OPPONENT_COST * repeats,
+    }
+
+
+def search_draw(points: [int], positions: [[int]], history: [[int]], seeds: [int], workers=None,
+                window=REPEAT_WINDOW) -> dict:
+    """
+    Рассадки make_draw для каждого seed (параллельно в процессах, если seed больше одного),
+    возвращает лучшую по дисбалансу позиций и повторным встречам.
+    Та же рассадка получается make_draw с её seed, history и window
+
+    :param history: прошлые игры из индексов команд
+    :return: {seed, rooms, imbalance, repeats, score}
+    """
+    tasks = [(points, positions, history, window, seed) for seed in seeds]
+    if len(tasks) == 1 or workers == 1:
+        results = list(map(_make_scored_draw, tasks))
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            results = list(executor.map(_make_scored_draw, tasks))
+
+    return min(results, key=lambda x: x['score'])
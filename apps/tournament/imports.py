@@ -1,20 +1,29 @@
+import csv
 import gspread
+import io
 import logging
+import os
 from django import forms
+from django.db import transaction
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from oauth2client.service_account import ServiceAccountCredentials
 from .messages import *
-from .models import Tournament, User
+from .models import TeamTournamentRel, Tournament, User
 from .consts import ROLE_MEMBER
 from .models import Team
+from .tasks import enqueue
 
 
 class TeamImportForm(forms.Form):
-    url = forms.URLField(widget=forms.URLInput(attrs={
+    url = forms.URLField(required=False, widget=forms.URLInput(attrs={
         'class': 'form-elem__input',
         'placeholder': 'Скопируйте ссылку из адресной строки браузера'
     }), label=MSG_TEAM_URL)
+    file = forms.FileField(required=False, widget=forms.ClearableFileInput(attrs={
+        'class': 'form-elem__input',
+        'accept': '.csv,.xlsx',
+    }), label=MSG_TEAM_FILE)
     team_name = forms.CharField(widget=forms.TextInput(attrs={
         'class': 'form-elem__input',
         'placeholder': 'Скопируйте текст c названием колонки из ячейки таблицы'
@@ -39,6 +48,18 @@ class TeamImportForm(forms.Form):
     }), label=MSG_S2_NAME)
 
 
+    def clean(self):
+        cleaned_data = super().clean()
+        url, file = cleaned_data.get('url'), cleaned_data.get('file')
+        if not url and not file:
+            raise forms.ValidationError('Укажите ссылку на таблицу или загрузите файл')
+
+        if file and os.path.splitext(file.name)[1].lower() not in ImportTeam.FILE_READERS:
+            raise forms.ValidationError('Поддерживаются файлы CSV и XLSX')
+
+        return cleaned_data
+
+
 class ImportTeam:
 
     NUMBER_TITLE_ROW = 1
@@ -48,8 +69,15 @@ class ImportTeam:
     STATUS_EXIST = 'exist'
     STATUS_FAIL = 'error'
 
+    # Спикер в результате, колонки его e-mail и имени
+    SPEAKER_COLUMNS = [
+        ('s1', MSG_S1_EMAIL, MSG_S1_NAME),
+        ('s2', MSG_S2_EMAIL, MSG_S2_NAME),
+    ]
+
     def __init__(self, import_form: TeamImportForm):
         self.url = import_form.cleaned_data['url']
+        self.file = import_form.cleaned_data.get('file')
         self.alias = {
             MSG_TEAM_NAME: import_form.cleaned_data['team_name'],
             MSG_S1_NAME: import_form.cleaned_data['speaker_1_name'],
@@ -58,8 +86,14 @@ class ImportTeam:
             MSG_S2_EMAIL: import_form.cleaned_data['speaker_2_email'],
         }
         self.worksheet = None
-        self.cells = {}
+        # Строки загруженного файла, читаются по одной
+        self.file_rows = None
+        self.file_titles = []
+        self.info = 'Импортирована из Google Docs'
+        # alias -> номер колонки
+        self.columns = {}
         self.results = []
+        self.new_users = []
 
     def connect_to_worksheet(self):
         try:
@@ -74,52 +108,167 @@ class ImportTeam:
             logging.error(str(exception))
             raise Exception('Неудалось скачать файл')
 
+    def open_file(self):
+        extension = os.path.splitext(self.file.name)[1].lower()
+        try:
+            self.file_rows = getattr(ImportTeam, ImportTeam.FILE_READERS[extension])(self.file)
+            # Читаем заголовки сразу, чтобы ошибка формата была видна здесь
+            self.file_titles = next(self.file_rows, [])
+        except Exception as exception:
+            logging.error(str(exception))
+            raise Exception('Не удалось прочитать файл')
+        self.info = 'Импортирована из файла'
+
+    def open(self):
+        if self.file:
+            self.open_file()
+        else:
+            self.connect_to_worksheet()
+
+    @staticmethod
+    def read_csv(file):
+        """
+        Строки CSV по одной; разделитель (запятая или точка с запятой из Excel) определяется по началу файла
+        """
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+
+        for row in csv.reader(text, dialect):
+            yield row
+
+    @staticmethod
+    def read_xlsx(file):
+        """
+        Строки первого листа XLSX по одной, в режиме read_only openpyxl не загружает лист целиком
+        """
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield ['' if value is None else str(value) for value in row]
+        finally:
+            workbook.close()
+
+    FILE_READERS = {
+        '.csv': 'read_csv',
+        '.xlsx': 'read_xlsx',
+    }
+
     def read_titles(self):
+        """
+        Находит колонки по заголовкам из первой строки
+        """
+        if self.file_rows is not None:
+            titles = self.file_titles
+        else:
+            titles = self.worksheet.row_values(self.NUMBER_TITLE_ROW)
+        titles = [str(title).strip() for title in titles]
+
         for key in self.alias.keys():
-            try:
-                self.cells[key] = self.worksheet.find(self.alias[key])
-            except gspread.CellNotFound:
-                raise Exception('Поле "%s" не найдено' % self.alias[key])
+            if self.alias[key].strip() not in titles:
+                raise Exception('Поле "%s" не найдено в заголовках колонок' % self.alias[key])
 
-            if self.cells[key].row != self.NUMBER_TITLE_ROW:
-                raise Exception('Поле "%s" должно быть заголовком колонки' % self.alias[key])
+            self.columns[key] = titles.index(self.alias[key].strip())
 
     def import_teams(self, tournament: Tournament, is_test):
-        for row in self.worksheet.get_all_values()[self.NUMBER_TITLE_ROW:]:
-            result = {}
-            user_1 = None
-            user_2 = None
-            try:
-                result['s1'] = {}
-                result['s1']['user'] = None
-                result['s1']['email'] = row[self.cells[MSG_S1_EMAIL].col - 1].strip()
-                result['s1']['status'], user_1 = ImportTeam.import_user(
-                    result['s1']['email'],
-                    row[self.cells[MSG_S1_NAME].col - 1],
-                    tournament,
-                    is_test
-                )
-            except Exception as ex:
-                result['s1']['status'] = self.STATUS_FAIL
-                result['s1']['error'] = str(ex)
+        return self.import_rows(tournament, is_test, self.read_rows())
+
+    def read_rows(self):
+        """
+        Строки таблицы в виде {alias: значение}; пустые строки пропускаются
+        """
+        if self.file_rows is not None:
+            rows = self.file_rows
+        else:
+            rows = self.worksheet.get_all_values()[self.NUMBER_TITLE_ROW:]
+
+        for row in rows:
+            if not any(str(value).strip() for value in row):
+                continue
+            yield {key: row[col] if col < len(row) else '' for key, col in self.columns.items()}
+
+    def import_rows(self, tournament: Tournament, is_test, rows):
+        """
+        Импортирует строки {alias: значение} пачкой: пользователи ищутся одним запросом,
+        новые пользователи, команды и участие в турнире создаются bulk_create в одной транзакции
+        """
+        self.results = [self._parse_row(row) for row in rows]
+
+        with transaction.atomic():
+            rows_users = self._resolve_users(is_test)
+            self._add_teams(tournament, is_test, rows_users)
 
+            # Письма новым пользователям уходят одной рассылкой после импорта, без повторов:
+            # повтор сменил бы пароли тем, кому письмо уже пришло
+            if self.new_users and not is_test:
+                enqueue('import_emails', [user.id for user in self.new_users], tournament.id, max_attempts=1)
+
+        return self.results
+
+    def _parse_row(self, row: dict) -> dict:
+        result = {'team': {'name': row[MSG_TEAM_NAME].strip()}}
+        for speaker, email_key, name_key in self.SPEAKER_COLUMNS:
+            result[speaker] = {'user': None, 'email': row[email_key].strip(), 'name': row[name_key]}
             try:
-                result['s2'] = {}
-                result['s2']['user'] = None
-                result['s2']['email'] = row[self.cells[MSG_S2_EMAIL].col - 1].strip()
-                result['s2']['status'], user_2 = ImportTeam.import_user(
-                    result['s2']['email'],
-                    row[self.cells[MSG_S2_NAME].col - 1],
-                    tournament,
-                    is_test
-                )
+                ImportTeam.check_email(result[speaker]['email'])
             except Exception as ex:
-                result['s2']['status'] = self.STATUS_FAIL
-                result['s2']['error'] = str(ex)
+                result[speaker]['status'] = self.STATUS_FAIL
+                result[speaker]['error'] = str(ex)
+
+        return result
+
+    def _resolve_users(self, is_test) -> [list]:
+        """
+        Находит или создаёт спикеров всех строк. Логин нового пользователя - начало e-mail,
+        если он уже занят, спикер не импортируется: иначе bulk_create откатил бы весь импорт
+        :return: [user_1, user_2] для каждой строки, None - если e-mail с ошибкой
+        """
+        speakers = [result[i] for result in self.results for i, _, _ in self.SPEAKER_COLUMNS]
+        emails = [i['email'] for i in speakers if 'status' not in i]
+        users, usernames = User.get_for_import(
+            {email.lower() for email in emails}, {User.build(email, '').username for email in emails}
+        )
 
+        for speaker in speakers:
+            if 'status' in speaker:
+                continue
+
+            user = users.get(speaker['email'].lower())
+            if user:
+                speaker['status'] = self.STATUS_EXIST
+            else:
+                user = User.build(speaker['email'], speaker['name'])
+                if user.username in usernames:
+                    speaker['status'] = self.STATUS_FAIL
+                    speaker['error'] = 'Логин %s уже занят' % user.username
+                    continue
+
+                usernames.add(user.username)
+                users[speaker['email'].lower()] = user
+                self.new_users.append(user)
+                speaker['status'] = self.STATUS_ADD
+            speaker['found'] = user
+
+        if self.new_users and not is_test:
+            User.bulk_create_confirmed(self.new_users)
+
+        return [[result[i].pop('found', None) for i, _, _ in self.SPEAKER_COLUMNS] for result in self.results]
+
+    def _add_teams(self, tournament: Tournament, is_test, rows_users: [list]):
+        teams_by_name = {}
+        teams = Team.objects.filter(teamtournamentrel__tournament=tournament).select_related('speaker_1', 'speaker_2')
+        for team in teams.distinct():
+            teams_by_name.setdefault(team.name, []).append(team)
+
+        new_teams = []
+        for result, (user_1, user_2) in zip(self.results, rows_users):
             try:
-                result['team'] = {}
-                result['team']['name'] = row[self.cells[MSG_TEAM_NAME].col - 1].strip()
                 if not result['team']['name']:
                     raise Exception('Название команды не должно быть пустым')
 
@@ -133,7 +282,7 @@ class ImportTeam:
 
                 result['s2']['user'] = user_2
 
-                teams = tournament.team_members.filter(name=result['team']['name'])
+                teams = teams_by_name.get(result['team']['name'])
                 if teams:
                     result['team']['status'] = ImportTeam.STATUS_FAIL
                     result['team']['error'] = 'Команда с таким же названием уже участвует в турнире'
@@ -145,24 +294,24 @@ class ImportTeam:
                             break
 
                 else:
-                    if not is_test:
-                        tournament.teamtournamentrel_set.create(
-                            role=ROLE_MEMBER,
-                            team=Team.objects.create(
-                                name=result['team']['name'],
-                                speaker_1=user_1,
-                                speaker_2=user_2,
-                                info='Импортирована из Google Docs'
-                            )
-                        )
+                    team = Team(
+                        name=result['team']['name'],
+                        speaker_1=user_1,
+                        speaker_2=user_2,
+                        info=self.info
+                    )
+                    teams_by_name[team.name] = [team]
+                    new_teams.append(team)
                     result['team']['status'] = ImportTeam.STATUS_ADD
             except Exception as ex:
                 result['team']['status'] = self.STATUS_FAIL
                 result['team']['error'] = str(ex)
 
-            self.results.append(result)
-
-        return self.results
+        if new_teams and not is_test:
+            Team.objects.bulk_create(new_teams)
+            TeamTournamentRel.objects.bulk_create([
+                TeamTournamentRel(team=team, tournament=tournament, role=ROLE_MEMBER) for team in new_teams
+            ])
 
     @staticmethod
     def check_email(email: str):
@@ -170,17 +319,3 @@ class ImportTeam:
             validate_email(email)
         except ValidationError:
             raise Exception('Неверный e-mail')
-
-    @staticmethod
-    def import_user(email: str, full_name: str, tournament: Tournament, is_test: bool):
-        ImportTeam.check_email(email)
-        user, is_exist = User.get_or_create(email, full_name, is_test)
-
-        status = ImportTeam.STATUS_EXIST
-        if not is_exist:
-            status = ImportTeam.STATUS_ADD
-            if not is_test:
-                password = user.set_random_password()
-                user.send_email_about_import(tournament, password)
-
-        return status, user
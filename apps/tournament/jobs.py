@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+from .consts import STATUS_PLAYOFF
+from .logic import DrawError, generate_next_round, generate_playoff, plan_next_round
+from .models import Round, Team, Tournament
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_ERROR = 'error'
+
+# name -> func(progress, tournament_id, *args), args должны сохраняться в json
+JOBS = {}
+
+_executor = None
+
+# Задачи этого процесса (в очереди и выполняемые), их метки "жива" продлевает поток _heartbeat
+_alive_jobs = set()
+_heartbeat_thread = None
+_heartbeat_lock = threading.Lock()
+
+
+def job(name):
+    """
+    Регистрирует функцию фоновой задачи под именем name
+    """
+    def decorator(func):
+        JOBS[name] = func
+        return func
+
+    return decorator
+
+
+def _job_key(job_id):
+    return 'job/%s' % job_id
+
+
+def _lock_key(tournament_id):
+    return 'tournament/%s/job' % tournament_id
+
+
+def _alive_key(job_id):
+    return 'job/%s/alive' % job_id
+
+
+def _get_timeout():
+    return getattr(settings, 'JOB_TIMEOUT', 24 * 60 * 60)
+
+
+def _get_stale_timeout():
+    return getattr(settings, 'JOB_STALE_TIMEOUT', 60)
+
+
+def _heartbeat():
+    while True:
+        time.sleep(_get_stale_timeout() / 3)
+        for job_id in list(_alive_jobs):
+            cache.set(_alive_key(job_id), True, _get_stale_timeout())
+
+
+def _keep_alive(job_id):
+    """
+    Пока процесс жив, метка задачи продлевается. Если воркер упал, метка истекает через JOB_STALE_TIMEOUT
+    и турнир снова может запустить задачу
+    """
+    global _heartbeat_thread
+
+    cache.set(_alive_key(job_id), True, _get_stale_timeout())
+    with _heartbeat_lock:
+        _alive_jobs.add(job_id)
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name='job-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+
+
+def _is_stale(job_id) -> bool:
+    data = get_job(job_id)
+    return not data or data['status'] in [JOB_QUEUED, JOB_RUNNING] and not cache.get(_alive_key(job_id))
+
+
+def get_job(job_id) -> dict:
+    """
+    {id, tournament, name, status, progress, message, result} или None
+    """
+    return cache.get(_job_key(job_id))
+
+
+def _update_job(job_id, **kwargs):
+    data = get_job(job_id) or {}
+    data.update(kwargs)
+    cache.set(_job_key(job_id), data, _get_timeout())
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix='job')
+    return _executor
+
+
+def start_job(tournament_id: int, name: str, *args) -> str:
+    """
+    Ставит задачу в очередь и сразу возвращает её id. У турнира одна задача за раз:
+    пока предыдущая не завершилась, возвращается её id. Задача упавшего воркера блокировку не держит (см. _keep_alive).
+    Статус хранится в кэше, поэтому он виден всем воркерам gunicorn, если кэш общий (по умолчанию - в файлах).
+    При JOB_WORKERS = 0 задача выполняется сразу в этом же потоке
+    """
+    job_id = uuid.uuid4().hex
+    if not cache.add(_lock_key(tournament_id), job_id, _get_timeout()):
+        running_id = cache.get(_lock_key(tournament_id))
+        if running_id and not _is_stale(running_id):
+            return running_id
+        if running_id and get_job(running_id):
+            _update_job(running_id, status=JOB_ERROR, message='Задача прервана: воркер перезапущен')
+        cache.set(_lock_key(tournament_id), job_id, _get_timeout())
+
+    _update_job(
+        job_id,
+        id=job_id,
+        tournament=tournament_id,
+        name=name,
+        status=JOB_QUEUED,
+        progress=0,
+        message='',
+        result=None
+    )
+
+    _keep_alive(job_id)
+    if settings.JOB_WORKERS:
+        _get_executor().submit(_run_job, job_id, tournament_id, name, args)
+    else:
+        _run_job(job_id, tournament_id, name, args, False)
+
+    return job_id
+
+
+def _run_job(job_id, tournament_id, name, args, in_thread=True):
+    def _progress(percent: int, message=''):
+        _update_job(job_id, progress=percent, message=message)
+
+    if in_thread:
+        close_old_connections()
+
+    try:
+        # Пока задача ждала в очереди, блокировку могли посчитать устаревшей и запустить другую задачу
+        if cache.get(_lock_key(tournament_id)) != job_id:
+            _update_job(job_id, status=JOB_ERROR, message='Для турнира уже запущена другая задача')
+            return
+
+        _update_job(job_id, status=JOB_RUNNING)
+        error, result = JOBS[name](_progress, tournament_id, *args)
+        if error:
+            _update_job(job_id, status=JOB_ERROR, message=error)
+        else:
+            _update_job(job_id, status=JOB_DONE, progress=100, message='', result=result)
+    except Exception as e:
+        logging.getLogger('Jobs').exception('Job %s (%s) failed' % (name, job_id))
+        _update_job(job_id, status=JOB_ERROR, message=str(e))
+    finally:
+        _alive_jobs.discard(job_id)
+        cache.delete(_alive_key(job_id))
+        if cache.get(_lock_key(tournament_id)) == job_id:
+            cache.delete(_lock_key(tournament_id))
+        if in_thread:
+            connections.close_all()
+
+
+@job('next_round')
+def _next_round_job(progress, tournament_id: int, motion_id: int, start_time: str, is_closed: bool, draw=None):
+    """
+    generate_next_round для раунда из формы; draw - рассадка из предпросмотра
+    :return: [error, {redirect}]
+    """
+    tournament = Tournament.objects.get(pk=tournament_id)
+    if draw is None:
+        progress(10, 'Рассадка команд')
+        draw, error = plan_next_round(tournament)
+        if error:
+            return [error, None]
+
+    progress(60, 'Сохранение раунда')
+    new_round = Round(motion_id=motion_id, start_time=parse_datetime(start_time), is_closed=is_closed)
+    try:
+        generate_next_round(tournament, new_round, draw)
+    except DrawError as e:
+        return [str(e), None]
+
+    return ['', {'redirect': reverse('tournament:edit_round', args=[tournament_id])}]
+
+
+@job('break')
+def _break_job(progress, tournament_id: int, teams_id: [int]):
+    """
+    generate_playoff для команд брейка в порядке teams_id
+    :return: [error, {redirect}]
+    """
+    tournament = Tournament.objects.get(pk=tournament_id)
+    teams = Team.objects.in_bulk(teams_id)
+
+    progress(10, 'Рассадка плейофф')
+    # Сетка плейофф и статус турнира сохраняются вместе, иначе при ошибке останется сетка без статуса
+    with transaction.atomic():
+        generate_playoff(tournament, [teams[team_id] for team_id in teams_id])
+        tournament.set_status(STATUS_PLAYOFF)
+
+    return ['', {'redirect': reverse('tournament:show', args=[tournament_id])}]
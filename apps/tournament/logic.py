@@ -1,8 +1,11 @@
 import datetime
+import json
 import random
 import logging
 
-from django.db.models import Q, Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, F, Case, Count, IntegerField, Max, Sum, Value, When
 from django.core.exceptions import ObjectDoesNotExist
 from .consts import *
 from .messages import *
@@ -11,13 +14,26 @@ from .models import \
     TeamTournamentRel, \
     Round, \
     Room, \
+    FeedbackAnswer, \
     Game, \
     GameResult, \
     Motion, \
+    PlayoffResult, \
+    QualificationResult, \
+    Team, \
+    TeamStanding, \
     User
+from .allocation import Conflicts, allocate_adjudicators, allocate_places, get_feedback_score, get_room_importance
+from .caching import bump_results_version, cache_by_results, get_results_version
+from .draw import REPEAT_WINDOW, search_draw
+from .tab import TabArrays
 
 
 class TeamRoundResult:
+    __slots__ = (
+        'place', 'points', 'speaker_1', 'speaker_2', 'is_reversed', 'position', 'number', 'is_closed', 'is_playoff'
+    )
+
     def __init__(self,
                  place: int,
                  speaker_1: int,
@@ -28,6 +44,7 @@ class TeamRoundResult:
                  is_closed: bool,
                  is_playoff: bool,
                  ):
+        self.place = place
         self.points = 4 - place if not is_playoff and place else place
         self.speaker_1 = speaker_1
         self.speaker_2 = speaker_2
@@ -39,6 +56,13 @@ class TeamRoundResult:
 
 
 class TeamResult:
+    """
+    Суммы баллов и спикерских пересчитываются в add_round, а не при каждом сравнении
+    """
+    __slots__ = (
+        'playoff_position', 'count_playoff_rounds', 'show_all', 'team', 'rounds', 'position',
+        '_points', '_open_points', '_speakers',
+    )
 
     def __init__(self, team, count_playoff_rounds):
         self.playoff_position = 0
@@ -47,6 +71,9 @@ class TeamResult:
         self.team = team
         self.rounds = []
         self.position = [0, 0, 0, 0]
+        self._points = 0
+        self._open_points = 0
+        self._speakers = 0
 
     def add_empty_round(self, round_number):
         self.rounds.append(TeamRoundResult(0, 0, 0, False, Position.NONE, round_number, False, False))
@@ -55,6 +82,13 @@ class TeamResult:
         self.playoff_position = max(self.playoff_position, other.number + int(other.points))
         return self.rounds
 
+    def _count_round(self, cur_round: TeamRoundResult, sign: int):
+        self._points += sign * cur_round.points
+        self._open_points += sign * cur_round.points * int(not cur_round.is_closed)
+        self._speakers += sign * (cur_round.speaker_1 + cur_round.speaker_2)
+        if cur_round.position != Position.NONE:
+            self.position[cur_round.position.value - 1] += sign
+
     def add_round(self, other: TeamRoundResult):
         if len(self.rounds) + 1 == other.number:
             self.rounds.append(other)
@@ -63,10 +97,10 @@ class TeamResult:
                 self.add_empty_round(i)
             self.rounds.append(other)
         elif len(self.rounds) + 1 > other.number:
+            self._count_round(self.rounds[other.number - 1], -1)
             self.rounds[other.number - 1] = other
 
-        if other.position != Position.NONE:
-            self.position[other.position.value - 1] += 1
+        self._count_round(other, 1)
 
         return self.rounds
 
@@ -81,33 +115,38 @@ class TeamResult:
         return [speaker_1, speaker_2]
 
     def sum_points(self):
-        return sum(list(map(lambda x: x.points * bool(self.show_all or not x.is_closed), self.rounds)))
+        return self._points if self.show_all else self._open_points
 
     def sum_speakers(self):
-        return 0 if not self.show_all \
-            else sum(list(map(lambda x: x.speaker_1 + x.speaker_2, self.rounds)))
+        return self._speakers if self.show_all else 0
+
+    def sort_key(self):
+        """
+        Ключ для sorted(tab, key=TeamResult.sort_key, reverse=True)
+        """
+        return self.sum_points(), self.sum_speakers()
 
     def get_position_weight(self, position_index):
         return self.position[position_index] * 2 + 1
 
     def __gt__(self, other):
-        return self.sum_points() > other.sum_points() \
-            or self.sum_points() == other.sum_points() and self.sum_speakers() > other.sum_speakers()
+        return self.sort_key() > other.sort_key()
 
     def __lt__(self, other):
-        return self.sum_points() < other.sum_points() \
-            or self.sum_points() == other.sum_points() and self.sum_speakers() < other.sum_speakers()
+        return self.sort_key() < other.sort_key()
 
     def __str__(self):
         return "(%s) %s points:%s speakers:%s" % (self.team.id, self.team.name, self.sum_points(), self.sum_speakers())
 
 
 class SpeakerResult:
+    __slots__ = ('team', 'user', 'points', 'total')
 
     def __init__(self, team, user):
         self.team = team
         self.user = user
         self.points = []
+        self.total = 0
 
     def add_round(self, points, round_number):
         if len(self.points) + 1 == round_number:
@@ -117,21 +156,27 @@ class SpeakerResult:
                 self.points.append(0)
             self.points.append(points)
         elif len(self.points) + 1 > round_number:
+            self.total -= self.points[round_number - 1]
             self.points[round_number - 1] = points
 
+        self.total += points
+
         return self
 
     def sum_points(self):
-        return sum(self.points)
+        return self.total
+
+    def sort_key(self):
+        return self.total
 
     def __gt__(self, other):
-        return self.sum_points() > other.sum_points()
+        return self.total > other.total
 
     def __eq__(self, other):
-        return self.sum_points() == other.sum_points()
+        return self.total == other.total
 
     def __lt__(self, other):
-        return self.sum_points() < other.sum_points()
+        return self.total < other.total
 
     def __str__(self):
         return "|%s| %s <%s> : %s" % (self.user.id, self.user.name(), self.team.name, self.sum_points())
@@ -161,19 +206,175 @@ def _count_playoff_rounds_in_tournament(teams_in_round: int):
     return result
 
 
-def _filter_tab(tab: [TeamResult], tournament: Tournament, roles: [TournamentRole]):
-    teams = list(map(lambda x: x.team, tournament.get_teams(roles)))
-    new_tab = list(filter(lambda x: x.team in teams, tab))
-    teams_in_tab = list(map(lambda x: x.team, new_tab))
-    for team in teams:
-        if team in teams_in_tab:
-            continue
-        team_results = TeamResult(team, _count_playoff_rounds_in_tournament(tournament.count_teams_in_break))
-        for i in range(tournament.cur_round):
-            team_results.add_empty_round(i)
-        new_tab.append(team_results)
+# [позиция, место, первый спикер, второй спикер, реверс спикеров]
+_RESULT_FIELDS = [
+    [Position.OG, 'og', 'pm', 'dpm', 'og_rev'],
+    [Position.OO, 'oo', 'lo', 'dlo', 'oo_rev'],
+    [Position.CG, 'cg', 'mg', 'gw', 'cg_rev'],
+    [Position.CO, 'co', 'mo', 'ow', 'co_rev'],
+]
+
+
+def _sum_in_round(number: int, expression):
+    return Sum(Case(
+        When(game__room__round__number=number, then=expression),
+        default=Value(0),
+        output_field=IntegerField()
+    ))
+
+
+def _qualification_results_by_position(tournament: Tournament, rounds_numbers: [int], teams_id=None):
+    """
+    Один запрос (UNION ALL по четырём позициям) с суммами по каждой команде на каждой позиции.
+    По каждому раунду отдельные колонки r<N>_count, r<N>_place, r<N>_speaker_1, r<N>_speaker_2, r<N>_rev
+    """
+    queries = []
+    for position, place, speaker_1, speaker_2, rev in _RESULT_FIELDS:
+        rounds_columns = {}
+        for number in rounds_numbers:
+            rounds_columns['r%d_count' % number] = _sum_in_round(number, Value(1))
+            rounds_columns['r%d_place' % number] = _sum_in_round(number, F(place))
+            rounds_columns['r%d_speaker_1' % number] = _sum_in_round(number, F(speaker_1))
+            rounds_columns['r%d_speaker_2' % number] = _sum_in_round(number, F(speaker_2))
+            rounds_columns['r%d_rev' % number] = _sum_in_round(
+                number, Case(When(**{rev: True}, then=Value(1)), default=Value(0), output_field=IntegerField())
+            )
+
+        query = QualificationResult.objects.filter(
+            game__room__round__tournament=tournament,
+            game__room__round__is_playoff=False,
+            game__room__round__number__gt=0,
+        )
+        if teams_id is not None:
+            query = query.filter(**{'game__%s_id__in' % place: teams_id})
+
+        queries.append(
+            query.values(team=F('game__%s' % place)).annotate(
+                position=Value(position.value, output_field=IntegerField()),
+                count=Count('pk'),
+                # Незаполненное место (0) баллов не даёт, как в TeamRoundResult
+                points=Sum(Case(
+                    When(**{place + '__gt': 0}, then=4 - F(place)), default=Value(0), output_field=IntegerField()
+                )),
+                speakers=Sum(F(speaker_1) + F(speaker_2)),
+                **rounds_columns
+            ).order_by()
+        )
+
+    return queries[0].union(*queries[1:], all=True)
+
+
+def _playoff_results_by_position(tournament: Tournament, teams_id=None):
+    queries = []
+    for position, place, _, _, _ in _RESULT_FIELDS:
+        query = PlayoffResult.objects.filter(
+            game__room__round__tournament=tournament,
+            game__room__round__is_playoff=True,
+            game__room__round__number__gt=0,
+        )
+        if teams_id is not None:
+            query = query.filter(**{'game__%s_id__in' % place: teams_id})
+
+        queries.append(
+            query.values(team=F('game__%s' % place)).annotate(
+                playoff_position=Max(F('game__room__round__number') + Case(
+                    When(**{place: True}, then=Value(1)), default=Value(0), output_field=IntegerField()
+                ))
+            ).order_by()
+        )
+
+    return queries[0].union(*queries[1:], all=True)
+
+
+def _aggregate_tab(tournament: Tournament, teams_id=None) -> dict:
+    """
+    Итоги команд, посчитанные в базе: {team_id: {points, speakers, position, playoff_position, rounds}}
+    rounds в формате TeamStanding.rounds
+    """
+    rounds = dict(
+        Round.objects.filter(tournament=tournament, is_playoff=False, number__gt=0).values_list('number', 'is_closed')
+    )
+
+    def _get_team(team_id):
+        if team_id not in tab:
+            tab[team_id] = {
+                'points': 0,
+                'speakers': 0,
+                'position': [0, 0, 0, 0],
+                'playoff_position': 0,
+                'rounds': [],
+            }
+        return tab[team_id]
+
+    tab = {}
+    if rounds:
+        for row in _qualification_results_by_position(tournament, sorted(rounds.keys()), teams_id):
+            team = _get_team(row['team'])
+            team['points'] += row['points']
+            team['speakers'] += row['speakers']
+            team['position'][row['position'] - 1] += row['count']
+            for number, is_closed in rounds.items():
+                # Место может быть не заполнено (0), поэтому наличие игры проверяется по количеству
+                if not row['r%d_count' % number]:
+                    continue
+                team['rounds'].append([
+                    row['r%d_place' % number],
+                    row['r%d_speaker_1' % number],
+                    row['r%d_speaker_2' % number],
+                    bool(row['r%d_rev' % number]),
+                    row['position'],
+                    number,
+                    is_closed,
+                ])
+
+    for row in _playoff_results_by_position(tournament, teams_id):
+        team = _get_team(row['team'])
+        team['playoff_position'] = max(team['playoff_position'], row['playoff_position'])
+
+    for team in tab.values():
+        team['rounds'].sort(key=lambda x: x[5])
+
+    return tab
+
+
+def _get_count_playoff_rounds(tournament: Tournament) -> int:
+    temp_round = _get_temp_round(tournament)
+    if not temp_round:
+        return 0
+
+    return _count_playoff_rounds_in_tournament(temp_round.room_set.count() * TEAM_IN_GAME)
+
+
+def update_standings(tournament: Tournament, teams_id=None):
+    """
+    Пересчитывает сохранённый тэб турнира: целиком или только для команд из teams_id.
+    Строка турнира блокируется, поэтому одновременные пересчёты выполняются по очереди
+    и каждый считает тэб по уже сохранённым результатам другого
+    """
+    with transaction.atomic():
+        Tournament.objects.select_for_update().filter(pk=tournament.pk).exists()
+
+        standings = []
+        for team_id, result in _aggregate_tab(tournament, teams_id).items():
+            standing = TeamStanding(
+                tournament=tournament,
+                team_id=team_id,
+                points=result['points'],
+                speakers=result['speakers'],
+                og=result['position'][0],
+                oo=result['position'][1],
+                cg=result['position'][2],
+                co=result['position'][3],
+                playoff_position=result['playoff_position'],
+            )
+            standing.set_rounds(result['rounds'])
+            standings.append(standing)
 
-    return new_tab
+        old_standings = TeamStanding.objects.filter(tournament=tournament)
+        if teams_id is not None:
+            old_standings = old_standings.filter(team_id__in=teams_id)
+        old_standings.delete()
+        TeamStanding.objects.bulk_create(standings)
 
 
 def _check_duplicate_role(role: TournamentRole, rel: TeamTournamentRel, user: User) -> [TeamTournamentRel]:
@@ -189,193 +390,254 @@ def _check_duplicate_role(role: TournamentRole, rel: TeamTournamentRel, user: Us
 #              Generate rounds              ##
 ##############################################
 
-def _generate_random_round(tournament: Tournament, cur_round: Round):
-    teams = list(tournament.get_teams([ROLE_MEMBER]).order_by('?'))
-    chair = list(tournament.get_users([ROLE_CHAIR]).order_by('?'))
-    place = list(tournament.place_set.filter(is_active=True).order_by('?'))
-
-    for i in range(len(teams) // TEAM_IN_GAME):
-        game = Game.objects.create(
-            og=teams.pop().team,
-            oo=teams.pop().team,
-            cg=teams.pop().team,
-            co=teams.pop().team,
-            chair=chair.pop().user,
-            date=datetime.datetime.now(),
-            motion=cur_round.motion
+_DRAW_POSITIONS = ['og', 'oo', 'cg', 'co']
+
+
+def _save_rooms(cur_round: Round, rooms: [Room]):
+    """
+    Сохраняет румы вместе с их ещё не сохранёнными играми: два bulk_create в одной транзакции
+    """
+    with transaction.atomic():
+        games = Game.objects.bulk_create([room.game for room in rooms])
+        for room, game in zip(rooms, games):
+            room.game = game
+        Room.objects.bulk_create(rooms)
+
+    # bulk_create не отправляет post_save, кэш турнира сбрасываем сами
+    bump_results_version(cur_round.tournament_id)
+
+
+def _draw_room(number: int, teams_id: [int]) -> dict:
+    room = dict(zip(_DRAW_POSITIONS, teams_id))
+    room['number'] = number
+    return room
+
+
+def _get_rooms_history(tournament: Tournament) -> [dict, dict, dict]:
+    """
+    Одним запросом по сыгранным играм турнира: какие команды судил каждый судья,
+    средняя оценка председателей по фидбеку (ответ спикера относится к председателю его игры в этом раунде)
+    и последняя аудитория каждого председателя и каждой команды
+    :return: [{user_id: {team_id}}, {user_id: score}, {('chair' или 'team', id): place_id}]
+    """
+    judged_teams = {}
+    chair_by_speaker = {}
+    last_places = {}
+    for row in Room.objects.filter(round__tournament=tournament).order_by('round_id').values_list(
+        'round_id',
+        'place_id',
+        'game__chair_id',
+        'game__wing_left_id',
+        'game__wing_right_id',
+        *['game__%s_id' % position for position in _DRAW_POSITIONS],
+        *['game__%s__speaker_%d_id' % (position, i) for position in _DRAW_POSITIONS for i in [1, 2]]
+    ):
+        teams = row[5:9]
+        for user in row[2:5]:
+            if user:
+                judged_teams.setdefault(user, set()).update(teams)
+        for speaker in row[9:]:
+            chair_by_speaker[(row[0], speaker)] = row[2]
+        if row[1]:
+            last_places[('chair', row[2])] = row[1]
+            last_places.update((('team', team), row[1]) for team in teams)
+
+    scores = {}
+    for user_id, round_id, answers in FeedbackAnswer.objects.filter(round__tournament=tournament) \
+            .values_list('user_id', 'round_id', 'answers'):
+        chair = chair_by_speaker.get((round_id, user_id))
+        score = get_feedback_score(json.loads(answers), [LBL_ROUND_FEEDBACK, LBL_CHAIR_FEEDBACK])
+        if chair and score is not None:
+            scores.setdefault(chair, []).append(score)
+
+    return [judged_teams, {user: sum(values) / len(values) for user, values in scores.items()}, last_places]
+
+
+def _get_preferred_place(room: dict, last_places: dict, index: dict):
+    """
+    Индекс аудитории, где в прошлый раз был председатель рума, иначе - где были больше всего его команд
+    """
+    place = last_places.get(('chair', room['chair']))
+    if place not in index:
+        places = [last_places.get(('team', room[position])) for position in _DRAW_POSITIONS]
+        places = [i for i in places if i in index]
+        place = max(places, key=places.count) if places else None
+
+    return index.get(place)
+
+
+def _add_chairs_and_places(tournament: Tournament, rooms: [dict], rand: random.Random, points=None):
+    """
+    Председатели, крылья (allocate_adjudicators) и аудитории (allocate_places) для румов
+    points - {team_id: баллы}, чем больше баллов у команд рума, тем лучше судьи. Судьи без фидбека получают среднюю оценку.
+    Аудитории - в порядке добавления, председатель по возможности остаётся в своей прошлой аудитории
+    """
+    adjudicators = list(
+        tournament.usertournamentrel_set.filter(role__in=[ROLE_CHAIR, ROLE_WING])
+        .order_by('user_id')
+        .values_list('user_id', 'role_id', 'user__university_id')
+    )
+    places = list(tournament.place_set.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    rand.shuffle(adjudicators)
+
+    teams = [[room[position] for position in _DRAW_POSITIONS] for room in rooms]
+    team_universities = {
+        row[0]: set(i for i in row[1:] if i)
+        for row in Team.objects.filter(id__in=[team for room in teams for team in room])
+        .values_list('id', 'speaker_1__university_id', 'speaker_2__university_id')
+    }
+    judged_teams, scores, last_places = _get_rooms_history(tournament)
+    default_score = sum(scores.values()) / len(scores) if scores else 0
+    importance = get_room_importance(teams, points or {})
+    panels, count_conflicts = allocate_adjudicators(
+        importance,
+        [user for user, role, _ in adjudicators if role == ROLE_CHAIR.id],
+        [user for user, role, _ in adjudicators if role == ROLE_WING.id],
+        {user: scores.get(user, default_score) for user, _, _ in adjudicators},
+        Conflicts(teams, team_universities, {user: university for user, _, university in adjudicators}, judged_teams)
+    )
+    if count_conflicts:
+        logging.getLogger('Draw').info(
+            'Tournament (%d): %d chairs with conflicts' % (tournament.id, count_conflicts)
         )
-        Room.objects.create(
-            game=game,
+
+    for room, panel in zip(rooms, panels):
+        wings = panel['wings'] + [None] * (2 - len(panel['wings']))
+        room['chair'] = panel['chair']
+        room['wing_left'], room['wing_right'] = wings[:2]
+
+    index = {place: i for i, place in enumerate(places)}
+    preferred = [_get_preferred_place(room, last_places, index) for room in rooms]
+    for room, place in zip(rooms, allocate_places(importance, preferred, len(places))):
+        room['place'] = places[place] if place is not None else None
+
+    return rooms
+
+
+def _save_draw(cur_round: Round, rooms: [dict]):
+    _save_rooms(cur_round, [
+        Room(
+            game=Game(
+                og_id=room['og'],
+                oo_id=room['oo'],
+                cg_id=room['cg'],
+                co_id=room['co'],
+                chair_id=room['chair'],
+                wing_left_id=room.get('wing_left'),
+                wing_right_id=room.get('wing_right'),
+                date=datetime.datetime.now(),
+                motion=cur_round.motion
+            ),
             round=cur_round,
-            number=i,
-            place=place.pop()
+            number=room['number'],
+            place_id=room['place']
         )
+        for room in rooms
+    ])
 
 
-def _generate_round(tournament: Tournament, cur_round: Round):
-    import itertools
+def _plan_random_round(tournament: Tournament, rand: random.Random) -> [dict]:
+    teams_id = list(tournament.get_teams([ROLE_MEMBER]).order_by('team_id').values_list('team_id', flat=True))
+    rand.shuffle(teams_id)
 
-    MAX_POINTS = 1 + POINTS_OF_FIRST_PLACE * (cur_round.number - 1)
+    return _add_chairs_and_places(tournament, [
+        _draw_room(i, teams_id[i * TEAM_IN_GAME:(i + 1) * TEAM_IN_GAME])
+        for i in range(len(teams_id) // TEAM_IN_GAME)
+    ], rand)
 
-    tab = _filter_tab(get_tab(tournament), tournament, [ROLE_MEMBER])
 
-    team_by_points = [[] for _ in range(MAX_POINTS)]
-    for i in tab:
-        team_by_points[i.sum_points()].append(i)
+def _get_pairing_input(tournament: Tournament) -> [list, list, list]:
+    """
+    Команды-участники с баллами и числом игр на позициях OG, OO, CG, CO из TeamStanding.
+    Два запроса без загрузки команд, у команд без строки в TeamStanding всё по нулям
+    :return: [teams_id, points, positions] в порядке id команд
+    """
+    def _get_standings_rows():
+        return {
+            row[0]: row[1:]
+            for row in TeamStanding.objects.filter(tournament=tournament)
+            .values_list('team_id', 'points', 'og', 'oo', 'cg', 'co')
+        }
 
-    for i in team_by_points:
-        random.shuffle(i)
+    teams_id = list(
+        TeamTournamentRel.objects.filter(tournament=tournament, role=ROLE_MEMBER)
+        .order_by('team_id')
+        .values_list('team_id', flat=True)
+    )
+    standings = _get_standings_rows()
+    if _fill_empty_standings(tournament, not standings):
+        standings = _get_standings_rows()
 
-    tab = [val for sub_list in reversed(team_by_points) for val in sub_list]
+    empty = (0, 0, 0, 0, 0)
+    rows = [standings.get(team_id, empty) for team_id in teams_id]
 
-    pools = []
-    while tab:
-        best_weight = 0
-        pool = {
-            'game': None,
-            'max_point': tab[0].sum_points(),
-            'min_point': tab[TEAM_IN_GAME - 1].sum_points(),
-        }
-        # Сумма квадратов оптимальных (min) позиций
-        break_weight = sum(map(
-            lambda y: y ** 2,
-            map(
-                lambda x: min(x.position),
-                tab[:TEAM_IN_GAME]
-            )
-        ))
-        for i in itertools.permutations(tab[:TEAM_IN_GAME]):
-            weight = sum(map(
-                lambda x: x ** 2,
-                [i[0].position[0], i[1].position[1], i[2].position[2], i[3].position[3]]
-            ))
-            if not pool['game'] or best_weight > weight:
-                best_weight = weight
-                pool['game'] = list(i)
-                if break_weight == best_weight:
-                    break
-
-        pools.append(pool)
-        tab = tab[TEAM_IN_GAME:]
-
-    # [1-4 => 1, 5-8 => 2, 9-12 => 3, ...]
-    max_games_in_position = cur_round.number // TEAM_IN_GAME + int(cur_round.number % TEAM_IN_GAME > 0)
-    bad = [[] for _ in range(MAX_POINTS)]
-    good = [[] for _ in range(MAX_POINTS)]
-
-    for i in range(len(pools)):
-        pool = pools[i]
-        for j in range(TEAM_IN_GAME):
-            team = pool['game'][j]
-
-            can = []
-            for k in range(len(team.position)):
-                if team.position[k] < max_games_in_position:
-                    can.append(k)
-
-            x = {
-                'pool': i,
-                'team': j,
-                'can': set(can),
-            }
-            if team.position[j] >= max_games_in_position:
-                bad[team.sum_points()].append(x)
-            else:
-                good[team.sum_points()].append(x)
-
-    for k in range(MAX_POINTS):
-        i = 0
-        while bad[k] and i < len(bad[k]):
-            replace_with = -1
-            for j in range(i + 1, len(bad[k])):
-                if bad[k][i]['team'] in bad[k][j]['can'] and bad[k][j]['team'] in bad[k][i]['can']:
-                    replace_with = j
-                    break
-
-            if replace_with >= 0:
-                p1 = bad[k][i]['pool']
-                p2 = bad[k][replace_with]['pool']
-                t1 = bad[k][i]['team']
-                t2 = bad[k][replace_with]['team']
-                pools[p1]['game'][t1], pools[p2]['game'][t2] = pools[p2]['game'][t2], pools[p1]['game'][t1]
-
-                good[k].append({
-                    'pool': p1,
-                    'team': t1,
-                    'can': bad[k][replace_with]['can'],
-                })
-                good[k].append({
-                    'pool': p2,
-                    'team': t2,
-                    'can': bad[k][i]['can'],
-                })
-
-                bad[k] = bad[k][:i] + bad[k][i + 1:replace_with] + bad[k][replace_with + 1:]
-                continue
-
-            for j in range(len(good[k])):
-                if bad[k][i]['team'] in good[k][j]['can'] and good[k][j]['team'] in bad[k][i]['can']:
-                    replace_with = j
-                    break
-
-            if replace_with >= 0:
-                p1 = bad[k][i]['pool']
-                p2 = good[k][replace_with]['pool']
-                t1 = bad[k][i]['team']
-                t2 = good[k][replace_with]['team']
-                pools[p1]['game'][t1], pools[p2]['game'][t2] = pools[p2]['game'][t2], pools[p1]['game'][t1]
-
-                temp = good[k][replace_with]['can']
-                good[k][replace_with]['can'] = bad[k][i]['can']
-                good[k].append({
-                    'pool': p1,
-                    'team': t1,
-                    'can': temp,
-                })
-                bad[k] = bad[k][:i] + bad[k][i + 1:]
-                continue
-
-            i += 1
-
-    chair = list(tournament.get_users([ROLE_CHAIR]).order_by('?'))
-    place = list(tournament.place_set.filter(is_active=True).order_by('?'))
-    for i in range(len(pools)):
-        game = Game.objects.create(
-            og=pools[i]['game'][0].team,
-            oo=pools[i]['game'][1].team,
-            cg=pools[i]['game'][2].team,
-            co=pools[i]['game'][3].team,
-            chair=chair.pop().user,
-            date=datetime.datetime.now(),
-            motion=cur_round.motion
-        )
-        Room.objects.create(
-            game=game,
-            round=cur_round,
-            number=i,
-            place=place.pop()
+    return [teams_id, [row[0] for row in rows], [list(row[1:]) for row in rows]]
+
+
+def _get_games_history(tournament: Tournament, teams_id: [int]) -> [[int]]:
+    """
+    Сыгранные отборочные игры в индексах команд из teams_id
+    """
+    index = {team_id: i for i, team_id in enumerate(teams_id)}
+    games = Game.objects.filter(
+        room__round__tournament=tournament,
+        room__round__is_playoff=False,
+        room__round__number__gt=0,
+    ).values_list('og_id', 'oo_id', 'cg_id', 'co_id')
+
+    return [[index[team_id] for team_id in game if team_id in index] for game in games]
+
+
+def _plan_round(tournament: Tournament, number: int, seeds: [int]) -> dict:
+    """
+    Лучшая из рассадок по тэбу для seeds (см. search_draw)
+    :return: {seed, rooms, imbalance, repeats, score}, rooms - в формате _draw_room
+    """
+    teams_id, points, positions = _get_pairing_input(tournament)
+    draw = search_draw(
+        points,
+        positions,
+        _get_games_history(tournament, teams_id),
+        seeds,
+        getattr(settings, 'DRAW_WORKERS', None),
+        getattr(settings, 'DRAW_REPEAT_WINDOW', REPEAT_WINDOW)
+    )
+    logging.getLogger('Draw').info(
+        'Tournament (%d) round %d: seed %d of %d, position imbalance %d, repeat opponents %d' % (
+            tournament.id, number, draw['seed'], len(seeds), draw['imbalance'], draw['repeats']
         )
+    )
+
+    draw['rooms'] = _add_chairs_and_places(
+        tournament,
+        [_draw_room(i, [teams_id[team] for team in room]) for i, room in enumerate(draw['rooms'])],
+        random.Random(draw['seed']),
+        dict(zip(teams_id, points))
+    )
+
+    return draw
 
 
-def _generate_first_playoff_round(tournament: Tournament, new_round: Round):
+def _plan_first_playoff_round(tournament: Tournament) -> [list, str]:
     temp_round = _get_temp_round(tournament)
 
     if not temp_round:
-        return 'Нет команд, сделавших брейк. Объявите брейк'
+        return [[], 'Нет команд, сделавших брейк. Объявите брейк']
 
-    for room in Room.objects.filter(round=temp_round):
-        game = room.game
-        game.pk = None
-        game.motion = new_round.motion
-        game.date = datetime.datetime.now()
-        game.save()
-        room.pk = None
-        room.round = new_round
-        room.game = game
-        room.save()
+    rooms = []
+    for room in Room.objects.filter(round=temp_round).order_by('number').values(
+        'number', 'place_id', 'game__og_id', 'game__oo_id', 'game__cg_id', 'game__co_id',
+        'game__chair_id', 'game__wing_left_id', 'game__wing_right_id'
+    ):
+        rooms.append(_draw_room(room['number'], [room['game__%s_id' % i] for i in _DRAW_POSITIONS]))
+        for i in ['chair', 'wing_left', 'wing_right']:
+            rooms[-1][i] = room['game__%s_id' % i]
+        rooms[-1]['place'] = room['place_id']
 
+    return [rooms, '']
 
-def _generate_playoff_round(tournament: Tournament, cur_round: Round):
+
+def _plan_playoff_round(tournament: Tournament, number: int, rand: random.Random) -> [list, str]:
     positions = [
         ['og_id', 'og'],
         ['oo_id', 'oo'],
@@ -383,20 +645,17 @@ def _generate_playoff_round(tournament: Tournament, cur_round: Round):
         ['co_id', 'co'],
     ]
 
-    chair = list(tournament.get_users([ROLE_CHAIR]).order_by('?'))
-    place = list(tournament.place_set.filter(is_active=True).order_by('?'))
-
     queryset = Room.objects.filter(
         round__tournament=tournament,
         round__is_playoff=True,
-        round__number=cur_round.number - 1
+        round__number=number - 1
     )
     for i in ['round', 'game', 'game__gameresult', 'game__gameresult__playoffresult']:
         queryset = queryset.select_related(i)
 
     result_prev_round = list(queryset)
     if len(result_prev_round) < 2:
-        return 'Финал турнира уже сыгран. Завершите турнир и опубликуйте результаты'
+        return [[], 'Финал турнира уже сыгран. Завершите турнир и опубликуйте результаты']
 
     teams_id = []
     for room in result_prev_round:
@@ -404,25 +663,14 @@ def _generate_playoff_round(tournament: Tournament, cur_round: Round):
             if getattr(room.game.gameresult.playoffresult, position[1]):
                 teams_id.append(getattr(room.game, position[0]))
 
+    rooms = []
     for i in range(len(teams_id) // TEAM_IN_GAME):
         teams_id_in_room = teams_id[:4]
         teams_id = teams_id[4:]
-        random.shuffle(teams_id_in_room)
-        game = Game.objects.create(
-            og_id=teams_id_in_room.pop(),
-            oo_id=teams_id_in_room.pop(),
-            cg_id=teams_id_in_room.pop(),
-            co_id=teams_id_in_room.pop(),
-            chair=chair.pop().user,
-            date=datetime.datetime.now(),
-            motion=cur_round.motion
-        )
-        Room.objects.create(
-            game=game,
-            round=cur_round,
-            number=i,
-            place=place.pop()
-        )
+        rand.shuffle(teams_id_in_room)
+        rooms.append(_draw_room(i, teams_id_in_room))
+
+    return [_add_chairs_and_places(tournament, rooms, rand), '']
 
 
 ##############################################
@@ -492,37 +740,119 @@ def check_teams_and_adjudicators(tournament: Tournament):
         else None
 
 
-def generate_next_round(tournament: Tournament, new_round: Round):
+def _get_draw_seeds() -> [int]:
+    return [random.randrange(2 ** 31) for _ in range(max(1, getattr(settings, 'DRAW_SEEDS', 1)))]
+
+
+def _get_draw_state(tournament: Tournament) -> dict:
     """
-    round - не сохранённый объект из формы
+    Всё, от чего зависит рассадка, кроме результатов (они проверяются по версии результатов):
+    статус и номер раунда турнира, судьи и аудитории
     """
-    new_round.tournament = tournament
-    new_round.is_public = False
-    new_round.is_playoff = tournament.status == STATUS_PLAYOFF
+    return {
+        'status': tournament.status_id,
+        'cur_round': tournament.cur_round,
+        'adjudicators': [
+            list(i) for i in tournament.usertournamentrel_set.filter(role__in=[ROLE_CHAIR, ROLE_WING])
+            .order_by('user_id', 'role_id').values_list('user_id', 'role_id')
+        ],
+        'places': list(tournament.place_set.filter(is_active=True).order_by('id').values_list('id', flat=True)),
+    }
+
+
+def check_draw(tournament: Tournament, draw: dict) -> str:
+    """
+    Рассадку из предпросмотра можно сохранить, только если турнир с тех пор не изменился
+    :return: ошибка или ''
+    """
+    if draw['tournament'] != tournament.id \
+            or draw['version'] != get_results_version(tournament.id) \
+            or draw.get('state') != _get_draw_state(tournament):
+        return MSG_DRAW_PREVIEW_OUTDATED
+
+    return ''
+
+
+def plan_next_round(tournament: Tournament, seeds=None) -> [dict, str]:
+    """
+    Рассадка следующего раунда без записи в базу
+    seeds - для отборочных раундов выбирается лучшая рассадка из нескольких seed (settings.DRAW_SEEDS).
+    Чтобы повторить рассадку, нужно передать [round.draw_seed]
+    :return: [{tournament, version, state, number, is_playoff, seed, imbalance, repeats,
+        rooms: [{number, og, oo, cg, co, chair, place}]}, error]
+    """
+    seeds = seeds or _get_draw_seeds()
+    draw = {
+        'tournament': tournament.id,
+        'version': get_results_version(tournament.id),
+        'state': _get_draw_state(tournament),
+        'seed': seeds[0],
+        'imbalance': None,
+        'repeats': None,
+    }
+    error = ''
 
     if tournament.status == STATUS_STARTED:
-        new_round.number = tournament.round_number_inc()
-        new_round.save()
-        if tournament.cur_round == 1:
-            return _generate_random_round(tournament, new_round)
+        draw['number'] = tournament.cur_round + 1
+        draw['is_playoff'] = False
+        if draw['number'] == 1:
+            draw['rooms'] = _plan_random_round(tournament, random.Random(draw['seed']))
         else:
-            return _generate_round(tournament, new_round)
+            best = _plan_round(tournament, draw['number'], seeds)
+            for i in ['seed', 'imbalance', 'repeats', 'rooms']:
+                draw[i] = best[i]
 
     elif tournament.status == STATUS_PLAYOFF:
+        draw['is_playoff'] = True
         last_playoff_round = _get_last_round(tournament)
         if last_playoff_round:
-            new_round.number = last_playoff_round.number + 1
-            new_round.save()
-            return _generate_playoff_round(tournament, new_round)
+            draw['number'] = last_playoff_round.number + 1
+            draw['rooms'], error = _plan_playoff_round(tournament, draw['number'], random.Random(draw['seed']))
         else:
-            new_round.number = 1
-            new_round.save()
-            return _generate_first_playoff_round(tournament, new_round)
+            draw['number'] = 1
+            draw['rooms'], error = _plan_first_playoff_round(tournament)
 
     else:
-        return 'Неверный статус турнира'
+        return [None, 'Неверный статус турнира']
+
+    return [draw, error]
+
+
+class DrawError(Exception):
+    """
+    Раунд нельзя сохранить, текст - сообщение для пользователя. Транзакция generate_next_round откатывается
+    """
+
+
+@transaction.atomic
+def generate_next_round(tournament: Tournament, new_round: Round, draw=None):
+    """
+    round - не сохранённый объект из формы
+    draw - рассадка из plan_next_round (предпросмотр), если не передана - считается заново
+    :raises DrawError:
+    """
+    if draw is None:
+        draw, error = plan_next_round(tournament)
+        if error:
+            raise DrawError(error)
+    else:
+        error = check_draw(tournament, draw)
+        if error:
+            raise DrawError(error)
+
+    new_round.tournament = tournament
+    new_round.is_public = False
+    new_round.is_playoff = draw['is_playoff']
+    new_round.number = draw['number']
+    new_round.draw_seed = draw['seed']
+    if not new_round.is_playoff:
+        tournament.round_number_inc()
 
+    new_round.save()
+    _save_draw(new_round, draw['rooms'])
 
+
+@transaction.atomic
 def generate_playoff(tournament: Tournament, teams: list):
 
     def _generate_playoff_position(count: int):
@@ -540,8 +870,6 @@ def generate_playoff(tournament: Tournament, teams: list):
 
     positions = list(map(lambda x: x - 1, _generate_playoff_position(tournament.count_teams_in_break)))
     motion = Motion.objects.create(motion='temp')
-    chair = list(tournament.get_users([ROLE_CHAIR]).order_by('?'))
-    place = list(tournament.place_set.filter(is_active=True).order_by('?'))
 
     new_round = Round.objects.create(
         tournament=tournament,
@@ -550,22 +878,11 @@ def generate_playoff(tournament: Tournament, teams: list):
         start_time=datetime.datetime.now(),
         is_playoff=True,
     )
-    for i in range(len(teams) // TEAM_IN_GAME):
-        game = Game.objects.create(
-            og=teams[positions[i * TEAM_IN_GAME]],
-            oo=teams[positions[i * TEAM_IN_GAME + 1]],
-            cg=teams[positions[i * TEAM_IN_GAME + 2]],
-            co=teams[positions[i * TEAM_IN_GAME + 3]],
-            chair=chair.pop().user,
-            date=datetime.datetime.now(),
-            motion=motion,
-        )
-        Room.objects.create(
-            game=game,
-            round=new_round,
-            number=i,
-            place=place.pop()
-        )
+    rooms = [
+        _draw_room(i, [teams[positions[i * TEAM_IN_GAME + j]].id for j in range(TEAM_IN_GAME)])
+        for i in range(len(teams) // TEAM_IN_GAME)
+    ]
+    _save_draw(new_round, _add_chairs_and_places(tournament, rooms, random.Random()))
 
 
 def get_games_and_results(rooms: [Room]):
@@ -584,6 +901,7 @@ def get_games_and_results(rooms: [Room]):
     return results
 
 
+@cache_by_results
 def get_motions(tournament: Tournament):
     motions = {
         'qualification': [],
@@ -624,6 +942,7 @@ def get_motions(tournament: Tournament):
     return motions['qualification'] + motions['playoff']
 
 
+@cache_by_results
 def get_all_rounds_and_rooms(tournament: Tournament):
     results = []
     games = []
@@ -631,7 +950,8 @@ def get_all_rounds_and_rooms(tournament: Tournament):
     # TODO Добавить .only() и убрать ненужные поля
     # TODO playoffresult
     rooms = Room.objects.filter(round__tournament=tournament, round__is_playoff=False)
-    rooms = __include_room_related_models(rooms)
+    # Тема выводится в заголовке каждого раунда
+    rooms = __include_room_related_models(rooms).select_related('round__motion')
 
     for room in rooms.order_by('round_id', 'number'):
 
@@ -655,8 +975,11 @@ def get_all_rounds_and_rooms(tournament: Tournament):
     return results
 
 
-def get_rooms_from_last_round(tournament: Tournament, shuffle=False, chair=None) -> [Room]:
-    room = Room.objects.filter(round=_get_last_round(tournament))
+def get_rooms_from_last_round(tournament: Tournament, shuffle=False, chair=None, last_round=None) -> [Room]:
+    """
+    last_round - если последний раунд уже загружен (TournamentContext)
+    """
+    room = Room.objects.filter(round=last_round or _get_last_round(tournament))
     if chair:
         room = room.filter(game__chair=chair)
 
@@ -665,63 +988,38 @@ def get_rooms_from_last_round(tournament: Tournament, shuffle=False, chair=None)
     return room.order_by('id') if not shuffle else room.order_by('?')
 
 
-def get_tab(tournament: Tournament):
+def _fill_empty_standings(tournament: Tournament, is_empty: bool) -> bool:
     """
-    TODO Вынести класс tournament в отдельный файл и этот метот в этот класс
-    :param tournament:
-    :return:
+    Тэб турнира ещё ни разу не сохранялся (например, турнир сыгран до появления TeamStanding)
     """
-    teams = {}
-
-    rooms = Room.objects.filter(round__tournament=tournament)
-    rooms = __include_room_related_models(rooms)
+    if not is_empty or not GameResult.objects.filter(game__room__round__tournament=tournament).exists():
+        return False
 
-    count_playoff_rounds = 0
-    temp_round = _get_temp_round(tournament)
-    if temp_round:
-        count_playoff_rounds = _count_playoff_rounds_in_tournament(temp_round.room_set.count() * TEAM_IN_GAME)
+    update_standings(tournament)
+    return True
 
-    for room in rooms.order_by('round_id', 'number'):
 
-        # TODO Убрать это
-        try:
-            room.game.gameresult
-        except AttributeError:
-            continue
-
-        if room.round.is_playoff:
-            game_result = room.game.gameresult.playoffresult
-        else:
-            game_result = room.game.gameresult.qualificationresult
-
-        game_result.game = room.game
-
-        for position in [
-            [game_result.get_og_result(), Position.OG],
-            [game_result.get_oo_result(), Position.OO],
-            [game_result.get_cg_result(), Position.CG],
-            [game_result.get_co_result(), Position.CO],
-        ]:
-            team_result = TeamRoundResult(
-                position[0]['place'],
-                position[0]['speaker_1'],
-                position[0]['speaker_2'],
-                position[0]['revert'],
-                position[1],
-                room.round.number,
-                room.round.is_closed,
-                room.round.is_playoff
-            )
+@cache_by_results
+def get_tab_arrays(tournament: Tournament) -> TabArrays:
+    """
+    Командный тэб турнира в массивах (см. TabArrays): строки TeamStanding читаются одним запросом values_list
+    :param tournament:
+    :return: TabArrays, команды в порядке id
+    """
+    def _get_rows():
+        return list(
+            TeamStanding.objects.filter(tournament=tournament)
+            .order_by('team_id')
+            .values_list('team_id', 'playoff_position', 'og', 'oo', 'cg', 'co', 'rounds')
+        )
 
-            if position[0]['team'].id not in teams.keys():
-                teams[position[0]['team'].id] = TeamResult(position[0]['team'], count_playoff_rounds)
+    rows = _get_rows()
+    if _fill_empty_standings(tournament, not rows):
+        rows = _get_rows()
 
-            if room.round.is_playoff:
-                teams[position[0]['team'].id].add_playoff_round(team_result)
-            else:
-                teams[position[0]['team'].id].add_round(team_result)
+    teams = Team.objects.filter(id__in=[row[0] for row in rows]).select_related('speaker_1', 'speaker_2').in_bulk()
 
-    return list(teams.values())
+    return TabArrays.from_standings(rows, teams, _get_count_playoff_rounds(tournament))
 
 
 def get_teams_by_user(user: User, tournament: Tournament, roles=[ROLE_MEMBER]):
@@ -749,13 +1047,16 @@ def remove_last_round(tournament: Tournament):
     if not last_round:
         return False
 
-    for room in Room.objects.filter(round=last_round):
+    teams_id = set()
+    for room in Room.objects.filter(round=last_round).select_related('game'):
+        teams_id.update([room.game.og_id, room.game.oo_id, room.game.cg_id, room.game.co_id])
         room.game.delete()
 
     if not last_round.is_playoff:
         tournament.round_number_dec()
 
     last_round.delete()
+    update_standings(tournament, teams_id)
     return True
 
 
@@ -772,19 +1073,20 @@ def remove_playoff(tournament: Tournament):
 
 
 def get_rooms_by_user(tournament: Tournament, user: User) -> [Room]:
-    team_rel = tournament.teamtournamentrel_set.filter(
+    # Двух строк достаточно, чтобы заметить лишнюю команду
+    team_rels = list(tournament.teamtournamentrel_set.filter(
         Q(team__speaker_1=user) | Q(team__speaker_2=user),
         role=ROLE_MEMBER
-    )
+    ).select_related('team').order_by('id')[:2])
 
-    if not team_rel.count():
+    if not team_rels:
         return []
-    elif team_rel.count() > 1:
+    elif len(team_rels) > 1:
         logging.getLogger('TeamFeedback').error(
-            'There %d actual teams for user (%d) in tournament (%d)' % (team_rel.count(), user.id, tournament.id)
+            'There are several actual teams for user (%d) in tournament (%d)' % (user.id, tournament.id)
         )
 
-    team = team_rel.first().team
+    team = team_rels[0].team
 
     return Room.objects.filter(
         Q(game__og=team) | Q(game__oo=team) | Q(game__cg=team) | Q(game__co=team),
@@ -793,12 +1095,29 @@ def get_rooms_by_user(tournament: Tournament, user: User) -> [Room]:
     ).select_related('game', 'game__chair', 'round').order_by('round__number')
 
 
+def get_user_roles(tournament: Tournament, user: User) -> set:
+    """
+    id ролей пользователя в турнире. Запоминаются в объекте пользователя,
+    а request.user создаётся на каждый запрос, поэтому запрос к базе - один на запрос
+    """
+    if not user.is_authenticated:
+        return set()
+
+    roles = getattr(user, '_tournament_roles', None)
+    if roles is None:
+        roles = user._tournament_roles = {}
+
+    if tournament.id not in roles:
+        roles[tournament.id] = set(
+            tournament.usertournamentrel_set.filter(user=user).values_list('role_id', flat=True)
+        )
+
+    return roles[tournament.id]
+
+
 def user_can_edit_tournament(tournament: Tournament, user: User, only_owner=False):
     roles = [ROLE_OWNER] if only_owner else [ROLE_OWNER, ROLE_ADMIN, ROLE_CHIEF_ADJUDICATOR]
-    return user.is_authenticated and tournament.usertournamentrel_set.filter(
-        user=user,
-        role__in=roles
-    ).count()
+    return bool(get_user_roles(tournament, user) & {role.id for role in roles if role})
 
 
 def __include_room_related_models(queryset):
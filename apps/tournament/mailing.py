@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+# Писем на одно SMTP-соединение и пауза между пачками, сек
+EMAIL_BATCH_SIZE = 50
+EMAIL_BATCH_DELAY = 1
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def send_emails(messages: [EmailMessage], batch_size=None, delay=None) -> [str]:
+    """
+    Отправляет письма пачками по batch_size через одно SMTP-соединение на пачку
+    и делает паузу delay между пачками, чтобы не упереться в лимиты почтового сервера
+    :return: ошибку или '' для каждого письма, в том же порядке
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_BATCH_SIZE', EMAIL_BATCH_SIZE)
+    delay = getattr(settings, 'EMAIL_BATCH_DELAY', EMAIL_BATCH_DELAY) if delay is None else delay
+
+    errors = []
+    for number, chunk in enumerate(_chunks(messages, batch_size)):
+        if number and delay:
+            time.sleep(delay)
+
+        try:
+            connection = get_connection()
+            connection.open()
+        except Exception as e:
+            logging.getLogger('Mailing').exception('SMTP connection failed')
+            errors += [str(e)] * len(chunk)
+            continue
+
+        try:
+            for message in chunk:
+                # Отправляем по одному в общем соединении, чтобы знать, какое письмо не ушло
+                try:
+                    connection.send_messages([message])
+                    errors.append('')
+                except Exception as e:
+                    errors.append(str(e))
+        finally:
+            connection.close()
+
+    return errors
@@ -0,0 +1,98 @@
+import functools
+import random
+import timeit
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from apps.tournament.consts import Position
+from apps.tournament.logic import TeamResult, TeamRoundResult
+from apps.tournament.models import Team
+
+
+def _legacy_sum_points(team_result: TeamResult):
+    return sum(list(map(lambda x: x.points * bool(team_result.show_all or not x.is_closed), team_result.rounds)))
+
+
+def _legacy_sum_speakers(team_result: TeamResult):
+    return 0 if not team_result.show_all \
+        else sum(list(map(lambda x: x.speaker_1 + x.speaker_2, team_result.rounds)))
+
+
+def _legacy_compare(a: TeamResult, b: TeamResult):
+    # Сравнение как раньше в TeamResult.__lt__: суммы по раундам пересчитываются при каждом вызове
+    is_less = _legacy_sum_points(a) < _legacy_sum_points(b) \
+        or _legacy_sum_points(a) == _legacy_sum_points(b) and _legacy_sum_speakers(a) < _legacy_sum_speakers(b)
+    return -1 if is_less else 0
+
+
+class _LegacyRoundResult:
+    # TeamRoundResult без __slots__
+
+    def __init__(self, *args):
+        self.place, self.speaker_1, self.speaker_2, self.is_reversed, self.position, self.number, \
+            self.is_closed, self.is_playoff = args
+        self.points = 4 - self.place
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает сортировку тэба по ключу с прежней сортировкой через __lt__ на синтетическом тэбе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=300)
+        parser.add_argument('--rounds', type=int, default=9)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _make_tab(self, count_teams, count_rounds):
+        rand = random.Random(0)
+        tab = []
+        for i in range(count_teams):
+            team_result = TeamResult(Team(id=i + 1, name='Team %d' % (i + 1)), 0)
+            for number in range(1, count_rounds + 1):
+                team_result.add_round(TeamRoundResult(
+                    rand.randint(1, 4),
+                    rand.randint(65, 85),
+                    rand.randint(65, 85),
+                    False,
+                    Position(rand.randint(1, 4)),
+                    number,
+                    number == count_rounds,
+                    False
+                ))
+            tab.append(team_result)
+
+        return tab
+
+    @staticmethod
+    def _allocated(make_round, count):
+        tracemalloc.start()
+        rounds = [make_round(1, 75, 75, False, Position.OG, 1, False, False) for _ in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size // len(rounds)
+
+    def handle(self, *args, **options):
+        tab = self._make_tab(options['teams'], options['rounds'])
+        repeat = options['repeat']
+
+        legacy = timeit.timeit(
+            lambda: sorted(tab, key=functools.cmp_to_key(_legacy_compare), reverse=True), number=repeat
+        )
+        by_key = timeit.timeit(lambda: sorted(tab, key=TeamResult.sort_key, reverse=True), number=repeat)
+
+        self._check_same_order(tab)
+
+        count_rounds = options['teams'] * options['rounds']
+        self.stdout.write('teams: %d, rounds: %d, repeat: %d' % (options['teams'], options['rounds'], repeat))
+        self.stdout.write('sort via __lt__ with recount: %.2f ms' % (legacy / repeat * 1000))
+        self.stdout.write('sort by cached key:          %.2f ms' % (by_key / repeat * 1000))
+        self.stdout.write(self.style.SUCCESS('speedup: x%.1f' % (legacy / by_key)))
+        self.stdout.write('round result with __dict__: %d bytes' % self._allocated(_LegacyRoundResult, count_rounds))
+        self.stdout.write('round result with __slots__: %d bytes' % self._allocated(TeamRoundResult, count_rounds))
+
+    @staticmethod
+    def _check_same_order(tab):
+        legacy = sorted(tab, key=functools.cmp_to_key(_legacy_compare), reverse=True)
+        by_key = sorted(tab, key=TeamResult.sort_key, reverse=True)
+        if [x.team.id for x in legacy] != [x.team.id for x in by_key]:
+            raise AssertionError('Sort by key differs from sort via __lt__')
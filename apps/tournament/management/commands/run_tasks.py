@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.tournament.tasks import requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновой очереди: выполняет задачи из таблицы Task'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'TASK_WORKERS', 4))
+        parser.add_argument('--interval', type=float, default=2, help='пауза между проверками пустой очереди, сек')
+        parser.add_argument('--stale', type=int, default=600, help='через сколько секунд вернуть зависшую задачу')
+        parser.add_argument('--once', action='store_true', help='выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        while True:
+            requeue_stale(options['stale'])
+            count = run_pending(options['workers'])
+            if count:
+                self.stdout.write('%d tasks done' % count)
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
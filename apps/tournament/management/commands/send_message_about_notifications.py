@@ -1,15 +1,14 @@
-import logging
-
-from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.utils.html import strip_tags
-from apps.tournament.models import Tournament, TelegramToken
+from apps.tournament.models import Notification, Tournament, TelegramToken
+from apps.tournament.notifications import queue_notifications
+from apps.tournament.tasks import enqueue
 from django_telegrambot.apps import DjangoTelegramBot
 
 
 class Command(BaseCommand):
+    help = 'Ставит в очередь письма спикерам турнира с приглашением подключить телеграм-бота'
 
     def add_arguments(self, parser):
         parser.add_argument('tournament_id', type=int)
@@ -17,25 +16,34 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         tournament = Tournament.objects.get(pk=options['tournament_id'])
         bot_name = DjangoTelegramBot.getBot().username
+        key = 'tournament/%d/start' % tournament.id
+
+        # Кому письмо уже поставлено, токен повторно не создаём
+        queued = set(Notification.objects.filter(key=key).values_list('recipient', flat=True))
 
+        speakers = []
         for team in tournament.get_teams():
             for speaker in team.team.get_speakers():
-
-                if speaker.telegram_id:
-                    continue
-
-                html_content = render_to_string(
-                    'tournament/start_tournament_email.html',
-                    {
-                        'tournament': tournament,
-                        'bot_name': bot_name,
-                        'token': TelegramToken.generate(speaker).value,
-                    }
-                )
-
-                text_content = strip_tags(html_content)
-                logging.info(html_content)
-                logging.info(text_content)
-                msg = EmailMultiAlternatives(tournament.name, text_content, settings.EMAIL_HOST_USER, [speaker.email])
-                msg.attach_alternative(html_content, 'text/html')
-                msg.send()
+                if not getattr(speaker, 'telegram_id', None) and speaker.email not in queued:
+                    speakers.append(speaker)
+
+        template = get_template('tournament/start_tournament_email.html')
+        tokens = TelegramToken.bulk_generate(speakers)
+
+        messages = []
+        for speaker in speakers:
+            html_content = template.render({
+                'tournament': tournament,
+                'bot_name': bot_name,
+                'token': tokens[speaker.id],
+            })
+
+            messages.append((speaker.email, {
+                'subject': tournament.name,
+                'text': strip_tags(html_content),
+                'html': html_content,
+            }))
+
+        count = queue_notifications(key, Notification.CHANNEL_EMAIL, messages)
+        enqueue('send_notifications')
+        self.stdout.write('%d emails queued' % count)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.tournament.logic import update_standings
+from apps.tournament.models import Tournament
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('id', type=int, help='id турнира, 0 - пересчитать все турниры')
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.filter(id=options['id']) if options['id'] > 0 \
+            else Tournament.objects.all()
+
+        for tournament in tournaments.order_by('id'):
+            update_standings(tournament)
+            self.stdout.write(self.style.SUCCESS('%s %s' % (tournament.id, tournament.name)))
@@ -10,6 +10,7 @@ MSG_ROUND_NOT_EXIST = 'Нет созданных раундов в этой ст
 MSG_ROUND_ALREADY_PUBLISHED = 'Раунд уже опубликован ранее'
 MSG_NO_ROUND_IN_PLAYOFF_FOR_REMOVE = 'Нет сыграных раундов плейофф. Для удаления отборочных раундов отмените брейк'
 MSG_ROUND_NOT_PUBLIC = 'Раунд ещё не опубликован'
+MSG_DRAW_PREVIEW_OUTDATED = 'Результаты, судьи или аудитории турнира изменились после предпросмотра. Посмотрите рассадку ещё раз'
 MSG_ERROR_TO_ACCESS = 'У Вас нет прав для просмотра данной страницы, обратитесь к создателю турнира'
 MSG_TOURNAMENT_CHANGED = 'Изменения сохранены'
 MSG_JSON_OK = 'ok'
@@ -60,6 +61,7 @@ LBL_CUSTOM_FIELD_TEAM = 'Название команды'
 LBL_CUSTOM_FIELD_ADJUDICATOR = 'E-mail'
 
 MSG_TEAM_URL = "Ссылка на таблицу Google Drive"
+MSG_TEAM_FILE = "Или файл CSV/XLSX"
 
 MSG_TEAM_NAME = 'Названия команд'
 
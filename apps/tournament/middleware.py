@@ -0,0 +1,137 @@
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('RequestStats')
+
+# Последние запросы каждой view: {view_name: deque([(view_ms, queries, db_ms)])}
+_stats = {}
+_lock = threading.Lock()
+
+PERCENTILES = [50, 90, 99]
+
+
+class _QueryCounter:
+    """
+    Обёртка над выполнением запросов (connection.execute_wrapper): считает запросы, время и самый долгий
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest:
+                self.slowest = duration
+                self.slowest_sql = sql
+
+
+class QueryStatsMiddleware:
+    """
+    Для каждого запроса считает SQL-запросы, время в базе, самый долгий запрос и время view.
+    Превышение порогов пишется в лог RequestStats строкой json, перцентили по view - в памяти процесса
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_STATS', True)
+        self.slow_request_ms = getattr(settings, 'SLOW_REQUEST_MS', 1000)
+        self.slow_request_queries = getattr(settings, 'SLOW_REQUEST_QUERIES', 50)
+        self.slow_query_ms = getattr(settings, 'SLOW_QUERY_MS', 200)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        view_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else ''
+        if view_name:
+            record(view_name, view_ms, counter.count, counter.duration * 1000)
+
+        if view_ms >= self.slow_request_ms or counter.count >= self.slow_request_queries \
+                or counter.slowest * 1000 >= self.slow_query_ms:
+            logger.warning('slow_request %s', json.dumps({
+                'view': view_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'user': request.user.id if getattr(request, 'user', None) else None,
+                'queries': counter.count,
+                'db_ms': round(counter.duration * 1000, 1),
+                'view_ms': round(view_ms, 1),
+                'slowest_ms': round(counter.slowest * 1000, 1),
+                'slowest_sql': counter.slowest_sql[:500],
+            }, ensure_ascii=False))
+
+        return response
+
+
+def record(view_name: str, view_ms: float, queries: int, db_ms: float):
+    with _lock:
+        samples = _stats.get(view_name)
+        if samples is None:
+            samples = _stats[view_name] = collections.deque(maxlen=getattr(settings, 'REQUEST_STATS_WINDOW', 500))
+        samples.append((view_ms, queries, db_ms))
+
+
+def _percentiles(values: list) -> dict:
+    values = sorted(values)
+    return {
+        'p%d' % percentile: round(values[min(len(values) - 1, len(values) * percentile // 100)], 1)
+        for percentile in PERCENTILES
+    }
+
+
+def get_view_stats() -> dict:
+    """
+    Перцентили по последним REQUEST_STATS_WINDOW запросам каждой view, самые медленные первыми.
+    У каждого воркера gunicorn своя статистика, поэтому в ответе есть pid
+    """
+    with _lock:
+        items = [(view_name, list(samples)) for view_name, samples in _stats.items()]
+
+    views = {}
+    for view_name, samples in items:
+        if not samples:
+            continue
+        view_ms, queries, db_ms = zip(*samples)
+        views[view_name] = {
+            'count': len(samples),
+            'view_ms': _percentiles(view_ms),
+            'queries': _percentiles(queries),
+            'db_ms': _percentiles(db_ms),
+        }
+
+    return {
+        'pid': os.getpid(),
+        'views': dict(sorted(views.items(), key=lambda x: -x[1]['view_ms']['p90'])),
+    }
+
+
+def reset_view_stats():
+    with _lock:
+        _stats.clear()
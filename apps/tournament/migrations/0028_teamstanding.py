@@ -0,0 +1,33 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0027_add_telegram_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamStanding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('speakers', models.IntegerField(default=0)),
+                ('og', models.PositiveIntegerField(default=0)),
+                ('oo', models.PositiveIntegerField(default=0)),
+                ('cg', models.PositiveIntegerField(default=0)),
+                ('co', models.PositiveIntegerField(default=0)),
+                ('playoff_position', models.IntegerField(default=0)),
+                ('rounds', models.TextField(default='[]')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tournament.Team')),
+                ('tournament', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, to='tournament.Tournament'
+                )),
+            ],
+            options={
+                'unique_together': {('tournament', 'team')},
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0028_teamstanding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='draw_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0029_round_draw_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('args', models.TextField(default='[]')),
+                ('key', models.CharField(blank=True, db_index=True, default='', max_length=200)),
+                ('status', models.CharField(
+                    choices=[
+                        ('queued', 'В очереди'),
+                        ('running', 'Выполняется'),
+                        ('done', 'Выполнена'),
+                        ('failed', 'Ошибка'),
+                    ],
+                    default='queued',
+                    max_length=10
+                )),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_after', models.DateTimeField()),
+                ('error', models.TextField(blank=True, default='')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'index_together': {('status', 'run_after')},
+            },
+        ),
+    ]
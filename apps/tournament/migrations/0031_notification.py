@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0030_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('channel', models.CharField(choices=[('telegram', 'Telegram'), ('email', 'Email')], max_length=10)),
+                ('recipient', models.CharField(max_length=255)),
+                ('payload', models.TextField(default='{}')),
+                ('status', models.CharField(
+                    choices=[
+                        ('queued', 'В очереди'),
+                        ('sending', 'Отправляется'),
+                        ('sent', 'Отправлено'),
+                        ('failed', 'Ошибка'),
+                    ],
+                    default='queued',
+                    max_length=10
+                )),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('key', 'channel', 'recipient')},
+                'index_together': {('status', 'id')},
+            },
+        ),
+    ]
@@ -11,8 +11,11 @@
 #   place -> tournament
 #   round -> tournament, motion
 #   room -> round, place, game
+#   standing -> tournament, team
 #   page -> tournament
 #   custom_form  -> tournament, round, profile
+#   task
+#   notification
 #
 #   bot_users -> language
 #
@@ -44,6 +47,7 @@ from . tournament import \
 from apps.place.models import Place
 from apps.round.models import Round
 from . room import Room
+from . standing import TeamStanding
 from . page import \
     AccessToPage, \
     Page
@@ -57,3 +61,5 @@ from apps.custom_form.models import \
     FeedbackAnswer
 
 from . bot_users import BotChat, BotUsers
+from . task import Task
+from . notification import Notification
@@ -0,0 +1,55 @@
+from django.db import models
+
+import json
+
+
+class Notification(models.Model):
+    """
+    Исходящее сообщение участнику: строка на получателя в рамках рассылки key (например, round/<id>).
+    Повторная постановка той же рассылки не создаёт дублей, отправляет команда run_tasks
+    """
+
+    CHANNEL_TELEGRAM = 'telegram'
+    CHANNEL_EMAIL = 'email'
+
+    CHANNELS = [
+        (CHANNEL_TELEGRAM, 'Telegram'),
+        (CHANNEL_EMAIL, 'Email'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    STATUSES = [
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    key = models.CharField(max_length=100)
+    channel = models.CharField(max_length=10, choices=CHANNELS)
+    # chat_id для телеграма, адрес для почты
+    recipient = models.CharField(max_length=255)
+    payload = models.TextField(default='{}')
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('key', 'channel', 'recipient')
+        index_together = ('status', 'id')
+
+    def set_payload(self, payload: dict):
+        self.payload = json.dumps(payload)
+
+    def get_payload(self) -> dict:
+        return json.loads(self.payload)
+
+    def __str__(self):
+        return '%s %s -> %s: %s' % (self.key, self.channel, self.recipient, self.status)
@@ -0,0 +1,39 @@
+from django.db import models
+from apps.team.models import Team
+from . tournament import Tournament
+
+import json
+
+
+class TeamStanding(models.Model):
+    """
+    Сохранённая строка командного тэба. Пересчитывается при изменении результатов игр команды
+    """
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    points = models.IntegerField(default=0)
+    speakers = models.IntegerField(default=0)
+    og = models.PositiveIntegerField(default=0)
+    oo = models.PositiveIntegerField(default=0)
+    cg = models.PositiveIntegerField(default=0)
+    co = models.PositiveIntegerField(default=0)
+    playoff_position = models.IntegerField(default=0)
+
+    # [[place, speaker_1, speaker_2, is_reversed, position, number, is_closed], ...]
+    rounds = models.TextField(default='[]')
+
+    class Meta:
+        unique_together = ('tournament', 'team')
+
+    def set_rounds(self, rounds):
+        self.rounds = json.dumps(rounds)
+
+    def get_rounds(self):
+        return json.loads(self.rounds)
+
+    def get_positions(self) -> [int]:
+        return [self.og, self.oo, self.cg, self.co]
+
+    def __str__(self):
+        return '%s: %s - %s (%s)' % (self.tournament_id, self.team_id, self.points, self.speakers)
@@ -0,0 +1,48 @@
+from django.db import models
+
+import json
+
+
+class Task(models.Model):
+    """
+    Задача фоновой очереди: функция из apps.tournament.tasks, зарегистрированная под именем name,
+    с аргументами args. Выполняет команда run_tasks
+    """
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUSES = [
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.TextField(default='[]')
+
+    # Пока задача с тем же ключом в очереди, такая же не добавляется
+    key = models.CharField(max_length=200, blank=True, default='', db_index=True)
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField()
+    error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        index_together = ('status', 'run_after')
+
+    def set_args(self, args):
+        self.args = json.dumps(args)
+
+    def get_args(self):
+        return json.loads(self.args)
+
+    def __str__(self):
+        return '%s (%s): %s' % (self.name, self.id, self.status)
@@ -0,0 +1,290 @@
+import asyncio
+import datetime
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import F
+from telegram import Bot
+from telegram.error import RetryAfter, TelegramError
+
+from .mailing import send_emails
+from .models import Notification, Round, Room
+from .tasks import enqueue
+
+# Telegram разрешает боту около 30 сообщений в секунду в разные чаты
+TELEGRAM_RATE = 30
+# Одновременных запросов к Bot API
+TELEGRAM_CONCURRENCY = 10
+# Сообщений outbox за один проход и попыток на сообщение
+NOTIFICATION_BATCH = 200
+NOTIFICATION_MAX_ATTEMPTS = 3
+# Через сколько секунд повторить неотправленные и вернуть в очередь зависшие в отправке сообщения
+NOTIFICATION_RETRY_DELAY = 60
+NOTIFICATION_STALE = 600
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости: rate токенов в секунду, не больше capacity накопленных
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+def get_room_message(room: Room, motion: str) -> str:
+    # Аудитория может быть не назначена, если мест меньше, чем комнат
+    place = room.place.place if room.place else 'не назначена'
+    return \
+        '1П: ' + room.game.og.name + '\n' + \
+        '1О: ' + room.game.oo.name + '\n' + \
+        '2П: ' + room.game.cg.name + '\n' + \
+        '2О: ' + room.game.co.name + '\n\n' + \
+        'Судья: ' + room.game.chair.name() + '\n\n' + \
+        'Аудитория: ' + place + '\n\n' + \
+        motion
+
+
+def get_round_messages(cur_round: Round, rooms: [Room]) -> [tuple]:
+    """
+    Текст собирается один раз на комнату, затем отправляется судье и всем спикерам
+    :return: [(chat_id, text)] для участников, привязавших телеграм
+    """
+    motion = cur_round.motion.infoslide + '\n\n' + cur_round.motion.motion if cur_round.motion.infoslide \
+        else cur_round.motion.motion
+
+    messages = []
+    for room in rooms:
+        room_message = get_room_message(room, motion)
+        users = [room.game.chair]
+        for team in room.game.get_teams():
+            users += team.get_speakers()
+
+        for user in users:
+            chat_id = getattr(user, 'telegram_id', None)
+            if chat_id:
+                messages.append((chat_id, room_message))
+
+    return messages
+
+
+async def _send_message(bot: Bot, bucket: TokenBucket, semaphore: asyncio.Semaphore, chat_id, text: str):
+    """
+    :return: текст ошибки или ''
+    """
+    async with semaphore:
+        for attempt in range(2):
+            await bucket.acquire()
+            try:
+                await bot.send_message(chat_id, text)
+                return ''
+            except RetryAfter as e:
+                # Превысили лимит, телеграм сообщает, сколько подождать; повторяем один раз
+                if attempt:
+                    return str(e)
+                await asyncio.sleep(e.retry_after)
+            except TelegramError as e:
+                return str(e)
+
+
+async def send_messages(token: str, messages: [tuple], rate=None, concurrency=None, base_url=None) -> [str]:
+    """
+    Отправляет сообщения [(chat_id, text)] параллельно, но не быстрее rate в секунду
+    base_url - адрес Bot API, по умолчанию api.telegram.org
+    :return: ошибку или '' для каждого сообщения, в том же порядке
+    """
+    bucket = TokenBucket(rate or getattr(settings, 'TELEGRAM_RATE', TELEGRAM_RATE))
+    semaphore = asyncio.Semaphore(concurrency or TELEGRAM_CONCURRENCY)
+    bot = Bot(token, base_url=base_url or getattr(settings, 'TELEGRAM_API_URL', None) or 'https://api.telegram.org/bot')
+
+    async with bot:
+        return await asyncio.gather(*[
+            _send_message(bot, bucket, semaphore, chat_id, text) for chat_id, text in messages
+        ])
+
+
+def _get_round_rooms(cur_round: Round) -> [Room]:
+    return Room.objects.filter(round=cur_round).order_by('number').select_related(
+        'place', 'game__og', 'game__oo', 'game__cg', 'game__co', 'game__chair',
+        *['game__%s__speaker_%d' % (position, i) for position in ['og', 'oo', 'cg', 'co'] for i in [1, 2]]
+    )
+
+
+def queue_notifications(key: str, channel: str, messages: [tuple]) -> int:
+    """
+    Записывает рассылку key в outbox одним запросом; уже записанные получатели пропускаются
+    messages - [(recipient, payload)]
+    :return: сколько сообщений поставлено в очередь
+    """
+    exists = set(Notification.objects.filter(key=key, channel=channel).values_list('recipient', flat=True))
+
+    notifications = []
+    for recipient, payload in messages:
+        recipient = str(recipient)
+        if recipient in exists:
+            continue
+        exists.add(recipient)
+        notification = Notification(key=key, channel=channel, recipient=recipient)
+        notification.set_payload(payload)
+        notifications.append(notification)
+
+    # ignore_conflicts - на случай одновременной постановки той же рассылки
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+
+    return len(notifications)
+
+
+def queue_round_notifications(cur_round: Round) -> int:
+    """
+    Ставит в outbox сообщения участникам раунда с их комнатой и темой
+    """
+    messages = get_round_messages(cur_round, _get_round_rooms(cur_round))
+    return queue_notifications(
+        'round/%d' % cur_round.id,
+        Notification.CHANNEL_TELEGRAM,
+        [(chat_id, {'text': text}) for chat_id, text in messages]
+    )
+
+
+def claim_notifications(limit: int, after_id=0) -> [Notification]:
+    """
+    Забирает до limit сообщений из очереди и помечает их отправляемыми, как claim_tasks
+    """
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(status=Notification.STATUS_QUEUED, id__gt=after_id)
+            .order_by('id')[:limit]
+        )
+        Notification.objects.filter(id__in=[i.id for i in notifications]).update(
+            status=Notification.STATUS_SENDING,
+            updated=datetime.datetime.now()
+        )
+
+    return notifications
+
+
+def requeue_stale_notifications(timeout: int, max_attempts: int) -> int:
+    """
+    Возвращает в очередь сообщения, которые отправляются дольше timeout секунд (воркер упал), как requeue_stale.
+    Упавшая отправка считается попыткой
+    """
+    def get_stale():
+        return Notification.objects.filter(
+            status=Notification.STATUS_SENDING,
+            updated__lt=datetime.datetime.now() - datetime.timedelta(seconds=timeout)
+        )
+
+    now = datetime.datetime.now()
+    error = 'Отправка не завершилась за %d секунд' % timeout
+    failed = get_stale().filter(attempts__gte=max_attempts - 1).update(
+        status=Notification.STATUS_FAILED, attempts=F('attempts') + 1, error=error, updated=now
+    )
+    requeued = get_stale().update(
+        status=Notification.STATUS_QUEUED, attempts=F('attempts') + 1, error=error, updated=now
+    )
+
+    return failed + requeued
+
+
+def _send_telegram(notifications: [Notification]) -> [str]:
+    return asyncio.run(send_messages(
+        settings.TELEGRAM_BOT_TOKEN,
+        [(int(i.recipient), i.get_payload()['text']) for i in notifications]
+    ))
+
+
+def _send_email(notifications: [Notification]) -> [str]:
+    messages = []
+    for notification in notifications:
+        payload = notification.get_payload()
+        message = EmailMultiAlternatives(
+            payload['subject'], payload['text'], settings.EMAIL_HOST_USER, [notification.recipient]
+        )
+        message.attach_alternative(payload['html'], 'text/html')
+        messages.append(message)
+
+    return send_emails(messages)
+
+
+_SENDERS = {
+    Notification.CHANNEL_TELEGRAM: _send_telegram,
+    Notification.CHANNEL_EMAIL: _send_email,
+}
+
+
+def deliver_notifications(batch_size=None, max_attempts=None) -> int:
+    """
+    Отправляет очередь outbox пачками по batch_size. Неотправленные сообщения возвращаются в очередь,
+    после max_attempts попыток остаются с ошибкой; для повтора ставится задача send_notifications
+    через NOTIFICATION_RETRY_DELAY секунд. Сообщения, зависшие в отправке после падения воркера,
+    сначала возвращаются в очередь
+    :return: сколько сообщений отправлено
+    """
+    batch_size = batch_size or NOTIFICATION_BATCH
+    max_attempts = max_attempts or NOTIFICATION_MAX_ATTEMPTS
+
+    requeue_stale_notifications(NOTIFICATION_STALE, max_attempts)
+
+    count_sent = 0
+    last_id = 0
+    retry = None
+    while True:
+        notifications = claim_notifications(batch_size, last_id)
+        if not notifications:
+            break
+        last_id = notifications[-1].id
+
+        for channel, send in _SENDERS.items():
+            channel_notifications = [i for i in notifications if i.channel == channel]
+            if not channel_notifications:
+                continue
+
+            try:
+                errors = send(channel_notifications)
+            except Exception as e:
+                errors = [str(e) or e.__class__.__name__] * len(channel_notifications)
+
+            for notification, error in zip(channel_notifications, errors):
+                notification.attempts += 1
+                notification.error = error
+                notification.updated = datetime.datetime.now()
+                if not error:
+                    notification.status = Notification.STATUS_SENT
+                    count_sent += 1
+                elif notification.attempts < max_attempts:
+                    notification.status = Notification.STATUS_QUEUED
+                    retry = notification
+                else:
+                    notification.status = Notification.STATUS_FAILED
+
+        Notification.objects.bulk_update(notifications, ['status', 'attempts', 'error', 'updated'])
+
+    if retry:
+        # Ключ по сообщению и попытке не совпадает с ключом выполняющейся сейчас задачи повтора
+        enqueue(
+            'send_notifications',
+            key='send_notifications/%d/%d' % (retry.id, retry.attempts),
+            delay=NOTIFICATION_RETRY_DELAY
+        )
+
+    return count_sent
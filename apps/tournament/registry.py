@@ -0,0 +1,130 @@
+import threading
+
+from django.utils.functional import SimpleLazyObject, empty
+
+
+class LazyConstant(SimpleLazyObject):
+    """
+    Объект из справочника, который загружается при первом обращении.
+    Ведёт себя как сам объект модели: его можно сравнивать, передавать в filter() и присваивать в ForeignKey.
+    isinstance() не загружает объект: поиск тестов проверяет так все глобальные переменные модулей ещё до создания базы
+    """
+
+    def __init__(self, func, value_class):
+        self.__dict__['_value_class'] = value_class
+        super().__init__(func)
+
+    @property
+    def __class__(self):
+        if self._wrapped is empty:
+            return self._value_class
+        return self._wrapped.__class__
+
+    def _reset(self):
+        self._wrapped = empty
+
+
+class LazyList(LazyConstant):
+    """
+    Список объектов из справочника. filter(role__in=...) пересобирает список как type(value)(values),
+    поэтому вместо функции можно передать готовые значения
+    """
+
+    def __init__(self, func):
+        if not callable(func):
+            values = list(func)
+            func = lambda: values
+        super().__init__(func, list)
+
+
+class ConstantsRegistry:
+    """
+    Справочные объекты (роли, статусы, типы форм) по естественному ключу, хранятся в памяти процесса.
+    Загружаются при первом обращении, warm() загружает все сразу, invalidate() сбрасывает
+    """
+
+    def __init__(self):
+        self.objects = {}
+        # (model, field, value) всех объявленных констант
+        self.keys = set()
+        self.constants = []
+        self.lock = threading.Lock()
+
+    def _find(self, model, field: str, value):
+        """
+        :return: объект или None, если его нет в базе
+        """
+        key = (model, field, value)
+        self.keys.add(key)
+        objects = self.objects
+        if key not in objects:
+            with self.lock:
+                if key not in self.objects:
+                    self.objects[key] = model.objects.filter(**{field: value}).first()
+                objects = self.objects
+
+        return objects[key]
+
+    def get(self, model, field: str, value):
+        """
+        :raises model.DoesNotExist: если в справочнике нет объекта с таким ключом
+        """
+        obj = self._find(model, field, value)
+        if obj is None:
+            raise model.DoesNotExist('В справочнике %s нет объекта с %s=%r' % (model.__name__, field, value))
+
+        return obj
+
+    def _add(self, constant: LazyConstant) -> LazyConstant:
+        self.constants.append(constant)
+        return constant
+
+    def lazy(self, model, field: str, value) -> LazyConstant:
+        self.keys.add((model, field, value))
+        return self._add(LazyConstant(lambda: self.get(model, field, value), model))
+
+    def lazy_value(self, func, value_class=dict) -> LazyConstant:
+        """
+        Значение, собранное из других констант (например, словарь по типам форм), вычисляется при первом обращении
+        """
+        return self._add(LazyConstant(func, value_class))
+
+    def lazy_list(self, model, field: str, values: list) -> LazyList:
+        """
+        Объекты с естественными ключами values, которых нет в базе, пропускаются
+        """
+        for value in values:
+            self.keys.add((model, field, value))
+        return self._add(LazyList(
+            lambda: [i for i in [self._find(model, field, value) for value in values] if i]
+        ))
+
+    def warm(self):
+        """
+        Загружает все объявленные константы одним запросом на модель
+        """
+        rows = {}
+        objects = {}
+        for model, field, value in list(self.keys):
+            if model not in rows:
+                rows[model] = list(model.objects.order_by('id'))
+            # Как first(): при повторе значения берётся объект с меньшим id
+            objects[(model, field, value)] = next((i for i in rows[model] if getattr(i, field) == value), None)
+
+        with self.lock:
+            self.objects = objects
+            for constant in self.constants:
+                constant._reset()
+
+    def invalidate(self, model=None):
+        with self.lock:
+            if model is None:
+                self.objects = {}
+            else:
+                self.objects = {key: value for key, value in self.objects.items() if key[0] is not model}
+
+            for constant in self.constants:
+                constant._reset()
+
+
+registry = ConstantsRegistry()
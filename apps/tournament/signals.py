@@ -0,0 +1,143 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .access import invalidate_access_matrix
+from .caching import bump_results_version
+from .models import \
+    AccessToPage, \
+    CustomFieldAlias, \
+    CustomFormType, \
+    Game, \
+    GameResult, \
+    Motion, \
+    Page, \
+    PlayoffResult, \
+    QualificationResult, \
+    Room, \
+    Round, \
+    TeamTournamentRel, \
+    TournamentRole, \
+    TournamentStatus
+from .registry import registry
+
+
+def _update_standings_by_game(game_id):
+    from .logic import update_standings
+
+    room = Room.objects.filter(game_id=game_id).select_related('game', 'round__tournament').first()
+    if not room:
+        return
+
+    game = room.game
+    update_standings(room.round.tournament, {game.og_id, game.oo_id, game.cg_id, game.co_id})
+
+
+@receiver(post_save, sender=QualificationResult)
+@receiver(post_save, sender=PlayoffResult)
+@receiver(post_delete, sender=QualificationResult)
+@receiver(post_delete, sender=PlayoffResult)
+def game_result_changed(sender, instance, **kwargs):
+    _update_standings_by_game(instance.game_id)
+
+
+@receiver(post_save, sender=Game)
+def game_changed(sender, instance, created, **kwargs):
+    # Составы команд в игре поменяли после ввода результатов, старые команды уже неизвестны
+    if not created and QualificationResult.objects.filter(game=instance).exists():
+        from .logic import update_standings
+
+        room = Room.objects.filter(game=instance).select_related('round__tournament').first()
+        if room:
+            update_standings(room.round.tournament)
+
+
+def _get_round_tab_fields(instance: Round) -> tuple:
+    # Поля раунда, которые хранятся в строках тэба
+    return instance.number, instance.is_closed
+
+
+@receiver(post_init, sender=Round)
+def round_loaded(sender, instance, **kwargs):
+    instance._tab_fields = _get_round_tab_fields(instance)
+
+
+@receiver(post_save, sender=Round)
+def round_changed(sender, instance, created, **kwargs):
+    tab_fields = _get_round_tab_fields(instance)
+    changed = tab_fields != instance._tab_fields
+    instance._tab_fields = tab_fields
+
+    # Публикация и другие правки раунда тэб не меняют
+    if not created and changed and instance.number > 0 and not instance.is_playoff:
+        from .logic import update_standings
+
+        update_standings(instance.tournament)
+
+
+##############################################
+#     Сброс кэша (после пересчёта тэба)     ##
+##############################################
+
+def _bump_by_game(game_id):
+    for tournament_id in Room.objects.filter(game_id=game_id).values_list('round__tournament_id', flat=True):
+        bump_results_version(tournament_id)
+
+
+@receiver(post_save, sender=GameResult)
+@receiver(post_save, sender=QualificationResult)
+@receiver(post_save, sender=PlayoffResult)
+@receiver(post_delete, sender=GameResult)
+@receiver(post_delete, sender=QualificationResult)
+@receiver(post_delete, sender=PlayoffResult)
+def game_result_changed_cache(sender, instance, **kwargs):
+    _bump_by_game(instance.game_id)
+
+
+@receiver(post_save, sender=Game)
+def game_changed_cache(sender, instance, created, **kwargs):
+    if not created:
+        _bump_by_game(instance.id)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def room_changed_cache(sender, instance, **kwargs):
+    # При удалении раунда его румы удаляются раньше, раунда уже может не быть
+    for tournament_id in Round.objects.filter(id=instance.round_id).values_list('tournament_id', flat=True):
+        bump_results_version(tournament_id)
+
+
+@receiver(post_save, sender=Round)
+@receiver(post_delete, sender=Round)
+@receiver(post_save, sender=TeamTournamentRel)
+@receiver(post_delete, sender=TeamTournamentRel)
+def tournament_part_changed_cache(sender, instance, **kwargs):
+    bump_results_version(instance.tournament_id)
+
+
+@receiver(post_save, sender=Motion)
+def motion_changed_cache(sender, instance, created, **kwargs):
+    if not created:
+        for tournament_id in Round.objects.filter(motion=instance).values_list('tournament_id', flat=True):
+            bump_results_version(tournament_id)
+
+
+@receiver(post_save, sender=TournamentRole)
+@receiver(post_save, sender=TournamentStatus)
+@receiver(post_save, sender=CustomFormType)
+@receiver(post_save, sender=CustomFieldAlias)
+@receiver(post_delete, sender=TournamentRole)
+@receiver(post_delete, sender=TournamentStatus)
+@receiver(post_delete, sender=CustomFormType)
+@receiver(post_delete, sender=CustomFieldAlias)
+def constant_changed(sender, instance, **kwargs):
+    # Справочники consts в памяти процесса; другие воркеры увидят изменение после перезапуска
+    registry.invalidate(sender)
+
+
+@receiver(post_save, sender=AccessToPage)
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=AccessToPage)
+@receiver(post_delete, sender=Page)
+def access_to_page_changed(sender, instance, **kwargs):
+    invalidate_access_matrix()
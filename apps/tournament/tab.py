@@ -0,0 +1,84 @@
+import json
+import numpy
+
+from .consts import TEAM_IN_GAME
+from .models import Team
+
+
+class TabArrays:
+    """
+    Тэб турнира в плотных массивах: строка - команда (индекс в teams), колонка - отборочный раунд (номер - 1)
+
+    points[team, round] - баллы команды в раунде
+    speaks[team, round, speaker] - спикерские баллы первого и второго спикера
+    position_counts[team, position] - сколько раз команда была на позиции OG, OO, CG, CO
+    """
+
+    def __init__(self, teams: [Team], count_rounds: int, count_playoff_rounds=0):
+        count_teams = len(teams)
+        self.teams = list(teams)
+        self.count_rounds = count_rounds
+        self.count_playoff_rounds = count_playoff_rounds
+        self.is_closed = numpy.zeros(count_rounds, dtype=bool)
+        self.points = numpy.zeros((count_teams, count_rounds), dtype=numpy.int32)
+        self.speaks = numpy.zeros((count_teams, count_rounds, 2), dtype=numpy.int32)
+        self.position_counts = numpy.zeros((count_teams, TEAM_IN_GAME), dtype=numpy.int32)
+        self.playoff_position = numpy.zeros(count_teams, dtype=numpy.int32)
+
+    @staticmethod
+    def from_standings(rows: list, teams: dict, count_playoff_rounds=0):
+        """
+        :param rows: TeamStanding.values_list('team_id', 'playoff_position', 'og', 'oo', 'cg', 'co', 'rounds')
+        :param teams: {team_id: Team}
+        """
+        rows = [row[:-1] + (json.loads(row[-1]), ) for row in rows]
+        count_rounds = max([cur_round[5] for row in rows for cur_round in row[-1]] + [0])
+        tab = TabArrays([teams[row[0]] for row in rows], count_rounds, count_playoff_rounds)
+        if not rows:
+            return tab
+
+        tab.playoff_position[:] = [row[1] for row in rows]
+        tab.position_counts[:] = [row[2:6] for row in rows]
+
+        # [team, round, place, speaker_1, speaker_2, is_closed]
+        results = numpy.array([
+            [i, cur_round[5] - 1, cur_round[0], cur_round[1], cur_round[2], cur_round[6]]
+            for i, row in enumerate(rows) for cur_round in row[-1]
+        ], dtype=numpy.int32).reshape(-1, 6)
+
+        team, number = results[:, 0], results[:, 1]
+        tab.points[team, number] = numpy.where(results[:, 2] > 0, 4 - results[:, 2], 0)
+        tab.speaks[team, number] = results[:, 3:5]
+        tab.is_closed[number] = results[:, 5].astype(bool)
+
+        return tab
+
+    def __len__(self):
+        return len(self.teams)
+
+    def get_teams_id(self) -> [int]:
+        return [team.id for team in self.teams]
+
+    def get_points(self, show_all=True):
+        """
+        Баллы по раундам, баллы закрытых раундов скрыты если не show_all
+        """
+        return self.points if show_all else self.points * ~self.is_closed
+
+    def sum_points(self, show_all=True):
+        return self.get_points(show_all).sum(axis=1)
+
+    def sum_speakers(self, show_all=True):
+        return self.speaks.sum(axis=(1, 2)) * int(show_all)
+
+    def get_speaker_points(self):
+        """
+        Спикерские по раундам, строка - спикер: [team_0.speaker_1, team_0.speaker_2, team_1.speaker_1, ...]
+        """
+        return self.speaks.transpose((0, 2, 1)).reshape(-1, self.count_rounds)
+
+    def ranking(self, show_all=True):
+        """
+        Индексы команд по местам: по сумме баллов, затем по сумме спикерских. Равные остаются в исходном порядке
+        """
+        return numpy.lexsort((-self.sum_speakers(show_all), -self.sum_points(show_all)))
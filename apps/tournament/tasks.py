@@ -0,0 +1,195 @@
+import datetime
+import logging
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+
+from .models import Task
+
+# name -> func(*args), args должны сохраняться в json
+TASKS = {}
+
+
+def task(name):
+    """
+    Регистрирует функцию под именем name для enqueue
+    """
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name: str, *args, key='', delay=0, max_attempts=None) -> Task:
+    """
+    Добавляет задачу в очередь, её выполнит команда run_tasks.
+    Задача сохраняется в текущей транзакции, воркер увидит её только после коммита
+    key - если задача с таким ключом ещё в очереди, новая не добавляется
+    delay - через сколько секунд выполнять
+    """
+    if key:
+        queued = Task.objects.filter(key=key, status__in=[Task.STATUS_QUEUED, Task.STATUS_RUNNING]).first()
+        if queued:
+            return queued
+
+    new_task = Task(
+        name=name,
+        key=key,
+        run_after=datetime.datetime.now() + datetime.timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'TASK_MAX_ATTEMPTS', 5),
+    )
+    new_task.set_args(list(args))
+    new_task.save()
+
+    return new_task
+
+
+def _get_backoff(attempts: int) -> datetime.timedelta:
+    return datetime.timedelta(seconds=getattr(settings, 'TASK_RETRY_DELAY', 30) * 2 ** (attempts - 1))
+
+
+def claim_tasks(limit: int) -> [Task]:
+    """
+    Забирает до limit задач, которые пора выполнять, и помечает их выполняемыми.
+    В PostgreSQL строки блокируются с SKIP LOCKED, поэтому несколько воркеров не возьмут одну задачу
+    """
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.STATUS_QUEUED, run_after__lte=datetime.datetime.now())
+            .order_by('run_after', 'id')[:limit]
+        )
+        Task.objects.filter(id__in=[i.id for i in tasks]).update(
+            status=Task.STATUS_RUNNING,
+            updated=datetime.datetime.now()
+        )
+
+    return tasks
+
+
+def _heartbeat(task_id: int, stop: threading.Event):
+    """
+    Пока задача выполняется, раз в TASK_HEARTBEAT секунд обновляет её updated, чтобы requeue_stale
+    не вернул в очередь долгую, но живую задачу
+    """
+    interval = getattr(settings, 'TASK_HEARTBEAT', 60)
+    try:
+        while not stop.wait(interval):
+            Task.objects.filter(id=task_id, status=Task.STATUS_RUNNING).update(updated=datetime.datetime.now())
+    finally:
+        connections.close_all()
+
+
+def run_task(cur_task: Task, in_thread=False):
+    """
+    Выполняет задачу; при ошибке она возвращается в очередь с задержкой TASK_RETRY_DELAY * 2^(попытка - 1),
+    после max_attempts попыток остаётся с ошибкой
+    """
+    if in_thread:
+        close_old_connections()
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(cur_task.id, stop), daemon=True).start()
+
+    cur_task.attempts += 1
+    try:
+        TASKS[cur_task.name](*cur_task.get_args())
+        cur_task.status = Task.STATUS_DONE
+        cur_task.error = ''
+    except Exception:
+        logging.getLogger('Tasks').exception('Task %s failed' % cur_task)
+        cur_task.error = traceback.format_exc()
+        if cur_task.attempts < cur_task.max_attempts:
+            cur_task.status = Task.STATUS_QUEUED
+            cur_task.run_after = datetime.datetime.now() + _get_backoff(cur_task.attempts)
+        else:
+            cur_task.status = Task.STATUS_FAILED
+    finally:
+        stop.set()
+        cur_task.save(update_fields=['status', 'attempts', 'error', 'run_after', 'updated'])
+        if in_thread:
+            connections.close_all()
+
+
+def run_pending(workers=1, limit=None) -> int:
+    """
+    Один проход воркера: забирает готовые задачи и выполняет их в workers потоках
+    :return: сколько задач выполнено
+    """
+    tasks = claim_tasks(limit or workers * 4)
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda x: run_task(x, True), tasks))
+    else:
+        for cur_task in tasks:
+            run_task(cur_task)
+
+    return len(tasks)
+
+
+def requeue_stale(timeout: int) -> int:
+    """
+    Возвращает в очередь задачи, о которых воркер не сообщал дольше timeout секунд (воркер упал).
+    Упавший запуск считается попыткой: после max_attempts задача остаётся с ошибкой
+    """
+    def get_stale():
+        return Task.objects.filter(
+            status=Task.STATUS_RUNNING,
+            updated__lt=datetime.datetime.now() - datetime.timedelta(seconds=timeout)
+        )
+
+    now = datetime.datetime.now()
+    failed = get_stale().filter(attempts__gte=F('max_attempts') - 1).update(
+        status=Task.STATUS_FAILED,
+        attempts=F('attempts') + 1,
+        error='Воркер не ответил за %d секунд' % timeout,
+        updated=now,
+    )
+    requeued = get_stale().update(status=Task.STATUS_QUEUED, attempts=F('attempts') + 1, run_after=now, updated=now)
+
+    return failed + requeued
+
+
+@task('mail_managers')
+def _mail_managers(subject: str, message: str):
+    from django.core.mail import mail_managers
+
+    mail_managers(subject, message)
+
+
+@task('import_emails')
+def _send_import_emails(user_ids: [int], tournament_id: int):
+    """
+    Пароли генерируются в задаче, чтобы не хранить их в очереди. Письма не повторяются:
+    повтор сменил бы пароли тем, кому письмо уже пришло
+    """
+    from .models import Tournament, User
+
+    users = list(User.objects.filter(pk__in=user_ids))
+    errors = User.send_emails_about_import(users, Tournament.objects.get(pk=tournament_id))
+    for user, error in zip(users, errors):
+        if error:
+            logging.getLogger('Tasks').warning('Import email to %s failed: %s' % (user.email, error))
+
+
+@task('send_notifications')
+def _send_notifications():
+    from .notifications import deliver_notifications
+
+    deliver_notifications()
+
+
+@task('motion_analysis')
+def _generate_motion_analysis(motion_id: int):
+    from analytics.models import MotionAnalysis
+    from .models import Motion
+
+    motion = Motion.objects.get(pk=motion_id)
+    if not MotionAnalysis.objects.filter(motion=motion).exists():
+        MotionAnalysis().generate_analysis(motion)
@@ -3,7 +3,9 @@ from typing import Optional
 from telegram.ext import CommandHandler, CallbackQueryHandler
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from django_telegrambot.apps import DjangoTelegramBot
-from . models import Motion, BotUsers, BotChat, Language, Round, Room
+from . models import Motion, BotUsers, BotChat, Language, Round
+from . notifications import queue_round_notifications
+from . tasks import enqueue
 from apps.profile.models import User, TelegramToken 
 
 import re
@@ -87,35 +89,14 @@ class TabmakerBot:
 
 
     @staticmethod
-    def send_round_notifications(bot, cur_round: Round, rooms: [Room]):
-        motion = cur_round.motion.infoslide + '\n\n' + cur_round.motion.motion if cur_round.motion.infoslide \
-            else cur_round.motion.motion
-
-        for room in rooms:
-            room_message = \
-                '1П: ' + room.game.og.name + '\n' + \
-                '1О: ' + room.game.oo.name + '\n' + \
-                '2П: ' + room.game.cg.name + '\n' + \
-                '2О: ' + room.game.co.name + '\n\n' + \
-                'Судья: ' + room.game.chair.name() + '\n\n' + \
-                'Аудитория: ' + room.place.place + '\n\n' + \
-                motion
-
-            speakers = [
-                room.game.chair
-            ]
-
-            for team in room.game.get_teams():
-                for speaker in team.get_speakers():
-                    speakers.append(speaker)
-
-            for speaker in speakers:
-                if not speaker.telegram_id:
-                    continue
-
-                bot.sendMessage(speaker.telegram_id, text=room_message)
-                logging.info(speaker.telegram_id)
-                logging.info(room_message)
+    def send_round_notifications(cur_round: Round) -> int:
+        """
+        Ставит сообщения раунда в outbox и запускает их отправку, повторный вызов ничего не дублирует
+        :return: сколько сообщений добавлено в outbox
+        """
+        count = queue_round_notifications(cur_round)
+        enqueue('send_notifications')
+        return count
 
 
     def __get_or_create_user(self, from_user, from_chat):
@@ -0,0 +1,130 @@
+import datetime
+import random
+
+from apps.tournament.consts import ROLE_CHAIR, ROLE_MEMBER, ROLE_OWNER, STATUS_FINISHED, TEAM_IN_GAME
+from apps.tournament.logic import update_standings
+from apps.tournament.models import \
+    Game, \
+    Motion, \
+    Place, \
+    PlayoffResult, \
+    QualificationResult, \
+    Room, \
+    Round, \
+    Team, \
+    TeamTournamentRel, \
+    Tournament, \
+    User, \
+    UserTournamentRel
+
+
+def create_users(prefix: str, count: int) -> [User]:
+    """
+    count пользователей одним запросом. bulk_create возвращает id не во всех базах, поэтому они читаются заново
+    """
+    User.objects.bulk_create([
+        User(username='%s_%d' % (prefix, i), email='%s_%d@tabmaker.org' % (prefix, i), last_name='%s %d' % (prefix, i))
+        for i in range(count)
+    ])
+    return list(User.objects.filter(username__startswith=prefix + '_').order_by('id'))
+
+
+def _create_round(tournament: Tournament, number: int, teams: [Team], chairs: [User], places: [Place],
+                  rand: random.Random, is_playoff=False, with_results=True) -> [Team]:
+    """
+    Раунд с румами по TEAM_IN_GAME команд в порядке teams
+    :return: команды, выигравшие плей-офф
+    """
+    now = datetime.datetime.now()
+    motion = Motion.objects.create(motion='temp' if number < 0 else 'Motion %d' % number)
+    cur_round = Round.objects.create(
+        tournament=tournament, motion=motion, number=number, start_time=now, is_playoff=is_playoff
+    )
+
+    count_rooms = len(teams) // TEAM_IN_GAME
+    Game.objects.bulk_create([
+        Game(
+            og=teams[i * TEAM_IN_GAME], oo=teams[i * TEAM_IN_GAME + 1],
+            cg=teams[i * TEAM_IN_GAME + 2], co=teams[i * TEAM_IN_GAME + 3],
+            chair=chairs[i], motion=motion, date=now,
+        )
+        for i in range(count_rooms)
+    ])
+    games = list(Game.objects.filter(motion=motion).order_by('id'))
+
+    # Результаты сохраняются до румов: без рума сигналы не пересчитывают тэб после каждой игры
+    winners = []
+    for game in games if with_results else []:
+        if is_playoff:
+            won = rand.sample(range(TEAM_IN_GAME), 2)
+            PlayoffResult.objects.create(game=game, og=0 in won, oo=1 in won, cg=2 in won, co=3 in won)
+            winners += [team for i, team in enumerate([game.og, game.oo, game.cg, game.co]) if i in won]
+        else:
+            places_in_game = list(range(1, TEAM_IN_GAME + 1))
+            rand.shuffle(places_in_game)
+            speaks = [rand.randint(70, 80) for _ in range(8)]
+            QualificationResult.objects.create(
+                game=game,
+                og=places_in_game[0], oo=places_in_game[1], cg=places_in_game[2], co=places_in_game[3],
+                pm=speaks[0], dpm=speaks[1], lo=speaks[2], dlo=speaks[3],
+                mg=speaks[4], gw=speaks[5], mo=speaks[6], ow=speaks[7],
+            )
+
+    Room.objects.bulk_create([
+        Room(round=cur_round, game=game, place=places[i], number=i) for i, game in enumerate(games)
+    ])
+
+    return winners
+
+
+def create_tournament(count_teams=64, count_rounds=5, count_teams_in_break=8, status=STATUS_FINISHED,
+                      seed=0) -> Tournament:
+    """
+    Сыгранный турнир: count_rounds отборочных раундов с результатами, брейк и плей-офф до финала.
+    Объекты создаются пачками, тэб пересчитывается один раз в конце
+    """
+    rand = random.Random(seed)
+    now = datetime.datetime.now()
+    tournament = Tournament.objects.create(
+        name='Tournament %d teams' % count_teams, location='Vladivostok', open_reg=now, close_reg=now,
+        start_tour=now, count_rounds=count_rounds, count_teams=count_teams,
+        count_teams_in_break=count_teams_in_break, info='', status=status, cur_round=count_rounds,
+    )
+    prefix = 't%d' % tournament.id
+
+    owner = create_users(prefix + '_owner', 1)[0]
+    UserTournamentRel.objects.create(user=owner, tournament=tournament, role=ROLE_OWNER)
+
+    count_rooms = count_teams // TEAM_IN_GAME
+    chairs = create_users(prefix + '_chair', count_rooms)
+    UserTournamentRel.objects.bulk_create([
+        UserTournamentRel(user=chair, tournament=tournament, role=ROLE_CHAIR) for chair in chairs
+    ])
+    Place.objects.bulk_create([Place(tournament=tournament, place='%d' % (100 + i)) for i in range(count_rooms)])
+    places = list(tournament.place_set.order_by('id'))
+
+    speakers = create_users(prefix + '_speaker', count_teams * 2)
+    Team.objects.bulk_create([
+        Team(name='%s Team %d' % (prefix, i), speaker_1=speakers[i * 2], speaker_2=speakers[i * 2 + 1])
+        for i in range(count_teams)
+    ])
+    teams = list(Team.objects.filter(name__startswith=prefix + ' ').order_by('id'))
+    TeamTournamentRel.objects.bulk_create([
+        TeamTournamentRel(team=team, tournament=tournament, role=ROLE_MEMBER) for team in teams
+    ])
+
+    for number in range(1, count_rounds + 1):
+        rand.shuffle(teams)
+        _create_round(tournament, number, teams, chairs, places, rand)
+
+    if count_teams_in_break:
+        teams = teams[:count_teams_in_break]
+        _create_round(tournament, -1, teams, chairs, places, rand, is_playoff=True, with_results=False)
+        number = 1
+        while len(teams) >= TEAM_IN_GAME:
+            teams = _create_round(tournament, number, teams, chairs, places, rand, is_playoff=True)
+            number += 1
+
+    update_standings(tournament)
+
+    return tournament
@@ -0,0 +1,52 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.tournament.access import get_page_access, invalidate_access_matrix
+from apps.tournament.logic import user_can_edit_tournament
+from apps.tournament.registry import registry
+from apps.tournament.models import \
+    AccessToPage, \
+    Page, \
+    Tournament, \
+    TournamentRole, \
+    TournamentStatus, \
+    User, \
+    UserTournamentRel
+
+
+class AccessMatrixTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        invalidate_access_matrix()
+        self.status = TournamentStatus.objects.create(name='Test status')
+        self.page = Page.objects.create(name='test_page', is_public=False)
+        AccessToPage.objects.create(page=self.page, status=self.status, access=False, message='Closed')
+
+    def test_matrix_loaded_once(self):
+        self.assertEqual(get_page_access(self.status.id, 'test_page'), (False, False, 'Closed'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_page_access(self.status.id, 'test_page'), (False, False, 'Closed'))
+            self.assertIsNone(get_page_access(self.status.id, 'other_page'))
+
+        self.page.is_public = True
+        self.page.save()
+        self.assertEqual(get_page_access(self.status.id, 'test_page'), (True, False, 'Closed'))
+
+    def test_user_roles_once_per_user(self):
+        now = datetime.datetime.now()
+        tournament = Tournament.objects.create(
+            name='Access test', location='Vladivostok', open_reg=now, close_reg=now, start_tour=now,
+            count_rounds=5, count_teams=16, count_teams_in_break=8, info='',
+        )
+        owner = TournamentRole.objects.filter(role_en='Owner').first() or \
+            TournamentRole.objects.create(role='Owner', role_en='Owner')
+        user = User.objects.create(username='owner', email='owner@tabmaker.org')
+        UserTournamentRel.objects.create(user=user, tournament=tournament, role=owner)
+        registry.warm()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user_can_edit_tournament(tournament, user))
+            self.assertTrue(user_can_edit_tournament(tournament, user, True))
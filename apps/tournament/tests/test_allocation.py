@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.test import SimpleTestCase
+
+from apps.tournament.allocation import \
+    Conflicts, \
+    allocate_adjudicators, \
+    allocate_places, \
+    get_feedback_score
+
+
+class AllocationTests(SimpleTestCase):
+
+    def test_best_chairs_in_important_rooms_without_conflicts(self):
+        rooms = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]]
+        conflicts = Conflicts(
+            rooms,
+            {1: {100}, 6: {200}},
+            {21: 100, 22: 200},
+            {23: {5}},
+        )
+        scores = {21: 9, 22: 8, 23: 7, 24: 1, 31: 5, 32: 4}
+
+        panels, count_conflicts = allocate_adjudicators([12, 3, 6], [21, 22, 23, 24], [31, 32], scores, conflicts)
+
+        self.assertEqual(count_conflicts, 0)
+        self.assertEqual([panel['chair'] for panel in panels], [22, 24, 21])
+        self.assertEqual([panel['wings'] for panel in panels], [[23], [32], [31]])
+
+    def test_chair_with_conflict_only_if_no_other(self):
+        conflicts = Conflicts([[1, 2, 3, 4]], {}, {}, {21: {1}, 22: {2}})
+
+        panels, count_conflicts = allocate_adjudicators([0], [21], [22], {}, conflicts)
+
+        self.assertEqual(panels, [{'chair': 21, 'wings': []}])
+        self.assertEqual(count_conflicts, 1)
+
+    def test_large_tournament(self):
+        rand = random.Random(1)
+        count_rooms = 150
+        rooms = [list(range(i * 4, i * 4 + 4)) for i in range(count_rooms)]
+        adjudicators = list(range(1000, 1000 + count_rooms * 3))
+        conflicts = Conflicts(
+            rooms,
+            {team: {rand.randrange(100)} for team in range(count_rooms * 4)},
+            {user: rand.randrange(100) for user in adjudicators},
+            {user: set(rand.sample(range(count_rooms * 4), 12)) for user in adjudicators},
+        )
+        scores = {user: rand.random() for user in adjudicators}
+
+        start = time.perf_counter()
+        panels, count_conflicts = allocate_adjudicators(
+            [rand.randrange(30) for _ in rooms], adjudicators[:count_rooms + 20], adjudicators[count_rooms + 20:],
+            scores, conflicts
+        )
+        self.assertLess(time.perf_counter() - start, 1)
+
+        users = [user for panel in panels for user in [panel['chair']] + panel['wings']]
+        self.assertEqual(len(users), len(set(users)))
+        self.assertNotIn(None, users)
+        for i, panel in enumerate(panels):
+            for user in panel['wings']:
+                self.assertNotIn(i, conflicts.get_rooms(user))
+
+    def test_feedback_score(self):
+        answers = {'Раунд': 3, 'Оценка': '8', 'Аргументация': '7,5', 'Комментарий': 'ok'}
+        self.assertEqual(get_feedback_score(answers, ['Раунд']), 7.75)
+        self.assertIsNone(get_feedback_score({'Комментарий': 'nan'}))
+
+    def test_places_stay_stable(self):
+        # Рум 0 теряет свою аудиторию 2 более важному руму 1 и получает соседнюю, рум 3 - лучшую из оставшихся
+        places = allocate_places([1, 5, 3, 4], [2, 2, 0, None], 5)
+
+        self.assertEqual(places, [1, 2, 0, 3])
+        self.assertEqual(allocate_places([1, 2], [None, None], 1), [None, 0])
@@ -0,0 +1,71 @@
+import datetime
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from apps.tournament.consts import ROLE_MEMBER, STATUS_STARTED
+from apps.tournament.context import TournamentContext
+from apps.tournament.registry import registry
+from apps.tournament.models import \
+    Game, \
+    Motion, \
+    Room, \
+    Round, \
+    Team, \
+    TeamTournamentRel, \
+    Tournament, \
+    User
+
+
+class TournamentContextTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.warm()
+        now = datetime.datetime.now()
+        self.tournament = Tournament.objects.create(
+            name='Context test', location='Vladivostok', open_reg=now, close_reg=now, start_tour=now,
+            count_rounds=5, count_teams=4, count_teams_in_break=0, info='', status=STATUS_STARTED,
+        )
+
+        teams = []
+        for i in range(4):
+            speakers = [
+                User.objects.create(username='s%d_%d' % (j, i), email='s%d_%d@tabmaker.org' % (j, i)) for j in [1, 2]
+            ]
+            teams.append(Team.objects.create(name='Team %d' % i, speaker_1=speakers[0], speaker_2=speakers[1]))
+            TeamTournamentRel.objects.create(team=teams[-1], tournament=self.tournament, role=ROLE_MEMBER)
+
+        self.speaker = teams[0].speaker_1
+        self.chair = User.objects.create(username='chair', email='chair@tabmaker.org')
+        motion = Motion.objects.create(motion='Motion')
+        cur_round = Round.objects.create(
+            tournament=self.tournament, motion=motion, number=1, start_time=now, is_public=True
+        )
+        game = Game.objects.create(
+            og=teams[0], oo=teams[1], cg=teams[2], co=teams[3], chair=self.chair, motion=motion, date=now
+        )
+        Room.objects.create(round=cur_round, game=game, number=0)
+
+    def _load(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return TournamentContext.load(request, self.tournament.id)
+
+    def test_values_queried_once(self):
+        context = self._load(self.chair)
+        values = (context.is_owner, context.is_chair, len(context.rooms), len(context.chair_rooms))
+        self.assertEqual(values, (False, True, 1, 1))
+
+        with self.assertNumQueries(0):
+            self.assertEqual((context.is_owner, context.is_chair, len(context.chair_rooms)), (False, True, 1))
+            self.assertIs(TournamentContext.get(context.request, context.tournament), context)
+
+    def test_user_rooms(self):
+        self.assertEqual(len(self._load(self.speaker).user_rooms), 1)
+        self.assertEqual(self._load(self.chair).user_rooms, [])
+
+        context = self._load(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertEqual((context.user_rooms, context.chair_rooms, context.is_chair), ([], [], False))
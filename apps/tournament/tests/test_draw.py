@@ -0,0 +1,114 @@
+import itertools
+import random
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.tournament.consts import STATUS_STARTED
+
+from apps.tournament.draw import \
+    REPEAT_OPPONENT_COST, \
+    OpponentHistory, \
+    assign_positions, \
+    count_repeat_opponents, \
+    make_draw, \
+    search_draw
+from apps.tournament.logic import DrawError, check_draw, generate_next_round, plan_next_round
+from apps.tournament.messages import MSG_DRAW_PREVIEW_OUTDATED
+from apps.tournament.models import Motion, Round
+from apps.tournament.tests.factories import create_tournament
+
+
+class DrawTests(SimpleTestCase):
+
+    def test_assignment_is_optimal(self):
+        rand = random.Random(1)
+        for _ in range(50):
+            costs = [[rand.randint(0, 3) ** 2 for _ in range(4)] for _ in range(8)]
+            assign, cost = assign_positions(costs, [2, 2, 2, 2])
+
+            slots = [position for position in range(4) for _ in range(2)]
+            best = min(
+                sum(costs[team][position] for team, position in enumerate(permutation))
+                for permutation in set(itertools.permutations(slots))
+            )
+            self.assertEqual([assign.count(position) for position in range(4)], [2, 2, 2, 2])
+            self.assertEqual(cost, best)
+
+    def test_second_round_without_imbalance(self):
+        rand = random.Random(2)
+        count_teams = 1000
+        points = [rand.randint(0, 3) for _ in range(count_teams)]
+        positions = [[0, 0, 0, 0] for _ in range(count_teams)]
+        for team_positions in positions:
+            team_positions[rand.randint(0, 3)] = 1
+
+        rooms, imbalance = make_draw(points, positions, rand)
+
+        self.assertEqual(sorted(team for room in rooms for team in room), list(range(count_teams)))
+        for room in rooms:
+            self.assertLessEqual(max(points[team] for team in room) - min(points[team] for team in room), 1)
+        self.assertEqual(
+            imbalance,
+            sum(positions[team][i] ** 2 for room in rooms for i, team in enumerate(room))
+        )
+
+    def test_search_keeps_best_seed_and_reproduces_it(self):
+        rand = random.Random(3)
+        count_teams = 64
+        points = [rand.randint(0, 6) for _ in range(count_teams)]
+        positions = [[rand.randint(0, 1) for _ in range(4)] for _ in range(count_teams)]
+        history = [rand.sample(range(count_teams), 4) for _ in range(32)]
+        seeds = list(range(8))
+
+        best = search_draw(points, positions, history, seeds, workers=2)
+
+        for seed in seeds:
+            rooms, imbalance = make_draw(points, positions, random.Random(seed), history)
+            self.assertLessEqual(best['score'], imbalance + REPEAT_OPPONENT_COST * count_repeat_opponents(rooms, history))
+
+        rooms, imbalance = make_draw(points, positions, random.Random(best['seed']), history)
+        self.assertEqual(rooms, best['rooms'])
+        self.assertEqual(imbalance, best['imbalance'])
+
+    def test_history_separates_teams_that_met(self):
+        rand = random.Random(4)
+        count_teams = 500
+        points = [rand.randint(0, 9) for _ in range(count_teams)]
+        positions = [[rand.randint(0, 2) for _ in range(4)] for _ in range(count_teams)]
+        history = OpponentHistory()
+        for _ in range(3):
+            teams = rand.sample(range(count_teams), count_teams)
+            for i in range(0, count_teams, 4):
+                history.add_game(teams[i:i + 4])
+
+        plain, _ = make_draw(points, positions, random.Random(5))
+        rooms, imbalance = make_draw(points, positions, random.Random(5), history)
+
+        self.assertLess(history.count_repeats(rooms), history.count_repeats(plain))
+        self.assertEqual(
+            sorted(sorted(points[team] for team in room) for room in rooms),
+            sorted(sorted(points[team] for team in room) for room in plain)
+        )
+        self.assertEqual(
+            imbalance,
+            sum(positions[team][i] ** 2 for room in rooms for i, team in enumerate(room))
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DrawPreviewTests(TestCase):
+
+    def setUp(self):
+        self.tournament = create_tournament(16, count_rounds=1, count_teams_in_break=0, status=STATUS_STARTED)
+
+    def test_preview_outdated_by_places(self):
+        draw, error = plan_next_round(self.tournament)
+        self.assertEqual((error, check_draw(self.tournament, draw)), ('', ''))
+
+        self.tournament.place_set.filter(id=draw['rooms'][0]['place']).update(is_active=False)
+        self.assertEqual(check_draw(self.tournament, draw), MSG_DRAW_PREVIEW_OUTDATED)
+
+        new_round = Round(motion=Motion.objects.create(motion='Motion 2'), start_time=self.tournament.start_tour)
+        with self.assertRaises(DrawError):
+            generate_next_round(self.tournament, new_round, draw)
+        self.assertFalse(Round.objects.filter(tournament=self.tournament, number=2).exists())
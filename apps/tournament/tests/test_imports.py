@@ -0,0 +1,122 @@
+import datetime
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from apps.tournament.consts import ROLE_MEMBER
+from apps.tournament.imports import ImportTeam, TeamImportForm
+from apps.tournament.messages import MSG_S1_EMAIL, MSG_S1_NAME, MSG_S2_EMAIL, MSG_S2_NAME, MSG_TEAM_NAME
+from apps.tournament.models import Task, Team, TeamTournamentRel, Tournament, University, User
+from apps.tournament.tasks import run_pending
+
+
+def _row(team, email_1, email_2):
+    return {
+        MSG_TEAM_NAME: team,
+        MSG_S1_EMAIL: email_1,
+        MSG_S1_NAME: 'Иванов Иван',
+        MSG_S2_EMAIL: email_2,
+        MSG_S2_NAME: 'Петров Пётр',
+    }
+
+
+class ImportTeamTests(TestCase):
+
+    def setUp(self):
+        # Импортированным пользователям ставится университет с id=1
+        University.objects.get_or_create(id=1, defaults={'university_id': 1, 'name': 'Unknown'})
+        now = datetime.datetime.now()
+        self.tournament = Tournament.objects.create(
+            name='Import test', location='Vladivostok', open_reg=now, close_reg=now, start_tour=now,
+            count_rounds=5, count_teams=16, count_teams_in_break=8, info='',
+        )
+        self.old = User.objects.create(username='old', email='Old@tabmaker.org')
+        other = User.objects.create(username='other', email='other@tabmaker.org')
+        TeamTournamentRel.objects.create(
+            tournament=self.tournament,
+            role=ROLE_MEMBER,
+            team=Team.objects.create(name='Taken', speaker_1=self.old, speaker_2=other),
+        )
+
+    def _get_import(self, data, files=None) -> ImportTeam:
+        data.update({
+            'team_name': 'Команда',
+            'speaker_1_name': 'Имя 1',
+            'speaker_1_email': 'Почта 1',
+            'speaker_2_name': 'Имя 2',
+            'speaker_2_email': 'Почта 2',
+        })
+        form = TeamImportForm(data, files)
+        self.assertTrue(form.is_valid(), form.errors)
+        return ImportTeam(form)
+
+    def test_import_rows_in_batch(self):
+        results = self._get_import({'url': 'https://docs.google.com/spreadsheets/d/1'}).import_rows(self.tournament, False, [
+            _row('New', ' old@TABMAKER.org', 'new@tabmaker.org'),
+            _row('New', 'old@tabmaker.org', 'new@tabmaker.org'),
+            _row('Broken', 'not email', 'new2@tabmaker.org'),
+            _row('Taken', 'new@tabmaker.org', 'new2@tabmaker.org'),
+        ])
+
+        statuses = [[i['s1']['status'], i['s2']['status'], i['team']['status']] for i in results]
+        self.assertEqual(statuses, [
+            [ImportTeam.STATUS_EXIST, ImportTeam.STATUS_ADD, ImportTeam.STATUS_ADD],
+            [ImportTeam.STATUS_EXIST, ImportTeam.STATUS_EXIST, ImportTeam.STATUS_EXIST],
+            [ImportTeam.STATUS_FAIL, ImportTeam.STATUS_ADD, ImportTeam.STATUS_FAIL],
+            [ImportTeam.STATUS_EXIST, ImportTeam.STATUS_EXIST, ImportTeam.STATUS_FAIL],
+        ])
+        self.assertEqual(results[0]['s1']['user'], self.old)
+
+        team = Team.objects.get(name='New', teamtournamentrel__tournament=self.tournament)
+        self.assertEqual([team.speaker_1, team.speaker_2.email], [self.old, 'new@tabmaker.org'])
+        self.assertEqual(User.objects.filter(email__in=['new@tabmaker.org', 'new2@tabmaker.org']).count(), 2)
+
+    def test_taken_username_fails_row(self):
+        User.objects.create(username='taken@tabmaker.org', email='someone@tabmaker.org')
+        long_email = 'a' * 25 + '@tabmaker.%s'
+        rows = [
+            _row('Taken login', 'taken@tabmaker.org', 'x1@tabmaker.org'),
+            _row('Long 1', long_email % 'org', 'x2@tabmaker.org'),
+            _row('Long 2', long_email % 'com', 'x3@tabmaker.org'),
+        ]
+
+        for is_test in [True, False]:
+            results = self._get_import({'url': 'https://docs.google.com/spreadsheets/d/1'}).import_rows(
+                self.tournament, is_test, rows
+            )
+            statuses = [[i['s1']['status'], i['team']['status']] for i in results]
+            self.assertEqual(statuses, [
+                [ImportTeam.STATUS_FAIL, ImportTeam.STATUS_FAIL],
+                [ImportTeam.STATUS_ADD, ImportTeam.STATUS_ADD],
+                [ImportTeam.STATUS_FAIL, ImportTeam.STATUS_FAIL],
+            ])
+
+        teams = Team.objects.filter(teamtournamentrel__tournament=self.tournament).order_by('id')
+        self.assertEqual(list(teams.values_list('name', flat=True)), ['Taken', 'Long 1'])
+
+    def test_import_csv_file(self):
+        content = '\ufeffКоманда;Имя 1;Почта 1;Имя 2;Почта 2\n' \
+            'Csv;Иванов Иван;csv1@tabmaker.org;Петров Пётр;csv2@tabmaker.org\n' \
+            ';;;;\n'
+        imports = self._get_import({}, {'file': SimpleUploadedFile('teams.csv', content.encode())})
+        imports.open()
+        imports.read_titles()
+        results = imports.import_teams(self.tournament, False)
+
+        self.assertEqual([[i['team']['name'], i['team']['status']] for i in results], [['Csv', ImportTeam.STATUS_ADD]])
+        self.assertEqual(Team.objects.get(name='Csv').info, 'Импортирована из файла')
+
+    @override_settings(EMAIL_BACKEND='apps.tournament.tests.test_mailing.CountingBackend')
+    def test_password_saved_after_email_sent(self):
+        # Рассылки разными задачами: письмо на bad@ не принимается вместе со всей пачкой
+        for team, email in [('Good', 'good@tabmaker.com'), ('Bad', 'bad@tabmaker.com')]:
+            self._get_import({'url': 'https://docs.google.com/spreadsheets/d/1'}).import_rows(self.tournament, False, [
+                _row(team, 'old@tabmaker.org', email),
+            ])
+        self.assertEqual(set(Task.objects.filter(name='import_emails').values_list('max_attempts', flat=True)), {1})
+
+        run_pending()
+
+        passwords = dict(User.objects.filter(email__endswith='@tabmaker.com').values_list('email', 'password'))
+        self.assertNotEqual(passwords['good@tabmaker.com'], '')
+        self.assertEqual(passwords['bad@tabmaker.com'], '')
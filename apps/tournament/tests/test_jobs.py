@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.tournament.jobs import \
+    JOB_DONE, \
+    JOB_ERROR, \
+    JOB_RUNNING, \
+    _update_job, \
+    get_job, \
+    job, \
+    start_job
+
+
+@job('test_sum')
+def _sum_job(progress, tournament_id, a, b):
+    progress(50, 'half')
+    if a is None:
+        return ['no a', None]
+    return ['', {'sum': a + b}]
+
+
+@override_settings(JOB_WORKERS=0, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class JobsTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_job_result_and_error(self):
+        done = get_job(start_job(1, 'test_sum', 2, 3))
+        error = get_job(start_job(1, 'test_sum', None, 3))
+
+        self.assertEqual([done['status'], done['progress'], done['result']], [JOB_DONE, 100, {'sum': 5}])
+        self.assertEqual([error['status'], error['message']], [JOB_ERROR, 'no a'])
+
+    def test_one_job_per_tournament(self):
+        job_id = start_job(1, 'test_sum', 2, 3)
+        cache.set('tournament/1/job', job_id)
+
+        self.assertEqual(start_job(1, 'test_sum', 4, 5), job_id)
+        self.assertNotEqual(start_job(2, 'test_sum', 4, 5), job_id)
+
+    def test_job_of_dead_worker_releases_tournament(self):
+        # Воркер упал посреди задачи: статус остался "выполняется", метка "жива" истекла
+        _update_job('dead', id='dead', tournament=1, status=JOB_RUNNING)
+        cache.set('tournament/1/job', 'dead')
+
+        job_id = start_job(1, 'test_sum', 2, 3)
+
+        self.assertNotEqual(job_id, 'dead')
+        self.assertEqual([get_job(job_id)['status'], get_job('dead')['status']], [JOB_DONE, JOB_ERROR])
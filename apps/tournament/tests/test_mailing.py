@@ -0,0 +1,36 @@
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import SimpleTestCase, override_settings
+
+from apps.tournament.mailing import send_emails
+
+
+class CountingBackend(EmailBackend):
+    """
+    locmem, который считает соединения и не принимает письма на bad@
+    """
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any('bad@tabmaker.com' in i.to for i in messages):
+            raise ValueError('rejected')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='apps.tournament.tests.test_mailing.CountingBackend')
+class MailingTests(SimpleTestCase):
+
+    def test_batches_share_connection(self):
+        CountingBackend.opened = 0
+        emails = ['s%d@tabmaker.com' % i for i in range(6)] + ['bad@tabmaker.com']
+
+        errors = send_emails([EmailMessage('Subject', 'Text', to=[i]) for i in emails], batch_size=3, delay=0)
+
+        self.assertEqual(CountingBackend.opened, 3)
+        self.assertEqual(errors, [''] * 6 + ['rejected'])
+        self.assertEqual([i.to[0] for i in mail.outbox], emails[:-1])
@@ -0,0 +1,149 @@
+import asyncio
+import datetime
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from django.contrib.admin import site
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.tournament.admin.notification import NotificationAdmin
+from apps.tournament.models import Notification, Room, Task
+from apps.tournament.notifications import deliver_notifications, get_room_message, queue_notifications, \
+    send_messages
+from apps.tournament.tests.factories import create_tournament
+
+BAD_CHAT = 13
+
+
+class _FakeBotApi(BaseHTTPRequestHandler):
+    """
+    Минимальный Bot API: getMe и sendMessage, в чат BAD_CHAT отправить нельзя
+    """
+    sent = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            params = json.loads(body or '{}')
+        else:
+            params = {key: value[0] for key, value in parse_qs(body).items()}
+
+        bot_user = {'id': 1, 'is_bot': True, 'first_name': 'Tabmaker', 'username': 'tabmaker_bot'}
+        if self.path.endswith('/getMe'):
+            self._reply(200, {'ok': True, 'result': bot_user})
+        elif int(params['chat_id']) == BAD_CHAT:
+            self._reply(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'})
+        else:
+            self.sent.append((int(params['chat_id']), params['text']))
+            self._reply(200, {'ok': True, 'result': {
+                'message_id': len(self.sent),
+                'date': int(time.time()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'from': bot_user,
+                'text': params['text'],
+            }})
+
+    def _reply(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeBotApiMixin:
+
+    def setUp(self):
+        _FakeBotApi.sent = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeBotApi)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = 'http://127.0.0.1:%d/bot' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class NotificationsTests(_FakeBotApiMixin, SimpleTestCase):
+
+    def test_send_and_report_failures(self):
+        messages = [(100 + i, 'room %d' % (i // 5)) for i in range(40)] + [(BAD_CHAT, 'room 8')]
+
+        errors = asyncio.run(send_messages('1:token', messages, rate=100, base_url=self.base_url))
+
+        self.assertEqual(sorted(_FakeBotApi.sent), sorted(messages[:-1]))
+        self.assertEqual(errors[:-1], [''] * 40)
+        self.assertIn('chat not found', errors[-1].lower())
+
+    def test_token_bucket_limits_rate(self):
+        messages = [(100 + i, 'room') for i in range(30)]
+
+        start = time.monotonic()
+        asyncio.run(send_messages('1:token', messages, rate=20, base_url=self.base_url))
+
+        # 20 сообщений сразу, остальные 10 - со скоростью 20 в секунду
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+        self.assertEqual(len(_FakeBotApi.sent), 30)
+
+
+class OutboxTests(_FakeBotApiMixin, TestCase):
+
+    def test_queue_once_and_deliver(self):
+        messages = [(100 + i, {'text': 'room'}) for i in range(5)] + [(BAD_CHAT, {'text': 'room'})]
+
+        self.assertEqual(queue_notifications('round/1', Notification.CHANNEL_TELEGRAM, messages), 6)
+        self.assertEqual(queue_notifications('round/1', Notification.CHANNEL_TELEGRAM, messages), 0)
+
+        with override_settings(TELEGRAM_BOT_TOKEN='1:token', TELEGRAM_API_URL=self.base_url):
+            self.assertEqual(deliver_notifications(batch_size=4, max_attempts=2), 5)
+            retry = Task.objects.get(name='send_notifications')
+            self.assertGreater(retry.run_after, datetime.datetime.now())
+            self.assertEqual(deliver_notifications(batch_size=4, max_attempts=2), 0)
+            self.assertEqual(Task.objects.count(), 1)
+
+        statuses = dict(Notification.objects.values_list('recipient', 'status'))
+        self.assertEqual(len(_FakeBotApi.sent), 5)
+        self.assertEqual(statuses.pop(str(BAD_CHAT)), Notification.STATUS_FAILED)
+        self.assertEqual(set(statuses.values()), {Notification.STATUS_SENT})
+
+    def test_stale_sending_requeued(self):
+        queue_notifications('round/1', Notification.CHANNEL_TELEGRAM, [(100, {'text': 'room'})])
+        Notification.objects.update(
+            status=Notification.STATUS_SENDING, updated=datetime.datetime.now() - datetime.timedelta(hours=1)
+        )
+
+        with override_settings(TELEGRAM_BOT_TOKEN='1:token', TELEGRAM_API_URL=self.base_url):
+            self.assertEqual(deliver_notifications(), 1)
+
+        notification = Notification.objects.get()
+        self.assertEqual([notification.status, notification.attempts], [Notification.STATUS_SENT, 2])
+        self.assertEqual(_FakeBotApi.sent, [(100, 'room')])
+
+    def test_admin_retry_enqueues_sending(self):
+        queue_notifications('round/1', Notification.CHANNEL_TELEGRAM, [(100, {'text': 'room'})])
+        Notification.objects.update(status=Notification.STATUS_FAILED, attempts=3)
+
+        NotificationAdmin(Notification, site).retry(None, Notification.objects.all())
+
+        notification = Notification.objects.get()
+        self.assertEqual([notification.status, notification.attempts], [Notification.STATUS_QUEUED, 0])
+        self.assertTrue(Task.objects.filter(name='send_notifications').exists())
+
+
+class RoomMessageTests(TestCase):
+
+    def test_room_without_place(self):
+        create_tournament(8, count_rounds=1, count_teams_in_break=0)
+        room = Room.objects.select_related('place').first()
+        self.assertIn('Аудитория: ' + room.place.place + '\n', get_room_message(room, 'motion'))
+
+        room.place = None
+        self.assertIn('Аудитория: не назначена\n', get_room_message(room, 'motion'))
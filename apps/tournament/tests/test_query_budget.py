@@ -0,0 +1,204 @@
+from django.contrib.admin import site
+from django.contrib.admin.utils import lookup_field
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.tournament.access import get_access_matrix, get_page_access, invalidate_access_matrix
+from apps.tournament.consts import ROLE_OWNER, STATUS_FINISHED, STATUS_STARTED
+from apps.tournament.context import TournamentContext
+from apps.tournament.logic import \
+    get_all_rounds_and_rooms, \
+    get_games_and_results, \
+    get_motions, \
+    get_tab_arrays, \
+    user_can_edit_tournament
+from apps.tournament.models import AccessToPage, Motion, Page, Tournament, User, UserTournamentRel
+from apps.tournament.registry import registry
+from apps.tournament.tests.factories import create_tournament
+from apps.tournament.views import \
+    _convert_tab_to_speaker_table, \
+    _convert_tab_to_table, \
+    _get_or_check_round_result_forms
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryBudgetTests(TestCase):
+    """
+    Число запросов страниц турнира не зависит от количества команд: N+1 в тэбе, раундах или админке ломает тест
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = create_tournament(64, seed=1)
+        cls.large = create_tournament(256, count_teams_in_break=16, seed=2)
+        # Отборочный раунд идёт: на странице результатов раунда румы всех команд
+        cls.started = [
+            create_tournament(count_teams, count_rounds=2, count_teams_in_break=0, status=STATUS_STARTED, seed=3)
+            for count_teams in [64, 256]
+        ]
+        cls.admin = User.objects.create(username='admin', email='admin@tabmaker.org', is_staff=True, is_superuser=True)
+
+        for name in ['show', 'result', 'result_all', 'round_result']:
+            page = Page.objects.create(name=name, is_public=True)
+            for status in [STATUS_STARTED, STATUS_FINISHED]:
+                AccessToPage.objects.create(page=page, status=status, access=True)
+        invalidate_access_matrix()
+
+    def _request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def assertBudget(self, budget: int, func, tournaments=None):
+        """
+        func(tournament) делает ровно budget запросов и для 64, и для 256 команд. Кэш результатов пустой
+        """
+        counts = []
+        for tournament in tournaments or [self.small, self.large]:
+            tournament = Tournament.objects.select_related('status').get(pk=tournament.id)
+            cache.clear()
+            registry.warm()
+            get_access_matrix()
+            with CaptureQueriesContext(connection) as queries:
+                func(tournament)
+            counts.append(len(queries))
+
+        self.assertEqual(counts, [budget, budget], '\n'.join(query['sql'] for query in queries.captured_queries))
+
+    def assertPageBudget(self, budget: int, name_page: str, show_page, get_user, tournaments=None):
+        """
+        Страница без шаблона: проверка доступа как в access_by_status, затем show_page(request, tournament)
+        от имени get_user(tournament). show_page собирает контекст, как view, и читает то, что читает шаблон
+        """
+        tournaments = tournaments or [self.small, self.large]
+        users = {tournament.id: get_user(tournament) for tournament in tournaments}
+
+        def open_page(tournament):
+            user = users[tournament.id]
+            request = self._request(user)
+            tournament = TournamentContext.load(request, tournament.id).tournament
+            is_public, access, _ = get_page_access(tournament.status_id, name_page)
+            self.assertTrue(access and (is_public or user_can_edit_tournament(tournament, user)))
+            show_page(request, tournament)
+
+        self.assertBudget(budget, open_page, tournaments)
+
+    @staticmethod
+    def _get_owner(tournament):
+        return UserTournamentRel.objects.get(tournament=tournament, role=ROLE_OWNER).user
+
+    @staticmethod
+    def _get_speaker(tournament):
+        return tournament.get_teams()[0].team.speaker_1
+
+    def test_tab(self):
+        def show_tab(tournament):
+            for team in get_tab_arrays(tournament).teams:
+                [team.name, team.speaker_1.name(), team.speaker_2.name()]
+
+        self.assertBudget(4, show_tab)
+
+    def test_rounds(self):
+        def show_rounds(tournament):
+            for cur_round in get_all_rounds_and_rooms(tournament):
+                for room in cur_round['rooms']:
+                    game = room['game']
+                    [game.chair.name(), game.og.speaker_1.name(), game.co.speaker_2.name(), room['result'].og]
+
+        self.assertBudget(1, show_rounds)
+        self.assertBudget(1, get_motions)
+
+    def test_last_round(self):
+        def show_last_round(tournament):
+            context = TournamentContext(self._request(self.admin), tournament)
+            for room in get_games_and_results(context.rooms):
+                [room['game'].chair.name(), room['game'].og.name, room['result'].og]
+
+        self.assertBudget(2, show_last_round)
+
+    def test_tournament_page(self):
+        def show_tournament(tournament):
+            speaker = tournament.get_teams()[0].team.speaker_1
+            context = TournamentContext.load(self._request(speaker), tournament.id)
+            [rel.team.speaker_1.name() for rel in context.teams]
+            [rel.user.name() for rel in context.adjudicators]
+            [context.is_owner, context.is_chair, context.user_rooms, context.has_feedback_form]
+
+        self.assertBudget(8, show_tournament)
+
+    def test_tournament_pages(self):
+        def show(request, tournament):
+            context = TournamentContext.get(request, tournament)
+            for rel in context.teams:
+                [rel.team.name, rel.team.speaker_1.name(), rel.team.speaker_2.name(), rel.role.role]
+            [[rel.user.name(), rel.role.role] for rel in context.adjudicators]
+            [context.is_owner, context.is_chair, bool(context.user_rooms) and context.has_feedback_form]
+
+        def result(request, tournament):
+            show_all = tournament.status == STATUS_FINISHED or TournamentContext.get(request, tournament).is_owner
+            tab = get_tab_arrays(tournament)
+            [_convert_tab_to_table(tab, show_all), _convert_tab_to_speaker_table(tab, show_all)]
+            [motion['motion'] for motion in get_motions(tournament)]
+
+        def result_all_rounds(request, tournament):
+            self.assertTrue(TournamentContext.get(request, tournament).is_owner)
+            for cur_round in get_all_rounds_and_rooms(tournament):
+                for room in cur_round['rooms']:
+                    [room['game'].chair.name(), room['game'].og.speaker_1.name(), room['result'].og]
+
+        def result_round(request, tournament):
+            context = TournamentContext.get(request, tournament)
+            _, forms = _get_or_check_round_result_forms(request, context.rooms, context.is_owner)
+            for form in forms:
+                game = form['game']
+                [game.chair.name(), game.og.name, game.og.speaker_1.name(), str(form['result'])]
+
+        self.assertPageBudget(7, 'show', show, self._get_speaker)
+        self.assertPageBudget(6, 'result', result, self._get_owner)
+        self.assertPageBudget(3, 'result_all', result_all_rounds, self._get_owner)
+        self.assertPageBudget(4, 'round_result', result_round, self._get_owner, self.started)
+
+    def test_analytics_views(self):
+        # Импорт здесь: модуль views читает ленивые константы, а тесты импортируются до создания базы
+        from analytics.views import MotionAPI, ProfileAPI
+
+        speakers = {tournament.id: self._get_speaker(tournament) for tournament in [self.small, self.large]}
+        motions = {
+            tournament.id: tournament.round_set.filter(is_playoff=False).first().motion_id
+            for tournament in [self.small, self.large]
+        }
+
+        def get_profile(tournament):
+            request = APIRequestFactory().get('/analytics/api/profile')
+            force_authenticate(request, user=speakers[tournament.id])
+            self.assertEqual(ProfileAPI.as_view()(request).status_code, 200)
+
+        def get_motion(tournament):
+            request = APIRequestFactory().get('/analytics/api/motion/%d/' % motions[tournament.id])
+            self.assertEqual(MotionAPI.as_view()(request, pk=motions[tournament.id]).status_code, 200)
+
+        self.assertBudget(2, get_profile)
+        self.assertBudget(3, get_motion)
+
+    def test_admin_changelists(self):
+        registry.warm()
+        for model in [Tournament, Motion]:
+            model_admin = site._registry[model]
+            original_list_per_page = model_admin.list_per_page
+            counts = []
+            try:
+                for list_per_page in [1, 100]:
+                    model_admin.list_per_page = list_per_page
+                    with CaptureQueriesContext(connection) as queries:
+                        changelist = model_admin.get_changelist_instance(self._request(self.admin))
+                        for obj in changelist.result_list:
+                            [lookup_field(name, obj, model_admin) for name in changelist.list_display
+                             if name != 'action_checkbox']
+                    counts.append(len(queries))
+            finally:
+                model_admin.list_per_page = original_list_per_page
+
+            self.assertEqual(counts[0], counts[1], model.__name__)
@@ -0,0 +1,55 @@
+import unittest
+
+from django.test import TestCase
+
+from apps.tournament.models import TournamentRole, UserTournamentRel
+from apps.tournament.registry import ConstantsRegistry, registry
+
+
+class ConstantsRegistryTests(TestCase):
+
+    def setUp(self):
+        self.role = TournamentRole.objects.create(role='Test chair', role_en='Test chair')
+        self.registry = ConstantsRegistry()
+
+    def test_lazy_until_first_use(self):
+        with self.assertNumQueries(0):
+            role = self.registry.lazy(TournamentRole, 'role_en', 'Test chair')
+            missing = self.registry.lazy(TournamentRole, 'role_en', 'Missing')
+
+        with self.assertNumQueries(0):
+            self.assertIsInstance(role, TournamentRole)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(role, self.role)
+            with self.assertRaisesMessage(TournamentRole.DoesNotExist, "role_en='Missing'"):
+                missing.id
+
+        with self.assertNumQueries(0):
+            self.assertEqual(role.id, self.role.id)
+            self.assertIn(role, [self.role])
+            self.assertIn(self.role, {role: True})
+
+        self.assertFalse(UserTournamentRel.objects.filter(role=role).exists())
+
+    def test_warm_and_invalidate(self):
+        role = self.registry.lazy(TournamentRole, 'role_en', 'Test chair')
+        roles = self.registry.lazy_list(TournamentRole, 'role_en', ['Test chair', 'Missing role'])
+
+        with self.assertNumQueries(1):
+            self.registry.warm()
+        with self.assertNumQueries(0):
+            self.assertEqual([role.role, roles], ['Test chair', [self.role]])
+        self.assertFalse(UserTournamentRel.objects.filter(role__in=roles).exists())
+
+        TournamentRole.objects.filter(pk=self.role.pk).update(role='Renamed')
+        self.assertEqual(role.role, 'Test chair')
+        self.registry.invalidate(TournamentRole)
+        self.assertEqual(role.role, 'Renamed')
+
+    def test_discovery_does_not_load_constants(self):
+        # Модуль тестов с константами в глобальных переменных: поиск тестов проверяет их isinstance(obj, type)
+        registry.invalidate()
+        with self.assertNumQueries(0):
+            tests = unittest.defaultTestLoader.loadTestsFromName('apps.tournament.tests.test_context')
+        self.assertTrue(tests.countTestCases())
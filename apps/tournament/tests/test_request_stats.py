@@ -0,0 +1,49 @@
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import ResolverMatch
+
+from apps.tournament.middleware import QueryStatsMiddleware, get_view_stats, reset_view_stats
+from apps.tournament.models import Tournament
+
+
+def _view(count_queries):
+    def get_response(request):
+        request.resolver_match = ResolverMatch(get_response, (), {}, url_name='show', namespaces=['tournament'])
+        for _ in range(count_queries):
+            Tournament.objects.exists()
+        return HttpResponse()
+
+    return get_response
+
+
+class QueryStatsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        reset_view_stats()
+
+    def _get(self, count_queries):
+        request = RequestFactory().get('/tournament/1/')
+        request.user = AnonymousUser()
+        return QueryStatsMiddleware(_view(count_queries))(request)
+
+    @override_settings(SLOW_REQUEST_QUERIES=5)
+    def test_log_over_threshold(self):
+        with self.assertLogs('RequestStats', 'WARNING') as logs:
+            self._get(2)
+            self._get(6)
+
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage().split(' ', 1)[1])
+        self.assertEqual((line['view'], line['queries'], line['status']), ('tournament:show', 6, 200))
+        self.assertIn('tournament', line['slowest_sql'])
+
+    def test_percentiles(self):
+        for count_queries in range(1, 11):
+            self._get(count_queries)
+
+        stats = get_view_stats()['views']['tournament:show']
+        self.assertEqual(stats['count'], 10)
+        self.assertEqual(stats['queries'], {'p50': 6, 'p90': 10, 'p99': 10})
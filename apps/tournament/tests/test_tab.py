@@ -0,0 +1,191 @@
+import datetime
+import random
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.tournament.consts import Position, ROLE_MEMBER
+from apps.tournament.logic import _get_pairing_input, TeamResult, TeamRoundResult, get_tab_arrays
+from apps.tournament.models import \
+    Game, \
+    Motion, \
+    QualificationResult, \
+    Room, \
+    Round, \
+    Team, \
+    TeamStanding, \
+    TeamTournamentRel, \
+    Tournament, \
+    User
+from apps.tournament.tab import TabArrays
+from apps.tournament.views import _convert_tab_to_speaker_table, _convert_tab_to_table
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TabEnginesTests(TestCase):
+
+    COUNT_TEAMS = 16
+    COUNT_ROUNDS = 4
+
+    def setUp(self):
+        cache.clear()
+        rand = random.Random(42)
+        now = datetime.datetime.now()
+        self.tournament = Tournament.objects.create(
+            name='Tab test',
+            location='Vladivostok',
+            open_reg=now,
+            close_reg=now,
+            start_tour=now,
+            count_rounds=self.COUNT_ROUNDS,
+            count_teams=self.COUNT_TEAMS,
+            count_teams_in_break=8,
+            info='',
+        )
+
+        teams = []
+        for i in range(self.COUNT_TEAMS):
+            speakers = [
+                User.objects.create(username='s%d_%d' % (j, i), email='s%d_%d@tabmaker.org' % (j, i), last_name='S%d' % i)
+                for j in [1, 2]
+            ]
+            teams.append(Team.objects.create(name='Team %d' % i, speaker_1=speakers[0], speaker_2=speakers[1]))
+
+        chair = User.objects.create(username='chair', email='chair@tabmaker.org')
+        for number in range(1, self.COUNT_ROUNDS + 1):
+            motion = Motion.objects.create(motion='Motion %d' % number)
+            cur_round = Round.objects.create(
+                tournament=self.tournament,
+                motion=motion,
+                number=number,
+                start_time=now,
+                is_closed=number == self.COUNT_ROUNDS,
+            )
+            rand.shuffle(teams)
+            for i in range(0, self.COUNT_TEAMS, 4):
+                game = Game.objects.create(
+                    og=teams[i], oo=teams[i + 1], cg=teams[i + 2], co=teams[i + 3], chair=chair, motion=motion, date=now
+                )
+                Room.objects.create(round=cur_round, game=game, number=i // 4)
+                places = [1, 2, 3, 4]
+                rand.shuffle(places)
+                speaks = [rand.randint(70, 80) for _ in range(8)]
+                QualificationResult.objects.create(
+                    game=game,
+                    og=places[0], oo=places[1], cg=places[2], co=places[3],
+                    pm=speaks[0], dpm=speaks[1], lo=speaks[2], dlo=speaks[3],
+                    mg=speaks[4], gw=speaks[5], mo=speaks[6], ow=speaks[7],
+                )
+
+    def _reference_tab(self) -> TabArrays:
+        """
+        Тэб, посчитанный напрямую по результатам игр каждого рума
+        """
+        rows = []
+        for room in Room.objects.filter(round__tournament=self.tournament).select_related('round', 'game'):
+            result = QualificationResult.objects.get(game=room.game)
+            for position, row in enumerate([
+                [room.game.og, result.og, result.pm, result.dpm],
+                [room.game.oo, result.oo, result.lo, result.dlo],
+                [room.game.cg, result.cg, result.mg, result.gw],
+                [room.game.co, result.co, result.mo, result.ow],
+            ]):
+                rows.append([room.round, position] + row)
+
+        teams = sorted({row[2] for row in rows}, key=lambda x: x.id)
+        index = {team.id: i for i, team in enumerate(teams)}
+        tab = TabArrays(teams, self.COUNT_ROUNDS)
+        for cur_round, position, team, place, speaker_1, speaker_2 in rows:
+            i = index[team.id]
+            tab.points[i, cur_round.number - 1] = 4 - place if place else 0
+            tab.speaks[i, cur_round.number - 1] = [speaker_1, speaker_2]
+            tab.position_counts[i, position] += 1
+            tab.is_closed[cur_round.number - 1] = cur_round.is_closed
+
+        return tab
+
+    def test_arrays_equal_to_rooms(self):
+        for show_all in [True, False]:
+            self.assertEqual(
+                _convert_tab_to_table(self._reference_tab(), show_all),
+                _convert_tab_to_table(get_tab_arrays(self.tournament), show_all),
+            )
+
+        self.assertEqual(
+            _convert_tab_to_speaker_table(self._reference_tab(), True),
+            _convert_tab_to_speaker_table(get_tab_arrays(self.tournament), True),
+        )
+
+    def test_standings_follow_result_changes(self):
+        get_tab_arrays(self.tournament)
+
+        result = QualificationResult.objects.filter(game__room__round__number=1).first()
+        result.og, result.co = result.co, result.og
+        result.save()
+
+        self.assertEqual(
+            _convert_tab_to_table(self._reference_tab(), True),
+            _convert_tab_to_table(get_tab_arrays(self.tournament), True),
+        )
+
+    def test_unfilled_place_gives_no_points(self):
+        result = QualificationResult.objects.filter(game__room__round__number=1).first()
+        result.og = 0
+        result.save()
+
+        self.assertEqual(
+            _convert_tab_to_table(self._reference_tab(), True),
+            _convert_tab_to_table(get_tab_arrays(self.tournament), True),
+        )
+
+    def test_standings_recalculated_only_when_round_closed(self):
+        cur_round = Round.objects.filter(tournament=self.tournament, number=1).first()
+        standings = set(TeamStanding.objects.filter(tournament=self.tournament).values_list('id', flat=True))
+
+        cur_round.publish()
+        self.assertEqual(
+            standings, set(TeamStanding.objects.filter(tournament=self.tournament).values_list('id', flat=True))
+        )
+
+        cur_round.is_closed = True
+        cur_round.save()
+        self.assertEqual(
+            _convert_tab_to_table(self._reference_tab(), False),
+            _convert_tab_to_table(get_tab_arrays(self.tournament), False),
+        )
+
+    def test_tab_served_from_cache(self):
+        expected = _convert_tab_to_table(get_tab_arrays(self.tournament), True)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(expected, _convert_tab_to_table(get_tab_arrays(self.tournament), True))
+
+        Round.objects.filter(tournament=self.tournament, number=self.COUNT_ROUNDS).first().save()
+        with self.assertNumQueries(3):
+            get_tab_arrays(self.tournament)
+
+    def test_pairing_input_equal_to_tab(self):
+        tab = get_tab_arrays(self.tournament)
+        new_team = Team.objects.create(name='New team')
+        for team in tab.teams[1:] + [new_team]:
+            TeamTournamentRel.objects.create(team=team, tournament=self.tournament, role=ROLE_MEMBER)
+
+        with self.assertNumQueries(2):
+            teams_id, points, positions = _get_pairing_input(self.tournament)
+
+        # Первая команда не участвует, у новой команды результатов нет
+        self.assertEqual(teams_id, tab.get_teams_id()[1:] + [new_team.id])
+        self.assertEqual(points, tab.sum_points().tolist()[1:] + [0])
+        self.assertEqual(positions, tab.position_counts.tolist()[1:] + [[0, 0, 0, 0]])
+
+    def test_team_result_totals_follow_replaced_round(self):
+        team_result = TeamResult(Team(id=1, name='Team'), 0)
+        team_result.add_round(TeamRoundResult(1, 75, 76, False, Position.OG, 1, False, False))
+        team_result.add_round(TeamRoundResult(2, 70, 71, False, Position.CO, 3, True, False))
+        team_result.add_round(TeamRoundResult(4, 80, 80, False, Position.OO, 1, False, False))
+
+        self.assertEqual(team_result.sort_key(), (2, 301))
+        self.assertEqual(team_result.position, [0, 1, 0, 1])
+
+        team_result.show_all = False
+        self.assertEqual(team_result.sort_key(), (0, 0))
@@ -0,0 +1,59 @@
+import datetime
+
+from django.test import TestCase, override_settings
+
+from apps.tournament.models import Task
+from apps.tournament.tasks import enqueue, requeue_stale, run_pending, task
+
+_calls = []
+
+
+@task('test_flaky')
+def _flaky_task(value):
+    _calls.append(value)
+    if len(_calls) < 2:
+        raise ValueError('flaky')
+
+
+@override_settings(TASK_RETRY_DELAY=60)
+class TasksTests(TestCase):
+
+    def setUp(self):
+        del _calls[:]
+
+    def test_retry_with_backoff(self):
+        cur_task = enqueue('test_flaky', 7)
+
+        self.assertEqual(run_pending(), 1)
+        cur_task.refresh_from_db()
+        self.assertEqual([cur_task.status, cur_task.attempts], [Task.STATUS_QUEUED, 1])
+        self.assertGreater(cur_task.run_after, datetime.datetime.now() + datetime.timedelta(seconds=50))
+        self.assertEqual(run_pending(), 0)
+
+        Task.objects.filter(id=cur_task.id).update(run_after=datetime.datetime.now())
+        self.assertEqual(run_pending(), 1)
+        cur_task.refresh_from_db()
+        self.assertEqual([cur_task.status, cur_task.attempts, cur_task.error], [Task.STATUS_DONE, 2, ''])
+        self.assertEqual(_calls, [7, 7])
+
+    def test_failed_after_max_attempts_and_key(self):
+        cur_task = enqueue('test_flaky', 1, key='flaky', max_attempts=1)
+        self.assertEqual(enqueue('test_flaky', 2, key='flaky').id, cur_task.id)
+
+        run_pending()
+        cur_task.refresh_from_db()
+        self.assertEqual(cur_task.status, Task.STATUS_FAILED)
+        self.assertIn('flaky', cur_task.error)
+        self.assertNotEqual(enqueue('test_flaky', 2, key='flaky').id, cur_task.id)
+
+    def test_requeue_stale_counts_attempt(self):
+        tasks = [enqueue('test_flaky', 1, max_attempts=2), enqueue('test_flaky', 2, max_attempts=2)]
+        Task.objects.filter(id=tasks[1].id).update(attempts=1)
+        Task.objects.update(status=Task.STATUS_RUNNING, updated=datetime.datetime.now() - datetime.timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(600), 2)
+        for cur_task in tasks:
+            cur_task.refresh_from_db()
+        self.assertEqual([tasks[0].status, tasks[0].attempts], [Task.STATUS_QUEUED, 1])
+        self.assertEqual([tasks[1].status, tasks[1].attempts], [Task.STATUS_FAILED, 2])
+        self.assertEqual(requeue_stale(600), 0)
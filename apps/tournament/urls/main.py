@@ -14,4 +14,5 @@ urlpatterns = [
     url(r'^policy[/]$', TemplateView.as_view(template_name='main/policy.html'), name='policy'),
     url(r'^feedback[/]$', views.feedback, name='feedback'),
     url(r'^support[/]$', views.support, name='support'),
+    url(r'^stats/requests[/]$', views.request_stats, name='request_stats'),
 ]
@@ -21,9 +21,12 @@ urlpatterns = [
     url(r'^(?P<tournament_id>\d+)/start[/]$', views.start, name='start'),
     url(r'^(?P<tournament_id>\d+)/break[/]$', views.generate_break, name='break'),
     url(r'^(?P<tournament_id>\d+)/finished[/]$', views.finished, name='finished'),
+    url(r'^(?P<tournament_id>\d+)/job/(?P<job_id>[0-9a-f]+)[/]$', views.job_progress, name='job'),
+    url(r'^(?P<tournament_id>\d+)/job/(?P<job_id>[0-9a-f]+)/status[/]$', views.job_status, name='job_status'),
 
     # Management of rounds
     url(r'^(?P<tournament_id>\d+)/round/next[/]$', views.next_round, name='next_round'),
+    url(r'^(?P<tournament_id>\d+)/round/preview[/]$', views.preview_round, name='preview_round'),
     url(r'^(?P<tournament_id>\d+)/round/show[/]$', views.show_round, name='show_round'),
     url(r'^(?P<tournament_id>\d+)/round/presentation[/]$', views.presentation_round, name='presentation_round'),
     url(r'^(?P<tournament_id>\d+)/round/edit[/]$', views.edit_round, name='edit_round'),
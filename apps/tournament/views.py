@@ -1,5 +1,6 @@
 import random
 import logging
+import numpy
 
 from datetime import date, timedelta
 
@@ -10,6 +11,7 @@ from datetime import date, timedelta
 # from apps.tournament.models import Tournament
 # from apps.tournament.utils import paging
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.db.models import Case, When, IntegerField
 from django.urls import \
@@ -17,7 +19,8 @@ from django.urls import \
     reverse
 from django.http import \
     HttpResponseBadRequest, \
-    Http404
+    Http404, \
+    JsonResponse
 
 from django.shortcuts import \
     render, \
@@ -48,25 +51,26 @@ from .logic import \
     check_final, \
     check_last_round_results, \
     check_teams_and_adjudicators, \
-    generate_next_round, \
-    generate_playoff, \
     get_all_rounds_and_rooms, \
     get_games_and_results, \
-    get_rooms_by_user, \
     get_motions, \
-    get_rooms_from_last_round, \
-    get_tab, \
+    get_tab_arrays, \
     get_teams_by_user, \
     publish_last_round, \
     remove_last_round, \
     remove_playoff, \
     user_can_edit_tournament
+from .access import get_page_access
+from .context import TournamentContext
+from .jobs import get_job, start_job
+from .middleware import get_view_stats
+from .tasks import enqueue
 from .messages import *
 from .models import \
-    AccessToPage, \
     Tournament, \
     TeamTournamentRel, \
     UserTournamentRel
+from .tab import TabArrays
     
 from apps.profile.models import TelegramToken, User
 
@@ -76,19 +80,21 @@ from django.db.models import Count, Q
 
 def access_by_status(name_page=None, only_owner=False):
     # TODO Страницы в константы
-    # TODO Закешировать массив с уровнем доступа
     def decorator_maker(func):
 
         def check_access_to_page(request, tournament_id, *args, **kwargs):
-            tournament = get_object_or_404(Tournament, pk=tournament_id)
+            tournament = TournamentContext.load(request, tournament_id).tournament
             if name_page:
-                security = AccessToPage.objects.filter(status=tournament.status, page__name=name_page) \
-                    .select_related('page').first()
-                if not security.page.is_public and not user_can_edit_tournament(tournament, request.user, only_owner):
+                security = get_page_access(tournament.status_id, name_page)
+                if not security:
                     return _show_message(request, MSG_ERROR_TO_ACCESS)
 
-                if not security.access:
-                    return _show_message(request, security.message)
+                is_public, access, message = security
+                if not is_public and not user_can_edit_tournament(tournament, request.user, only_owner):
+                    return _show_message(request, MSG_ERROR_TO_ACCESS)
+
+                if not access:
+                    return _show_message(request, message)
 
             return func(request, tournament, *args, **kwargs)
 
@@ -163,67 +169,65 @@ def _show_message(request, message):
     )
 
 
-def _convert_tab_to_table(table: list, show_all):
-    def _playoff_position(res):
-        if not res.count_playoff_rounds:
+def _convert_tab_to_table(tab: TabArrays, show_all):
+    def _playoff_position(playoff_position):
+        if not tab.count_playoff_rounds:
             return LBL_NOT_IN_BREAK
-        if res.playoff_position > res.count_playoff_rounds:
+        if playoff_position > tab.count_playoff_rounds:
             return LBL_WINNER
-        elif res.playoff_position == res.count_playoff_rounds:
+        elif playoff_position == tab.count_playoff_rounds:
             return LBL_FINALISTS
-        elif res.playoff_position == 0:
+        elif playoff_position == 0:
             return LBL_NOT_IN_BREAK
         else:
-            return LBL_ONE_p % str(2 ** (res.count_playoff_rounds - res.playoff_position))
+            return LBL_ONE_p % str(2 ** (tab.count_playoff_rounds - playoff_position))
 
     lines = []
-    count_rounds = max(list(map(lambda x: len(x.rounds), table)) + [0])
     line = [LBL_N, LBL_TEAM, LBL_SUM_POINTS, LBL_PLAYOFF, LBL_SUM_SPEAKERS]
 
-    for i in range(1, count_rounds + 1):
+    for i in range(1, tab.count_rounds + 1):
         line.append(LBL_ROUND_p % i)
     lines.append(line)
 
-    for team in table:
-        team.show_all = show_all
-
-    table = sorted(table, reverse=True)
-    for i in range(len(table)):
-        line = []
-        n = lines[-1][0] if i > 0 and table[i - 1] == table[i] else i + 1
-        line += [n, table[i].team.name, table[i].sum_points, _playoff_position(table[i]), table[i].sum_speakers]
-        for cur_round in table[i].rounds:
-            round_res = str(cur_round.points * bool(not cur_round.is_closed or show_all))
-            line.append(round_res)
+    points = tab.get_points(show_all).tolist()
+    sum_points = tab.sum_points(show_all).tolist()
+    sum_speakers = tab.sum_speakers(show_all).tolist()
+    playoff_position = tab.playoff_position.tolist()
+
+    for n, i in enumerate(tab.ranking(show_all).tolist(), 1):
+        line = [n, tab.teams[i].name, sum_points[i], _playoff_position(playoff_position[i]), sum_speakers[i]]
+        line += [str(round_points) for round_points in points[i]]
         lines.append(line)
 
     return lines
 
 
-def _convert_tab_to_speaker_table(table: list, is_show):
-    speakers = []
-    for team_result in table:
-        speakers += team_result.extract_speakers_result()
+def _convert_tab_to_speaker_table(tab: TabArrays, is_show):
+    users = [user for team in tab.teams for user in [team.speaker_1, team.speaker_2]]
+    points = tab.get_speaker_points()
+    sum_points = points.sum(axis=1)
 
     if is_show:
-        speakers = sorted(speakers, reverse=True)
+        order = numpy.argsort(-sum_points, kind='stable')
     else:
-        random.shuffle(speakers)
+        order = numpy.random.permutation(len(users))
+
+    # Спикеры с одинаковой суммой делят место
+    sum_points = sum_points[order]
+    is_new_place = numpy.concatenate([[True], sum_points[1:] != sum_points[:-1]])
+    places = numpy.maximum.accumulate(numpy.where(is_new_place, numpy.arange(1, len(order) + 1), 0))
 
     lines = []
-    count_rounds = max(list(map(lambda x: len(x.points), speakers)) + [0])
     head = [LBL_N, LBL_SPEAKER, LBL_TEAM, LBL_SUM_SPEAKERS]
 
-    for i in range(1, count_rounds + 1):
+    for i in range(1, tab.count_rounds + 1):
         head.append(LBL_ROUND_p % i)
     lines.append(head)
 
-    for i in range(len(speakers)):
-        line = []
-        n = lines[-1][0] if i > 0 and speakers[i - 1] == speakers[i] else i + 1
-        line += [n, speakers[i].user.name(), speakers[i].team.name, speakers[i].sum_points() * int(is_show)]
-        for point in speakers[i].points:
-            line.append(point * int(is_show))
+    points = (points[order] * int(is_show)).tolist()
+    for n, i, speaker_sum, speaker_points in zip(places.tolist(), order.tolist(), sum_points.tolist(), points):
+        line = [n, users[i].name(), tab.teams[i // 2].name, speaker_sum * int(is_show)]
+        line += speaker_points
         lines.append(line)
 
     return lines
@@ -317,24 +321,18 @@ def show(request, tournament):
     if request.GET.get('new', None):
         return show2(request, tournament)
 
-    is_chair = request.user.is_authenticated \
-        and tournament.status in [STATUS_PLAYOFF, STATUS_STARTED] \
-        and get_rooms_from_last_round(tournament, False, request.user).count()
-
-    need_show_feedback_button = request.user.is_authenticated \
-        and get_rooms_by_user(tournament, request.user) \
-        and CustomForm.objects.filter(tournament=tournament, form_type=FORM_FEEDBACK_TYPE).count()
+    context = TournamentContext.get(request, tournament)
 
     return render(
         request,
         'tournament/show.html',
         {
             'tournament': tournament,
-            'team_tournament_rels': tournament.get_teams(),
-            'adjudicators': tournament.get_users(ADJUDICATOR_ROLES),
-            'is_owner': user_can_edit_tournament(tournament, request.user),
-            'is_chair': is_chair,
-            'need_show_feedback_button': need_show_feedback_button,
+            'team_tournament_rels': context.teams,
+            'adjudicators': context.adjudicators,
+            'is_owner': context.is_owner,
+            'is_chair': context.is_chair,
+            'need_show_feedback_button': bool(context.user_rooms) and context.has_feedback_form,
         }
     )
 
@@ -350,18 +348,20 @@ def show2(request, tournament):
     #     and get_rooms_by_user(tournament, request.user) \
     #     and CustomForm.objects.filter(tournament=tournament, form_type=FORM_FEEDBACK_TYPE).count()
 
-    is_owner = user_can_edit_tournament(tournament, request.user)
+    context = TournamentContext.get(request, tournament)
+    is_owner = context.is_owner
 
     tabs = []
 
     # Текущий раунд
-    if tournament.status in [STATUS_STARTED, STATUS_PLAYOFF]:
+    if context.is_started:
         tab_config = {'title': 'Раунд'}
-        rooms = get_rooms_from_last_round(tournament, True)
-        if not rooms or not rooms[0].round.is_public:
+        rooms = context.rooms
+        if not rooms or not context.last_round.is_public:
             tab_config['message'] = MSG_ROUND_NOT_PUBLIC
         else:
-            tab_config['data'] = rooms
+            # Порядок комнат на публичной странице случайный
+            tab_config['data'] = random.sample(rooms, len(rooms))
             tab_config['template'] = 'tournament/tabs/public/round.html'
 
         tabs.append(tab_config)
@@ -369,7 +369,7 @@ def show2(request, tournament):
     # Командный теб + Спикерский теб
     if tournament.status in [STATUS_STARTED, STATUS_PLAYOFF, STATUS_FINISHED]:
         show_all = tournament.status == STATUS_FINISHED or is_owner
-        results = get_tab(tournament)
+        results = get_tab_arrays(tournament)
 
         tab_config = {'title': 'Результаты команд'}
         if not results:
@@ -414,8 +414,8 @@ def show2(request, tournament):
         tab_config['message'] = 'Информация закрыта'
         tab_config['comment'] = 'Организаторы турнира скрыли инфомацию о уже зарегистрированных командах'
     else:
-        teams = tournament.get_teams()
-        if not len(teams):
+        teams = context.teams
+        if not teams:
             tab_config['message'] = 'Пока никто не зарегистрировался'
             tab_config['comment'] = 'Вы можете стать первым участником'
         else:
@@ -425,8 +425,8 @@ def show2(request, tournament):
     tabs.append(tab_config)
 
     tab_config = {'title': 'Судьи'}
-    adjudicators = tournament.get_users(ADJUDICATOR_ROLES)
-    if not len(adjudicators):
+    adjudicators = context.adjudicators
+    if not adjudicators:
         tab_config['message'] = 'Пока никто не зарегистрировался'
         tab_config['comment'] = 'Вы можете стать первым cудьей'
     else:
@@ -494,9 +494,9 @@ def edit(request, tournament):
 
 @access_by_status(name_page='result')
 def result(request, tournament):
-    is_owner = user_can_edit_tournament(tournament, request.user)
+    is_owner = TournamentContext.get(request, tournament).is_owner
     show_all = tournament.status == STATUS_FINISHED or is_owner
-    tab = get_tab(tournament)
+    tab = get_tab_arrays(tournament)
 
     return render(
         request,
@@ -513,7 +513,7 @@ def result(request, tournament):
 
 @access_by_status(name_page='result_all')
 def result_all_rounds(request, tournament):
-    is_owner = user_can_edit_tournament(tournament, request.user)
+    is_owner = TournamentContext.get(request, tournament).is_owner
     if not is_owner and tournament.status != STATUS_FINISHED:
         return _show_message(request, MSG_RESULT_NOT_PUBLISHED)
 
@@ -556,14 +556,13 @@ def print_users(request, tournament):
 
 
 def feedback(request):
-    from django.core.mail import mail_managers
-
     if request.method == 'POST':
         who = ''
         if request.user.is_authenticated:
             who = '%s (%s)' % (request.user.get_full_name(), request.user.email)
 
-        mail_managers(
+        enqueue(
+            'mail_managers',
             'Tabmaker Feedback',
             '''
             Кто %s \n\n
@@ -593,14 +592,13 @@ def feedback(request):
 
 
 def support(request):
-    from django.core.mail import mail_managers
-
     if request.method == 'POST':
         who = '%s (%s)' % (request.user.get_full_name(), request.user.email) \
             if request.user.is_authenticated \
             else 'noname'
 
-        mail_managers(
+        enqueue(
+            'mail_managers',
             'Tabmaker: Somebody need help!',
             '''
             Кто %s \n\n
@@ -662,19 +660,20 @@ def start(request, tournament):
 @login_required(login_url=reverse_lazy('account_login'))
 @access_by_status(name_page='break')
 def generate_break(request, tournament):
-    tab = sorted(get_tab(tournament), reverse=True)
+    tab = get_tab_arrays(tournament)
+    tab_teams = [tab.teams[i] for i in tab.ranking(True).tolist()]
     table = _convert_tab_to_table(tab, True)
     teams_in_break = []
     teams = []
-    for i in range(len(tab)):
+    for i in range(len(tab_teams)):
         if request.method == 'POST':
             form = CheckboxForm(request.POST, prefix=i, use_required_attribute=False)
             if form.is_valid() and form.cleaned_data.get('is_check', False):
-                teams_in_break.append(tab[i].team)
+                teams_in_break.append(tab_teams[i])
         else:
             form = CheckboxForm(
                 initial={
-                    'id': tab[i].team.id,
+                    'id': tab_teams[i].id,
                     'is_check': i < tournament.count_teams_in_break
                 },
                 prefix=i,
@@ -690,10 +689,8 @@ def generate_break(request, tournament):
         if len(teams_in_break) != tournament.count_teams_in_break:
             error_message = MSG_SELECT_N_TEAMS_TO_BREAK_p % tournament.count_teams_in_break
         else:
-            generate_playoff(tournament, teams_in_break)
-            tournament.set_status(STATUS_PLAYOFF)
-
-            return redirect('tournament:show', tournament_id=tournament.id)
+            job_id = start_job(tournament.id, 'break', [team.id for team in teams_in_break])
+            return redirect('tournament:job', tournament_id=tournament.id, job_id=job_id)
 
     return render(
         request,
@@ -707,6 +704,33 @@ def generate_break(request, tournament):
     )
 
 
+def _get_tournament_job(request, tournament, job_id):
+    job = get_job(job_id)
+    if not job or job['tournament'] != tournament.id or not TournamentContext.get(request, tournament).is_owner:
+        raise Http404
+
+    return job
+
+
+@login_required(login_url=reverse_lazy('account_login'))
+@access_by_status()
+def job_progress(request, tournament, job_id):
+    return render(
+        request,
+        'tournament/job.html',
+        {
+            'tournament': tournament,
+            'job': _get_tournament_job(request, tournament, job_id),
+        }
+    )
+
+
+@login_required(login_url=reverse_lazy('account_login'))
+@access_by_status()
+def job_status(request, tournament, job_id):
+    return JsonResponse(_get_tournament_job(request, tournament, job_id))
+
+
 @login_required(login_url=reverse_lazy('account_login'))
 @access_by_status(name_page='finished')
 def finished(request, tournament):
@@ -947,10 +971,18 @@ def index(request):
     )
 
 
+@staff_member_required
+def request_stats(request):
+    """
+    Перцентили времени и числа SQL-запросов по view в этом воркере
+    """
+    return JsonResponse(get_view_stats(), json_dumps_params={'ensure_ascii': False})
+
+
 @login_required(login_url=reverse_lazy('account_login'))
 @access_by_status(name_page='')
 def team_feedback(request, tournament):
-    rooms = get_rooms_by_user(tournament, request.user)
+    rooms = TournamentContext.get(request, tournament).user_rooms
     if not rooms:
         return _show_message(request, MSG_USER_FEEDBACK_WITHOUT_ROUNDS)
 